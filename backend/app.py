@@ -1,18 +1,13 @@
-import requests
-from flask import Flask, request, jsonify, Blueprint
+from flask import Flask, request, jsonify, Blueprint, g
 from flask_cors import CORS
-import bcrypt
-from pymongo import MongoClient
 from werkzeug.exceptions import BadRequest
 from dotenv import load_dotenv
 import re
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import os
 import uuid
 from datetime import datetime, timedelta
 import logging
+import threading
 import jwt
 from joblib import load
 import traceback  # Add this at the top
@@ -23,7 +18,14 @@ from routes.user_profile import user_profile
 from routes.admin_profile import admin_profile
 from routes.real_accounts import REAL_BLOCKED_ACCOUNTS 
 from routes.user_history import user_history
-from routes.auth import token_required
+from routes.auth import token_required, invalidate_principal
+from utils.db import get_db
+from utils.indexes import ensure_indexes
+from utils import metrics_store, activity_events, write_behind
+from utils.email_utils import send_verification_email
+from utils.google_verify import verify_recaptcha
+from utils.password_hashing import HashingBusy, busy_response, hash_password, password_hasher, verify_password
+from pymongo.errors import DuplicateKeyError
 from routes.user_info import user_info
 from routes.google_signin import google_signin_bp
 from routes.contact import contact_bp
@@ -36,6 +38,13 @@ from routes.my_reports import my_reports_bp
 from routes.admin_reports import admin_reports_bp
 from routes.admin_settings import admin_settings_bp
 from routes.feedback import feedback_bp
+from routes.metrics import metrics_bp
+from routes.auth import current_principal, principal_cache
+from utils import request_profiler, tracing
+from utils.google_verify import verification_client
+from utils.job_queue import get_job_queue
+from utils.browser_pool import start_warm_up
+from utils.scrape_queue import SCRAPER_MODE
 # === Setup Logging ===
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -48,24 +57,34 @@ app = Flask(__name__)
 
 
 CORS(app, resources={r"/*": {"origins": "http://localhost:3000", "methods": ["GET", "POST", "DELETE", "PUT"]}},
-     supports_credentials=True, allow_headers=["Content-Type", "Authorization"])
+     supports_credentials=True, allow_headers=["Content-Type", "Authorization", "X-Profile"],
+     expose_headers=["X-Next-Cursor", "X-Profile-Id"])
 
 # === Secret Key for JWT ===
 app.config['SECRET_KEY'] = os.getenv("SECRET_KEY", "dev_secret_key")  # fallback for dev
 app.config['JWT_SECRET_KEY']=os.getenv("JWT_SECRET_KEY")
 
 # === MongoDB Setup ===
-client = MongoClient(os.getenv("MONGO_URL"))
-db = client["users"]
+db = get_db()
 users_collection = db["register"]
 activity_collection = db["activity_history"]  # This will create the collection automatically if it doesn't exist
 
-# === Email Config ===
-EMAIL_USER = os.getenv("EMAIL_USER")
-EMAIL_PASS = os.getenv("EMAIL_PASS")
+
+def _ensure_indexes():
+    try:
+        ensure_indexes(db)
+    except Exception as e:
+        logger.warning(f"[Indexes] Startup index creation skipped: {e}")
+
+# Runs in the background so an unreachable database does not block startup
+if os.getenv("MONGO_ENSURE_INDEXES", "1") == "1":
+    threading.Thread(target=_ensure_indexes, name="ensure-indexes", daemon=True).start()
+
+# Web workers that scrape inline get their browsers ready before the first request
+if SCRAPER_MODE == "inline":
+    start_warm_up()
 
 # === reCAPTCHA Secret ===
-RECAPTCHA_SECRET_KEY = os.getenv("RECAPTCHA_SECRET_KEY")
 
 rapid_api_key = os.getenv("RAPID_API_KEY")
 gemini_api_key = os.getenv("GEMINI_API_KEY")
@@ -73,7 +92,7 @@ gemini_api_key = os.getenv("GEMINI_API_KEY")
 
 
 def log_activity(user_id, action, details):
-    activity_collection.insert_one({
+    write_behind.insert("activity_history", {
         "user_id": user_id,
         "action": action,
         "timestamp": datetime.utcnow(),
@@ -88,17 +107,6 @@ def verify_jwt(token):
     except jwt.InvalidTokenError:
         return None
 
-def verify_recaptcha(captcha_response):
-    try:
-        verification_url = 'https://www.google.com/recaptcha/api/siteverify'
-        payload = {'secret': RECAPTCHA_SECRET_KEY, 'response': captcha_response}
-        response = requests.post(verification_url, data=payload)
-        result = response.json()
-        return result.get('success', False)
-    except Exception as e:
-        logger.error(f"CAPTCHA verification failed: {e}")
-        return False
-
 def generate_verification_token():
     return str(uuid.uuid4())
 
@@ -121,42 +129,15 @@ def verify_user(user):
             "$unset": {"verification_token": "", "verification_token_expiry": ""}
         }
     )
+    invalidate_principal(user["_id"])
+    if result.modified_count > 0:
+        metrics_store.user_verified()
     return result.modified_count > 0
 
 
 def email_is_valid(email):
     return re.match(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$", email)
 
-def send_verification_email(to_email, token):
-    try:
-        verify_url = f"http://localhost:5000/verify-email/{token}"
-        subject = "Verify your email - InstaGuard"
-        html_content = f"""
-        <html>
-        <body>
-            <h3>Hello!</h3>
-            <p>Thanks for registering on <b>InstaGuard</b>.</p>
-            <p>Please click the button below to verify your email:</p>
-            <a href="{verify_url}" style="padding: 10px 20px; background-color: #007bff; color: white; text-decoration: none;">Verify Email</a>
-            <p>If you didn’t create this account, please ignore this email.</p>
-        </body>
-        </html>
-        """
-
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_USER
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(html_content, 'html'))
-
-        with smtplib.SMTP('smtp.gmail.com', 587) as smtp:
-            smtp.starttls()
-            smtp.login(EMAIL_USER, EMAIL_PASS)
-            smtp.send_message(msg)
-            logger.info("Verification email sent to {to_email}")
-    except Exception as e:
-        logger.error(f"Failed to send verification email: {str(e)}")
-
 # === Routes ===
 
 @app.route('/signup', methods=['POST'])
@@ -186,7 +167,7 @@ def signup():
         if users_collection.find_one({"email": email}):
             return jsonify({"message": "Email already registered!"}), 400
 
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        hashed_password = hash_password(password)
         full_mobile_number = mobile
         verification_token = generate_verification_token()
         token_expiry = datetime.utcnow() + timedelta(hours=1)
@@ -204,14 +185,20 @@ def signup():
             "last_login": None  # <-- Add last_login field (null initially)
         }
 
-        result = users_collection.insert_one(user)
+        try:
+            result = users_collection.insert_one(user)
+        except DuplicateKeyError:
+            # Lost a race with a concurrent signup for the same email
+            return jsonify({"message": "Email already registered!"}), 400
         new_user_id = result.inserted_id  # Capture the inserted user's ObjectId
+        metrics_store.user_created()
+        activity_events.user_signed_up(new_user_id, fullname, email)
 
-# Send verification email
+# Queue the verification email; the SMTP round trips happen on a background worker
         send_verification_email(email, verification_token)
 
 # Log signup activity
-        activity_collection.insert_one({
+        write_behind.insert("activity_history", {
     "user_id": new_user_id,
     "action": "Signed up",
     "timestamp": datetime.utcnow(),
@@ -223,6 +210,8 @@ def signup():
 
     except BadRequest as e:
         return jsonify({"message": f"Bad request: {str(e)}"}), 400
+    except HashingBusy:
+        return busy_response()
     except Exception as e:
         logger.error(f"Signup error: {e}")
         return jsonify({"message": "Internal server error!"}), 500
@@ -261,9 +250,16 @@ def login():
         if not user.get("isVerified"):
             return jsonify({"message": "Please verify your email first!"}), 403
 
-        if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+        if not verify_password(password, user.get('password')):
             return jsonify({"message": "Invalid password!"}), 401
 
+        # Bring hashes made with an older BCRYPT_ROUNDS up to date, off the request path
+        if password_hasher.needs_rehash(user['password']):
+            user_id = user["_id"]
+            password_hasher.upgrade_later(password, lambda new_hash: users_collection.update_one(
+                {"_id": user_id, "password": user['password']}, {"$set": {"password": new_hash}}
+            ))
+
         token = jwt.encode({
             'user_id': str(user['_id']),
             'email': email,
@@ -279,12 +275,13 @@ def login():
         )
 
         # Log login activity in activity_history collection
-        activity_collection.insert_one({
+        write_behind.insert("activity_history", {
             "user_id": user["_id"],  # Add the user_id of the logged-in user
             "action": "Logged in",
             "timestamp": datetime.utcnow(),  # Store the current UTC time
             "details": "You logged in recently."
         })
+        activity_events.user_logged_in(user["_id"], email)
 
         return jsonify({
             "message": "Login successful!",
@@ -292,6 +289,8 @@ def login():
             "role": user['role']
         }), 200
 
+    except HashingBusy:
+        return busy_response()
     except Exception as e:
         logger.error(f"Login error: {e}")
         return jsonify({"message": "Internal server error!"}), 500
@@ -460,10 +459,14 @@ def delete_user(user_id):
             return jsonify({"message": "Permission denied! Admin access required."}), 403
 
         # 🗑️ Delete the user from the database
-        result = users_collection.delete_one({"_id": ObjectId(user_id)})
+        deleted = users_collection.find_one_and_delete(
+            {"_id": ObjectId(user_id)}, projection={"role": 1, "isVerified": 1}
+        )
+        invalidate_principal(user_id)
 
-        if result.deleted_count == 0:
+        if deleted is None:
             return jsonify({"message": "User not found!"}), 404
+        metrics_store.user_deleted(deleted)
 
         return jsonify({"message": "User deleted successfully!"}), 200
 
@@ -503,14 +506,82 @@ app.register_blueprint(admin_settings_bp)
 app.register_blueprint(feedback_bp)
 
 app.register_blueprint(predict_bp)
+
+app.register_blueprint(metrics_bp)
+
+# === Request tracing ===
+@app.before_request
+def start_trace():
+    tracing.start()
+
+
+@app.after_request
+def finish_trace(response):
+    tracing.finish(endpoint=request.endpoint or "unknown", status=response.status_code)
+    return response
+
+
+# === Opt-in request profiling ===
+# Admins add X-Profile: 1 (or ?profile=1) to any route; PROFILE_SAMPLE_RATE picks
+# a share of all requests. Everyone else only pays for the flag lookup.
+def _profile_reason():
+    if request_profiler.requested(request.headers, request.args):
+        user = current_principal()
+        if user and user.get("role") == "admin":
+            return "admin", str(user["_id"])
+        return None, None
+    if request_profiler.sampled():
+        return "sampled", None
+    return None, None
+
+
+@app.before_request
+def start_profile():
+    reason, user_id = _profile_reason()
+    if reason:
+        profile = request_profiler.start(reason)
+        if profile:
+            g.profile, g.profile_user = profile, user_id
+
+
+@app.after_request
+def finish_profile(response):
+    profile = g.pop("profile", None)
+    if profile:
+        # Streamed bodies (SSE) are produced after this point and are not covered
+        request_profiler.finish(profile, endpoint=request.endpoint or "unknown", method=request.method,
+                                path=request.path, status=response.status_code, user_id=g.pop("profile_user", None))
+        if profile.reason == "admin":
+            response.headers["X-Profile-Id"] = profile.id
+    return response
+
+
+@app.teardown_request
+def stop_profile(exc):
+    profile = g.pop("profile", None)
+    if profile:
+        profile.stop()  # the request failed before after_request ran
+
+
+tracing.register_collector("job_queue", lambda: get_job_queue().stats())
+tracing.register_collector("write_behind", lambda: write_behind.get_write_buffer().stats())
+tracing.register_collector("principal_cache", principal_cache.stats)
+tracing.register_collector("password_hasher", password_hasher.stats)
+tracing.register_collector("verification", verification_client.stats)
+
 @app.after_request
 def add_cors_headers(response):
-    response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
+    response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-Profile"
     response.headers["Access-Control-Allow-Origin"] = "http://localhost:3000"
     response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
     response.headers["Access-Control-Allow-Credentials"] = "true"
     return response
 
+# Password hashing pool saturated (routes without their own handler)
+@app.errorhandler(HashingBusy)
+def handle_hashing_busy(e):
+    return busy_response()
+
 # Run the app
 if __name__ == '__main__':
     app.run(debug=True)
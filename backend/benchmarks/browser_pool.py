@@ -0,0 +1,97 @@
+# Compare a cold Playwright/Selenium launch per fallback with the warm browser pool.
+# Serves a fake profile page from a local stand-in server, so nothing hits Instagram.
+#
+#   cd backend && python -m benchmarks.browser_pool [runs]
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import sys
+import threading
+import time
+
+PROFILE_HTML = b"""<html><head>
+<meta name="description" content="Stand-in bio for benchmarking - 100 Followers, 10 Following, 5 Posts">
+</head><body><section><div role="presentation">Stand-in bio for benchmarking</div></section>
+<img src="data:image/gif;base64,R0lGODlhAQABAAAAACw="></body></html>"""
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.end_headers()
+        self.wfile.write(PROFILE_HTML)
+
+    def log_message(self, *args):
+        pass
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn("benchmark_user")
+        samples.append(time.perf_counter() - start)
+        assert result["bio_length"] > 0, result
+    return sum(samples) / len(samples), max(samples)
+
+
+def cold_playwright(username):
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page()
+        page.goto(f"{os.environ['INSTAGRAM_BASE_URL']}/{username}/")
+        bio = page.inner_text("section [role='presentation']")
+        browser.close()
+        return {"bio_length": len(bio)}
+
+
+def cold_selenium(username):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    options = Options()
+    options.add_argument("--headless")
+    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+    driver.get(f"{os.environ['INSTAGRAM_BASE_URL']}/{username}/")
+    content = driver.find_element("xpath", "//meta[@name='description']").get_attribute("content")
+    driver.quit()
+    return {"bio_length": len(content.split("-")[0].strip())}
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["INSTAGRAM_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ["BROWSER_POOL_PREWARM"] = "0"
+
+    # Imported after the env is set so the scrapers point at the stand-in server
+    from routes.extract_features import get_playwright_fallback, get_selenium_fallback
+    from utils.browser_pool import warm_up_browser_pools, get_playwright_pool, get_selenium_pool
+
+    warm_up_browser_pools()
+
+    rows = [
+        ("playwright cold", cold_playwright),
+        ("playwright pooled", get_playwright_fallback),
+        ("selenium cold", cold_selenium),
+        ("selenium pooled", get_selenium_fallback),
+    ]
+    for name, fn in rows:
+        avg, worst = timed(fn, runs)
+        print(f"{name:<20} avg {avg * 1000:8.1f} ms   max {worst * 1000:8.1f} ms")
+
+    print("playwright pool:", get_playwright_pool().stats())
+    print("selenium pool:  ", get_selenium_pool().stats())
+    get_playwright_pool().close()
+    get_selenium_pool().close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
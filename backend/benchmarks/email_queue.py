@@ -0,0 +1,96 @@
+# Outbound email: connect-per-message (the old path) against the persistent
+# SMTPConnection, and how long the request thread is blocked in each case.
+# Runs against a local aiosmtpd stand-in, so no real mail is sent.
+#
+#   pip install aiosmtpd
+#   cd backend && python -m benchmarks.email_queue [messages] [smtp_delay_ms]
+#
+# smtp_delay_ms makes the stand-in answer every command that much later, like a
+# slow or distant mail server.
+
+import asyncio
+import smtplib
+import sys
+import time
+
+try:
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import SMTP as AiosmtpdSMTP
+except ImportError:
+    sys.exit("aiosmtpd is required: pip install aiosmtpd")
+
+from utils.email_utils import SMTPConnection, build_verification_email
+from utils.job_queue import JobQueue
+
+HOST, PORT = "127.0.0.1", 8025
+
+
+class CountingHandler:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+class SlowSMTP(AiosmtpdSMTP):
+    delay = 0.0
+
+    async def push(self, status):
+        await asyncio.sleep(self.delay)
+        return await super().push(status)
+
+
+class SlowController(Controller):
+    def factory(self):
+        return SlowSMTP(self.handler)
+
+
+def send_connect_per_message(msg):
+    # Verbatim shape of the former app.send_verification_email, minus STARTTLS/login
+    with smtplib.SMTP(HOST, PORT) as smtp:
+        smtp.send_message(msg)
+
+
+def bench(label, n, submit, wait=None):
+    start = time.perf_counter()
+    blocked = []
+    for i in range(n):
+        t = time.perf_counter()
+        submit(build_verification_email(f"user{i}@example.com", f"token-{i}"))
+        blocked.append(time.perf_counter() - t)
+    if wait:
+        wait()
+    total = time.perf_counter() - start
+    blocked.sort()
+    print(f"{label:<34}{total:>9.2f}s total{n / total:>9.1f} msg/s"
+          f"{blocked[len(blocked) // 2] * 1000:>10.2f} ms p50 blocked"
+          f"{blocked[int(len(blocked) * 0.99) - 1] * 1000:>9.2f} ms p99")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    SlowSMTP.delay = (float(sys.argv[2]) if len(sys.argv) > 2 else 5) / 1000
+
+    handler = CountingHandler()
+    controller = SlowController(handler, hostname=HOST, port=PORT)
+    controller.start()
+    try:
+        bench("connect per message (inline)", n, send_connect_per_message)
+
+        conn = SMTPConnection(host=HOST, port=PORT, starttls=False, user=None, password=None)
+        bench("persistent connection (inline)", n, conn.send)
+        conn.close()
+
+        conn = SMTPConnection(host=HOST, port=PORT, starttls=False, user=None, password=None)
+        queue = JobQueue(workers=2, name="bench")
+        bench("persistent connection (queued)", n, lambda msg: queue.submit(conn.send, msg), queue.join)
+        print(f"\nconnections opened by the queue workers: {conn.stats()['connects']}")
+        print(f"messages received by the stand-in:       {handler.received}")
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
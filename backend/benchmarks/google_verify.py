@@ -0,0 +1,137 @@
+# Sign-in verification: per-call requests.get/post (the old path) against the
+# pooled VerificationClient with local ID-token checks. Runs against a local
+# stand-in for Google's siteverify / JWKS / tokeninfo endpoints, so it needs no
+# network access and no real credentials.
+#
+#   pip install cryptography
+#   cd backend && python -m benchmarks.google_verify [logins] [upstream_delay_ms]
+#
+# upstream_delay_ms delays every stand-in response, like a round trip to Google.
+
+import base64
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import jwt
+import requests
+
+try:
+    from cryptography.hazmat.primitives.asymmetric import rsa
+except ImportError:
+    sys.exit("cryptography is required: pip install cryptography")
+
+HOST, PORT = "127.0.0.1", 8026
+BASE_URL = f"http://{HOST}:{PORT}"
+CLIENT_ID = "bench-client.apps.googleusercontent.com"
+
+# The client reads its endpoints at import time
+os.environ.update({
+    "RECAPTCHA_VERIFY_URL": f"{BASE_URL}/recaptcha/api/siteverify",
+    "GOOGLE_JWKS_URL": f"{BASE_URL}/oauth2/v3/certs",
+    "GOOGLE_OAUTH_CLIENT_ID": CLIENT_ID,
+})
+
+from utils.google_verify import VerificationClient  # noqa: E402
+
+SIGNING_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+KID = "bench-key"
+
+
+def b64(n):
+    return base64.urlsafe_b64encode(n.to_bytes((n.bit_length() + 7) // 8, "big")).rstrip(b"=").decode()
+
+
+def make_id_token(i):
+    now = int(time.time())
+    claims = {"iss": "https://accounts.google.com", "aud": CLIENT_ID, "sub": str(i),
+              "email": f"user{i}@example.com", "name": f"User {i}", "iat": now, "exp": now + 3600}
+    return jwt.encode(claims, SIGNING_KEY, algorithm="RS256", headers={"kid": KID})
+
+
+class StandIn(BaseHTTPRequestHandler):
+    delay = 0.0
+    hits = {}
+    protocol_version = "HTTP/1.1"  # keep-alive, as Google's endpoints do
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body, headers=()):
+        time.sleep(self.delay)
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        StandIn.hits[url.path] = StandIn.hits.get(url.path, 0) + 1
+        if url.path == "/oauth2/v3/certs":
+            numbers = SIGNING_KEY.public_key().public_numbers()
+            jwk = {"kty": "RSA", "alg": "RS256", "use": "sig", "kid": KID, "n": b64(numbers.n), "e": b64(numbers.e)}
+            self._reply(200, {"keys": [jwk]}, [("Cache-Control", "public, max-age=3600")])
+        elif url.path == "/tokeninfo":
+            token = parse_qs(url.query).get("id_token", [""])[0]
+            self._reply(200, jwt.decode(token, options={"verify_signature": False}))
+        else:
+            self._reply(404, {})
+
+    def do_POST(self):
+        StandIn.hits[self.path] = StandIn.hits.get(self.path, 0) + 1
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._reply(200, {"success": True})
+
+
+def old_login(i):
+    # Shape of the former google_signin handler: captcha + tokeninfo, fresh connection each
+    requests.post(f"{BASE_URL}/recaptcha/api/siteverify", data={"secret": "s", "response": f"captcha-{i}"}).json()
+    requests.get(f"{BASE_URL}/tokeninfo", params={"id_token": make_id_token(i)}).json()
+
+
+def bench(label, n, login):
+    timings = []
+    start = time.perf_counter()
+    for i in range(n):
+        t = time.perf_counter()
+        login(i)
+        timings.append(time.perf_counter() - t)
+    total = time.perf_counter() - start
+    timings.sort()
+    print(f"{label:<34}{total:>8.2f}s total{n / total:>9.1f} logins/s"
+          f"{timings[len(timings) // 2] * 1000:>9.2f} ms p50{timings[int(len(timings) * 0.99) - 1] * 1000:>9.2f} ms p99")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    StandIn.delay = (float(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+    server = ThreadingHTTPServer((HOST, PORT), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        bench("per-call requests (old)", n, old_login)
+        StandIn.hits.clear()
+
+        client = VerificationClient()
+
+        def new_login(i):
+            assert client.verify_recaptcha(f"captcha-{i}")
+            assert client.verify_google_id_token(make_id_token(i))["email"] == f"user{i}@example.com"
+
+        bench("pooled client + local JWT check", n, new_login)
+        print(f"\nupstream calls by the client: {StandIn.hits}")
+        print(f"client stats: {json.dumps(client.stats())}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
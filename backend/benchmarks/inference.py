@@ -0,0 +1,96 @@
+# Microbenchmark: the old pandas preprocessing path against the FeatureVectorizer
+# path for single-row inference, on the same inputs and the same model.
+#
+#   cd backend && python -m benchmarks.inference [iterations]
+
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from utils.feature_vectorizer import EXPECTED_COLUMNS, FeatureVectorizer
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+SAMPLES = [
+    {"followers": 1000, "followees": 955, "posts": 32, "is_business": 0, "bio_length": 53, "external_url": 0,
+     "has_profile_pic": 1, "fullname_words": 0, "name==username": 0, "nums/length_username": 0.27,
+     "nums/length_fullname": 0},
+    {"followers": 12, "followees": 3504, "posts": 0, "is_business": 0, "bio_length": 0, "external_url": 0,
+     "has_profile_pic": 0, "fullname_words": 1, "name==username": 0, "nums/length_username": 0.45,
+     "nums/length_fullname": 0.3},
+    {"followers": 84210, "followees": 312, "posts": 611, "is_business": 1, "bio_length": 140, "external_url": 1,
+     "has_profile_pic": 1, "fullname_words": 2, "name==username": 0, "nums/length_username": 0,
+     "nums/length_fullname": 0},
+]
+
+
+def legacy_preprocess(features):
+    # Verbatim copy of the former routes/predict.preprocess_features
+    df = pd.DataFrame([features])
+    df = df.rename(columns={
+        "has_profile_pic": "profile pic",
+        "nums/length_username": "nums/length username",
+        "fullname_words": "fullname words",
+        "nums/length_fullname": "nums/length fullname",
+        "name==username": "name==username",
+        "bio_length": "description length",
+        "external_url": "external URL",
+        "posts": "#posts",
+        "followers": "#followers",
+        "followees": "#follows"
+    })
+    df["private"] = 0
+    for col in EXPECTED_COLUMNS:
+        if col not in df.columns:
+            df[col] = 0
+    return df[list(EXPECTED_COLUMNS)]
+
+
+def legacy_predict(model, features):
+    df = legacy_preprocess(features)
+    prediction = model.predict(df)[0]
+    prob = model.predict_proba(df)[0][1]
+    return prediction, prob
+
+
+def lean_predict(model, vectorizer, features):
+    prob = model.predict_proba(vectorizer.transform_one(features))[0][1]
+    return int(prob > 0.5), prob
+
+
+def bench(label, fn, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(SAMPLES[i % len(SAMPLES)])
+    per_call = (time.perf_counter() - start) / iterations
+    print(f"{label:<28} {per_call * 1e6:10.1f} us/call")
+    return per_call
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    model = joblib.load("model/final_hybrid_model.pkl")
+    vectorizer = FeatureVectorizer()
+    vectorizer.check_model(model)
+
+    for features in SAMPLES:
+        old_label, old_prob = legacy_predict(model, features)
+        new_label, new_prob = lean_predict(model, vectorizer, features)
+        assert old_label == new_label and np.isclose(old_prob, new_prob), (features, old_prob, new_prob)
+    print("outputs match on all samples\n")
+
+    old_pre = bench("preprocess (pandas)", legacy_preprocess, iterations)
+    new_pre = bench("preprocess (vectorizer)", vectorizer.transform_one, iterations)
+    old_total = bench("predict (pandas, 2 calls)", lambda f: legacy_predict(model, f), iterations)
+    new_total = bench("predict (vectorizer, 1 call)", lambda f: lean_predict(model, vectorizer, f), iterations)
+
+    print(f"\npreprocessing speed-up: {old_pre / new_pre:.1f}x")
+    print(f"end-to-end speed-up:    {old_total / new_total:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
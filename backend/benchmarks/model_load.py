@@ -0,0 +1,62 @@
+# Load time and memory of the joblib pickle versus the memory-mapped native export.
+# Each format is loaded in a fresh interpreter, as a gunicorn worker would.
+#
+#   cd backend && python -m benchmarks.model_load
+
+import json
+import subprocess
+import sys
+
+CHILD = r"""
+import json, time, resource, warnings
+warnings.filterwarnings("ignore")
+import numpy as np
+
+def memory():
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:", "Shared_Clean:", "Private_Clean:", "Private_Dirty:"):
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields
+
+before = memory()
+start = time.perf_counter()
+if FORMAT == "joblib":
+    import joblib
+    model = joblib.load("model/final_hybrid_model.pkl")
+else:
+    from utils.native_model import NativeHybridModel
+    model = NativeHybridModel.load()
+load_s = time.perf_counter() - start
+X = np.zeros((1, 11), dtype=np.float32)
+model.predict_proba(X)
+after = memory()
+print(json.dumps({
+    "load_ms": load_s * 1000,
+    "rss_delta_kb": after["Rss"] - before["Rss"],
+    "private_delta_kb": after["Private_Dirty"] + after["Private_Clean"] - before["Private_Dirty"] - before["Private_Clean"],
+    "shared_clean_kb": after["Shared_Clean"],
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}))
+"""
+
+
+def measure(fmt):
+    out = subprocess.run(
+        [sys.executable, "-c", f"FORMAT = {fmt!r}\n" + CHILD],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    rows = {fmt: measure(fmt) for fmt in ("joblib", "native")}
+    print(f"{'':<8}{'load ms':>10}{'RSS +KB':>12}{'private +KB':>14}{'max RSS KB':>13}")
+    for fmt, r in rows.items():
+        print(f"{fmt:<8}{r['load_ms']:>10.1f}{r['rss_delta_kb']:>12}{r['private_delta_kb']:>14}{r['max_rss_kb']:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,8 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
 import joblib
 import numpy as np
+from utils.feature_vectorizer import EXPECTED_COLUMNS
+from utils.native_model import export_native_model
 
 # Ensure the 'model' folder exists
 os.makedirs("model", exist_ok=True)
@@ -19,8 +21,9 @@ df = pd.concat([
 # Drop rows where target 'fake' is NaN
 df = df.dropna(subset=["fake"])
 
-# Split features and target
-X = df.drop("fake", axis=1)
+# Split features and target; the column order must match what the
+# prediction route feeds the model (utils/feature_vectorizer.py)
+X = df[list(EXPECTED_COLUMNS)]
 y = df["fake"]
 
 # Optional: Split for evaluation
@@ -53,3 +56,7 @@ hybrid_model.fit(X, y)
 # Save model
 joblib.dump(hybrid_model, "model/final_hybrid_model.pkl")
 print("✅ Hybrid model trained and saved as model/final_hybrid_model.pkl")
+
+# Export the flat, memory-mappable version the prediction route loads
+export_native_model(hybrid_model, "model/native")
+print("✅ Native tree arrays exported to model/native/")
@@ -1,52 +1,23 @@
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from pymongo import DESCENDING, MongoClient
-from bson import ObjectId
-import os
-import jwt
-from functools import wraps
-from bson.errors import InvalidId
-from datetime import datetime
+from pymongo import DESCENDING
+from datetime import datetime, timedelta
+from routes.auth import token_required
+from utils.db import get_db
+from utils.metrics_store import get_metrics_store
+from utils.pagination import InvalidPageRequest, parse_datetime, parse_limit
+from utils.activity_events import EVENT_TYPES, feed, parse_since
+from utils.prediction_rollups import GRANULARITIES, TooManyBuckets, query_trends
 
 admin_analytics_bp = Blueprint('admin_analytics', __name__)
-client = MongoClient(os.getenv("MONGO_URL"))
-db = client["users"]
+db = get_db()
 
 users_collection = db["register"]
 reports_collection = db["report_history"]
 activities_collection = db["recent_activities"]  # optional if used later
 
-SECRET_KEY = os.getenv("SECRET_KEY")
-
-
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization', None)
-        if not token:
-            return jsonify({"message": "Missing token"}), 401
-
-        try:
-            token = token.split()[1]  # Remove "Bearer"
-            data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            user_id = data["user_id"]
-
-            try:
-                user_object_id = ObjectId(user_id)
-            except InvalidId:
-                return jsonify({"message": "Invalid token format"}), 401
-
-            current_user = users_collection.find_one({"_id": user_object_id})
-            if not current_user:
-                return jsonify({"message": "User not found"}), 401
-
-        except jwt.ExpiredSignatureError:
-            return jsonify({"message": "Token expired"}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({"message": "Invalid token"}), 401
-
-        return f(current_user, *args, **kwargs)
-    return decorated
+# Counters are maintained by the write paths; this periodically recounts them from the raw collections
+metrics = get_metrics_store()
+metrics.start_reconciler()
 
 
 @admin_analytics_bp.route('/api/admin/analytics', methods=['GET'])
@@ -55,12 +26,8 @@ def get_admin_analytics(current_user):
     if current_user.get("role") != "admin":
         return jsonify({"msg": "Admin access required"}), 401
 
-    # Count only users with role="user"
-    total_users = users_collection.count_documents({"role": "user"})
-    verified_users = users_collection.count_documents({"role": "user", "isVerified": True})
-    
-    total_reports = reports_collection.count_documents({})
-    pending_reports = reports_collection.count_documents({"status": "Pending"})
+    # Pre-aggregated counters (users count only role="user")
+    counters = metrics.read()
 
     # Fetch recent users with role "user"
     user_list = []
@@ -90,67 +57,80 @@ def get_admin_analytics(current_user):
         })
 
     return jsonify({
-        "totalUsers": total_users,
-        "verifiedUsers": verified_users,
-        "totalReports": total_reports,
-        "pendingReports": pending_reports,
+        "totalUsers": counters["users_total"],
+        "verifiedUsers": counters["users_verified"],
+        "totalReports": counters["reports_total"],
+        "pendingReports": counters["reports_pending"],
+        "totalPredictions": counters["predictions_total"],
+        "fakePredictions": counters["predictions_fake"],
         "recentUsers": user_list
     }), 200
 
 
-@admin_analytics_bp.route('/api/admin/recent-activities', methods=['GET'])
+@admin_analytics_bp.route('/api/admin/analytics/reconcile', methods=['POST'])
 @token_required
-def get_recent_activities(current_user):
+def reconcile_admin_analytics(current_user):
     if current_user.get("role") != "admin":
         return jsonify({"msg": "Admin access required"}), 401
 
-    recent_users = list(users_collection.find().sort("createdAt", DESCENDING).limit(5))
-    recent_reports = list(reports_collection.find().sort("dateReported", DESCENDING).limit(5))
-
-    activities = []
+    return jsonify(metrics.reconcile()), 200
 
-    # Add user registration activities
-    for user in recent_users:
-        timestamp = user.get("createdAt")
-        if isinstance(timestamp, (int, float)):
-            # If stored as UNIX timestamp seconds or milliseconds
-            if timestamp > 1e12:  # milliseconds
-                timestamp_dt = datetime.fromtimestamp(timestamp / 1000)
-            else:
-                timestamp_dt = datetime.fromtimestamp(timestamp)
-        elif isinstance(timestamp, datetime):
-            timestamp_dt = timestamp
-        else:
-            timestamp_dt = datetime.utcnow()
 
-        activities.append({
-            "description": f"New user registered: {user.get('fullname', 'Unknown')}",
-            "timestamp": timestamp_dt.strftime("%Y-%m-%d %H:%M")
-        })
-
-    # Add report submission activities, showing submitter's email from 'userEmail' field
-    for report in recent_reports:
-        submitted_email = report.get('userEmail', 'unknown')
+# Query: from, to (ISO 8601, default the last 24h), granularity=minute|hour|day (picked from the range if omitted)
+@admin_analytics_bp.route('/api/admin/prediction-trends', methods=['GET'])
+@token_required
+def get_prediction_trends(current_user):
+    if current_user.get("role") != "admin":
+        return jsonify({"msg": "Admin access required"}), 401
 
-        timestamp = report.get("dateReported")
-        if isinstance(timestamp, (int, float)):
-            if timestamp > 1e12:  # milliseconds
-                timestamp_dt = datetime.fromtimestamp(timestamp / 1000)
-            else:
-                timestamp_dt = datetime.fromtimestamp(timestamp)
-        elif isinstance(timestamp, datetime):
-            timestamp_dt = timestamp
-        else:
-            timestamp_dt = datetime.utcnow()
+    try:
+        end = parse_datetime(request.args.get("to"), "to") or datetime.utcnow()
+        start = parse_datetime(request.args.get("from"), "from") or end - timedelta(days=1)
+    except InvalidPageRequest as e:
+        return jsonify({"error": str(e)}), 400
+
+    granularity = request.args.get("granularity")
+    if granularity and granularity not in GRANULARITIES:
+        return jsonify({"error": f"granularity must be one of {', '.join(GRANULARITIES)}"}), 400
+    if start >= end:
+        return jsonify({"error": "from must be before to"}), 400
+
+    try:
+        trends = query_trends(start, end, granularity)
+    except TooManyBuckets as e:
+        return jsonify({"error": str(e)}), 400
+    trends.update({"from": start.isoformat(), "to": end.isoformat()})
+    return jsonify(trends), 200
+
+
+# Query: limit (default 8), since (cursor from a previous response or ISO 8601), types=signup,login,report,prediction.
+# Poll with since=<latest> to receive only events that happened after the previous response;
+# has_more=true means the next page is already waiting and can be fetched straight away.
+@admin_analytics_bp.route('/api/admin/recent-activities', methods=['GET'])
+@token_required
+def get_recent_activities(current_user):
+    if current_user.get("role") != "admin":
+        return jsonify({"msg": "Admin access required"}), 401
 
-        activities.append({
-            "description": f"New report submitted by {submitted_email}",
-            "timestamp": timestamp_dt.strftime("%Y-%m-%d %H:%M")
-        })
+    try:
+        limit = parse_limit(request.args.get("limit"), 8, 500)
+        since = parse_since(request.args.get("since"))
+    except InvalidPageRequest as e:
+        return jsonify({"error": str(e)}), 400
 
-    # Sort combined activities by timestamp descending
-    activities.sort(key=lambda x: x['timestamp'], reverse=True)
+    types = [t for t in request.args.get("types", "").split(",") if t]
+    if any(t not in EVENT_TYPES for t in types):
+        return jsonify({"error": f"types must be among {', '.join(EVENT_TYPES)}"}), 400
 
+    events, latest, has_more = feed(limit=limit, since=since, types=types)
     return jsonify({
-        "activities": activities[:8]  # limit to last 8 actions
+        "activities": [{
+            "type": event["type"],
+            "description": event["description"],
+            "timestamp": event["ts"].strftime("%Y-%m-%d %H:%M"),
+            "ts": event["ts"].isoformat() + "Z",
+        } for event in events],
+        # Echo the caller's position when nothing new arrived so polling can continue from it
+        "latest": latest or request.args.get("since"),
+        "has_more": has_more,
     })
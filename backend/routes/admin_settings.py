@@ -1,59 +1,24 @@
-from flask import Blueprint, request, jsonify
-from functools import wraps
-from pymongo import MongoClient
-from bson import ObjectId
-from bson.errors import InvalidId
-import os
-import jwt
+import json
+
+from flask import Blueprint, Response, request, jsonify
+from routes.auth import token_required, admin_required, principal_cache
+from utils.db import get_db, pool_stats
+from utils.job_queue import get_job_queue
+from utils.email_utils import smtp_connection
+from utils.password_hashing import password_hasher
+from utils.google_verify import verification_client
+from utils.write_behind import get_write_buffer
+from utils.latency import snapshot_all
+from utils import request_profiler
 
 admin_settings_bp = Blueprint("admin_settings", __name__)
 
-# Connect to MongoDB
-client = MongoClient(os.getenv("MONGO_URL"))
-db = client["users"]
+# Shared MongoDB connection
+db = get_db()
 
 # Collections
-users_collection = db["register"]
-reports_collection = db["report_history"]
 SETTINGS_COLLECTION = db["settings"]
 
-SECRET_KEY = os.getenv("SECRET_KEY")
-
-# ----------------------------- #
-# JWT token verification decorator
-# ----------------------------- #
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization', None)
-        if not token:
-            return jsonify({"message": "Missing token"}), 401
-
-        try:
-            token = token.split()[1]  # Strip "Bearer"
-            data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            user_id = data.get("user_id")
-            user_object_id = ObjectId(user_id)
-            current_user = users_collection.find_one({"_id": user_object_id})
-            if not current_user:
-                return jsonify({"message": "User not found"}), 401
-        except (jwt.ExpiredSignatureError, jwt.InvalidTokenError, InvalidId):
-            return jsonify({"message": "Invalid or expired token"}), 401
-
-        return f(current_user, *args, **kwargs)
-    return decorated
-
-# ----------------------------- #
-# Admin-only route decorator
-# ----------------------------- #
-def admin_required(fn):
-    @wraps(fn)
-    def wrapper(current_user, *args, **kwargs):
-        if current_user.get("role") != "admin":
-            return jsonify({"error": "Admin access required"}), 403
-        return fn(current_user, *args, **kwargs)
-    return wrapper
-
 # ----------------------------- #
 # Helper: Get or create settings
 # ----------------------------- #
@@ -104,3 +69,88 @@ def update_settings(current_user):
         return jsonify({"message": "Settings updated successfully"}), 200
     else:
         return jsonify({"message": "No changes made"}), 200
+
+# ----------------------------- #
+# GET: MongoDB connection pool statistics
+# ----------------------------- #
+@admin_settings_bp.route("/api/admin/db-pool", methods=["GET"])
+@token_required
+@admin_required
+def get_db_pool_stats(current_user):
+    return jsonify({
+        **pool_stats(),
+        "principal_cache": principal_cache.stats(),
+        "write_behind": get_write_buffer().stats(),
+    }), 200
+
+
+# ----------------------------- #
+# GET: Background job queue and SMTP connection statistics
+# ----------------------------- #
+@admin_settings_bp.route("/api/admin/jobs", methods=["GET"])
+@token_required
+@admin_required
+def get_job_stats(current_user):
+    return jsonify({**get_job_queue().stats(), "smtp": smtp_connection.stats()}), 200
+
+
+# ----------------------------- #
+# GET: Password hashing pool and bcrypt latency histograms
+# ----------------------------- #
+@admin_settings_bp.route("/api/admin/password-hashing", methods=["GET"])
+@token_required
+@admin_required
+def get_password_hashing_stats(current_user):
+    return jsonify({**password_hasher.stats(), "latency": snapshot_all("bcrypt_")}), 200
+
+
+@admin_settings_bp.route("/api/admin/verification", methods=["GET"])
+@token_required
+@admin_required
+def get_verification_stats(current_user):
+    return jsonify({**verification_client.stats(), "latency": snapshot_all("verify_")}), 200
+
+
+# ----------------------------- #
+# GET: Request profiles (X-Profile: 1 / ?profile=1 from an admin, or PROFILE_SAMPLE_RATE)
+# ----------------------------- #
+def profile_download(stacks, name, interval_ms=None):
+    if request.args.get("format") == "speedscope":
+        speedscope = request_profiler.to_speedscope(stacks, name, interval_ms)
+        body, ext, mimetype = json.dumps(speedscope), "speedscope.json", "application/json"
+    else:
+        body, ext, mimetype = request_profiler.to_collapsed(stacks), "collapsed.txt", "text/plain"
+    return Response(body, mimetype=mimetype,
+                    headers={"Content-Disposition": f'attachment; filename="{name}.{ext}"'})
+
+
+@admin_settings_bp.route("/api/admin/profiles", methods=["GET"])
+@token_required
+@admin_required
+def list_profiles(current_user):
+    limit = min(max(request.args.get("limit", 100, type=int), 1), 1000)
+    return jsonify({
+        "sample_rate": request_profiler.PROFILE_SAMPLE_RATE,
+        "profiles": request_profiler.list_profiles(request.args.get("endpoint"), request.args.get("reason"), limit),
+    }), 200
+
+
+@admin_settings_bp.route("/api/admin/profiles/merged", methods=["GET"])
+@token_required
+@admin_required
+def download_merged_profile(current_user):
+    endpoint, reason = request.args.get("endpoint"), request.args.get("reason")
+    stacks, count = request_profiler.merged_stacks(endpoint, reason)
+    if not count:
+        return jsonify({"error": "No matching profiles"}), 404
+    return profile_download(stacks, f"merged-{endpoint or 'all'}-{count}")
+
+
+@admin_settings_bp.route("/api/admin/profiles/<profile_id>", methods=["GET"])
+@token_required
+@admin_required
+def download_profile(current_user, profile_id):
+    meta = request_profiler.get_meta(profile_id) if request_profiler.valid_id(profile_id) else None
+    if meta is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return profile_download(request_profiler.read_stacks(profile_id), profile_id, meta["interval_ms"])
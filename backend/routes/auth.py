@@ -1,34 +1,146 @@
 from functools import wraps
 from flask import request, jsonify, current_app
 import jwt
+import os
+import threading
+import time
 from bson import ObjectId
-from pymongo import MongoClient
+from bson.errors import InvalidId
+from utils.db import get_db
+from utils import tracing
 
-client = MongoClient("mongodb://localhost:27017")
-db = client["users"]
+db = get_db()
 users_collection = db["register"]
 
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))  # seconds
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+# The only user fields route handlers read; everything else stays in the database
+PRINCIPAL_FIELDS = {"role": 1, "email": 1, "fullname": 1, "isVerified": 1}
+
+
+class PrincipalCache:
+    """Short-lived in-process cache of authenticated users keyed by ``user_id``.
+
+    Writes that change a user call ``invalidate`` so this worker sees them at
+    once; other workers pick them up when their entry expires.
+    """
+
+    def __init__(self, ttl=PRINCIPAL_CACHE_TTL, max_entries=PRINCIPAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > time.monotonic():
+                self._counters["hits"] += 1
+                return dict(entry[1])
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, user_id, principal):
+        if self.ttl <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Drop expired entries first, then the oldest insertions
+                for key in [k for k, (exp, _) in self._entries.items() if exp <= now]:
+                    del self._entries[key]
+                while len(self._entries) >= self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+            self._entries[user_id] = (now + self.ttl, dict(principal))
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._counters["invalidations"] += 1
+            self._entries.pop(str(user_id), None)
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries)}
+
+
+principal_cache = PrincipalCache()
+
+
+def invalidate_principal(user_id):
+    principal_cache.invalidate(user_id)
+
+
+def get_bearer_token():
+    auth_header = request.headers.get('Authorization', '')
+    parts = auth_header.split()
+    if len(parts) == 2 and parts[0] == 'Bearer':
+        return parts[1]
+    if len(parts) == 1:
+        return parts[0]
+    return None
+
+
+def decode_token(token):
+    return jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+
+
+def load_user(user_id):
+    user_id = str(user_id)
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    principal = users_collection.find_one({"_id": ObjectId(user_id)}, PRINCIPAL_FIELDS)
+    if principal:
+        principal_cache.put(user_id, principal)
+    return principal
+
+
+def current_principal():
+    """The authenticated user of this request, or None; for hooks that run outside @token_required."""
+    token = get_bearer_token()
+    if not token:
+        return None
+    try:
+        return load_user(decode_token(token)["user_id"])
+    except (jwt.InvalidTokenError, InvalidId, KeyError, TypeError):
+        return None
+
+
+# JWT token verification decorator shared by every blueprint; passes the cached
+# principal (_id, role, email, fullname, isVerified) as the first argument
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization', None)
+        token = get_bearer_token()
         if not token:
             return jsonify({"message": "Missing token"}), 401
 
         try:
-            if "Bearer " in token:
-                token = token.split(" ")[1]
-
-            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
-            current_app.logger.info(f"Decoded JWT: {data}")
+            with tracing.stage("jwt_decode"):
+                data = decode_token(token)
+            with tracing.stage("user_lookup"):
+                user = load_user(data["user_id"])
+        except jwt.ExpiredSignatureError:
+            return jsonify({"message": "Token expired"}), 401
+        except (jwt.InvalidTokenError, InvalidId, KeyError, TypeError) as e:
+            current_app.logger.warning(f"Token error: {e}")
+            return jsonify({"message": "Invalid token"}), 401
 
-            user = users_collection.find_one({"_id": ObjectId(data["user_id"])})
-            if not user:
-                return jsonify({"message": "User not found"}), 401
-
-        except Exception as e:
-            current_app.logger.error(f"Token error: {e}")
-            return jsonify({"message": "Unauthorized"}), 401
+        if not user:
+            return jsonify({"message": "User not found"}), 401
 
         return f(user, *args, **kwargs)
     return decorated
+
+
+# Admin-only route decorator; goes below @token_required
+def admin_required(fn):
+    @wraps(fn)
+    def wrapper(current_user, *args, **kwargs):
+        if current_user.get("role") != "admin":
+            return jsonify({"error": "Admin access required"}), 403
+        return fn(current_user, *args, **kwargs)
+    return wrapper
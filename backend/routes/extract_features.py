@@ -1,74 +1,60 @@
 import instaloader
-from playwright.sync_api import sync_playwright
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
 from bs4 import BeautifulSoup
 import subprocess
 import requests
-import time
 import os
 from requests_html import HTMLSession
 from instaloader.exceptions import ProfileNotExistsException
 from dotenv import load_dotenv
+from utils.instaloader_pool import get_session_pool, NoSessionAvailable
+from utils.fallback_race import FallbackRacer, time_left
+from utils.browser_pool import BROWSER_CHECKOUT_TIMEOUT
+from utils.browser_pool import get_playwright_pool, get_selenium_pool
+from utils.rate_limiter import RATE_LIMIT_WAIT, acquire_scrape
+from utils import tracing
 
 load_dotenv()
 
+# Overridable so the scrapers can be pointed at a local stand-in server
+INSTAGRAM_BASE_URL = os.getenv("INSTAGRAM_BASE_URL", "https://www.instagram.com").rstrip("/")
+
+# Per-method timeout for the plain HTTP fallbacks (seconds)
+HTTP_FALLBACK_TIMEOUT = float(os.getenv("HTTP_FALLBACK_TIMEOUT", "10"))
+
+fallback_racer = FallbackRacer()
+
 def count_numbers_ratio(text):
     numbers = sum(char.isdigit() for char in text)
     return round(numbers / len(text), 2) if len(text) > 0 else 0
 
-def login_instaloader():
-    L = instaloader.Instaloader()
-    accounts = [
-        (os.getenv("IG_USERNAME1"), os.getenv("IG_PASSWORD1")),
-        (os.getenv("IG_USERNAME2"), os.getenv("IG_PASSWORD2")),
-        (os.getenv("IG_USERNAME3"), os.getenv("IG_PASSWORD3")),
-        (os.getenv("IG_USERNAME4"), os.getenv("IG_PASSWORD4")),
-    ]
-    for username, password in accounts:
-        if not username or not password:
-            continue
-        session_file = username
-        try:
-            print(f"[Login Attempt] Trying with account: {username}")
-            if os.path.exists(f"{session_file}.session"):
-                L.load_session_from_file(session_file)
-            else:
-                L.login(username, password)
-                L.save_session_to_file(session_file)
-            print(f"[Login Success] Logged in with: {username}")
-            return L
-        except Exception as e:
-            print(f"[Login Failed] {username}: {e}")
-    print("[Login Error] All accounts failed")
-    return None
-
 def get_instaloader_data(username):
-    L = login_instaloader()
-    if not L:
-        return None
     try:
-        profile = instaloader.Profile.from_username(L.context, username)
-        fullname = profile.full_name or ""
-        fullname_words = len(fullname.strip().split())
-        name_equals_username = int(fullname.strip().lower() == username.lower())
-        nums_len_username = count_numbers_ratio(username)
-        nums_len_fullname = count_numbers_ratio(fullname)
-        return {
-            "followers": profile.followers,
-            "followees": profile.followees,
-            "posts": profile.mediacount,
-            "is_business": int(profile.is_business_account),
-            "bio_length": len(profile.biography or ""),
-            "external_url": int(bool(profile.external_url)),
-            "has_profile_pic": int("blank" not in profile.profile_pic_url),
-            "fullname_words": fullname_words,
-            "name==username": name_equals_username,
-            "nums/length_username": nums_len_username,
-            "nums/length_fullname": nums_len_fullname
-        }
+        with get_session_pool().lease() as L:
+            with tracing.stage("profile_fetch"):
+                profile = instaloader.Profile.from_username(L.context, username)
+            fullname = profile.full_name or ""
+            fullname_words = len(fullname.strip().split())
+            name_equals_username = int(fullname.strip().lower() == username.lower())
+            nums_len_username = count_numbers_ratio(username)
+            nums_len_fullname = count_numbers_ratio(fullname)
+            return {
+                "followers": profile.followers,
+                "followees": profile.followees,
+                "posts": profile.mediacount,
+                "is_business": int(profile.is_business_account),
+                "bio_length": len(profile.biography or ""),
+                "external_url": int(bool(profile.external_url)),
+                "has_profile_pic": int("blank" not in profile.profile_pic_url),
+                "fullname_words": fullname_words,
+                "name==username": name_equals_username,
+                "nums/length_username": nums_len_username,
+                "nums/length_fullname": nums_len_fullname
+            }
+    except NoSessionAvailable as e:
+        print(f"[Login Error] {e}")
+        return None
     except Exception as e:
         if "does not exist" in str(e):
             print(f"[User Not Found] The username '{username}' does not exist.")
@@ -77,30 +63,36 @@ def get_instaloader_data(username):
         return None
 
 # ----------- Fallback Methods -----------
+# Each one first takes a token for this node's egress route; they scrape anonymously,
+# so no account budget is involved. Every wait is capped with time_left() so a method
+# that lost the race stops soon after the race deadline.
 
 def get_playwright_fallback(username):
+    # read_bio runs on a browser pool thread, so its timeouts are worked out here
+    goto_timeout, selector_timeout = time_left(20) * 1000, time_left(10) * 1000
+
+    def read_bio(page):
+        page.goto(f"{INSTAGRAM_BASE_URL}/{username}/", timeout=goto_timeout)
+        page.wait_for_selector("img", timeout=selector_timeout)
+        try:
+            return page.inner_text("section [role='presentation']")
+        except:
+            return ""
+
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            page.goto(f"https://www.instagram.com/{username}/", timeout=60000)
-            page.wait_for_selector("img", timeout=10000)
-            bio_text = ""
-            try:
-                bio_text = page.inner_text("section [role='presentation']")
-            except:
-                pass
-            browser.close()
-            return {"bio_length": len(bio_text)}
+        acquire_scrape(timeout=time_left(RATE_LIMIT_WAIT))
+        bio_text = get_playwright_pool().run(read_bio, timeout=time_left(BROWSER_CHECKOUT_TIMEOUT + 60))
+        return {"bio_length": len(bio_text)}
     except Exception as e:
         print(f"[Playwright Error] {e}")
         return {"bio_length": 0}
 
 def get_html_scraper_fallback(username):
     try:
+        acquire_scrape(timeout=time_left(RATE_LIMIT_WAIT))
         headers = {"User-Agent": "Mozilla/5.0"}
-        url = f"https://www.instagram.com/{username}/"
-        response = requests.get(url, headers=headers)
+        url = f"{INSTAGRAM_BASE_URL}/{username}/"
+        response = requests.get(url, headers=headers, timeout=time_left(HTTP_FALLBACK_TIMEOUT))
         if response.status_code != 200:
             print("[HTML Fallback] Failed to access profile.")
             return {"bio_length": 0}
@@ -117,15 +109,21 @@ def get_html_scraper_fallback(username):
 
 def get_selenium_fallback(username):
     try:
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
-        driver.get(f"https://www.instagram.com/{username}/")
-        time.sleep(5)
-        desc = driver.find_element("xpath", "//meta[@name='description']")
-        content = desc.get_attribute("content")
+        acquire_scrape(timeout=time_left(RATE_LIMIT_WAIT))
+        with get_selenium_pool().checkout(timeout=time_left(BROWSER_CHECKOUT_TIMEOUT)) as driver:
+            driver.set_page_load_timeout(time_left(20))
+            driver.get(f"{INSTAGRAM_BASE_URL}/{username}/")
+            # Wait for the description meta tag instead of a fixed sleep; login walls and
+            # consent pages have none, which is an empty result rather than a broken driver
+            try:
+                WebDriverWait(driver, time_left(5)).until(
+                    lambda d: d.find_elements("xpath", "//meta[@name='description']")
+                )
+                desc = driver.find_element("xpath", "//meta[@name='description']")
+                content = desc.get_attribute("content")
+            except TimeoutException:
+                content = None
         bio_length = len(content.split("-")[0].strip()) if content else 0
-        driver.quit()
         return {"bio_length": bio_length}
     except Exception as e:
         print(f"[Selenium Fallback Error] {e}")
@@ -133,11 +131,12 @@ def get_selenium_fallback(username):
 
 def get_requests_html_fallback(username):
     try:
+        acquire_scrape(timeout=time_left(RATE_LIMIT_WAIT))
         session = HTMLSession()
-        url = f"https://www.instagram.com/{username}/"
+        url = f"{INSTAGRAM_BASE_URL}/{username}/"
         headers = {"User-Agent": "Mozilla/5.0"}
-        response = session.get(url, headers=headers)
-        response.html.render(timeout=20)
+        response = session.get(url, headers=headers, timeout=time_left(HTTP_FALLBACK_TIMEOUT))
+        response.html.render(timeout=time_left(20))
         desc = response.html.find("meta[name='description']", first=True)
         bio_length = 0
         if desc:
@@ -150,9 +149,11 @@ def get_requests_html_fallback(username):
 
 def get_curl_fallback(username):
     try:
-        url = f"https://www.instagram.com/{username}/"
-        cmd = ["curl", "-sL", url, "-A", "Mozilla/5.0"]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE)
+        acquire_scrape(timeout=time_left(RATE_LIMIT_WAIT))
+        url = f"{INSTAGRAM_BASE_URL}/{username}/"
+        max_time = time_left(HTTP_FALLBACK_TIMEOUT)
+        cmd = ["curl", "-sL", url, "-A", "Mozilla/5.0", "--max-time", f"{max_time:.1f}"]
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, timeout=max_time + 5)
         soup = BeautifulSoup(result.stdout.decode(), "html.parser")
         desc = soup.find("meta", attrs={"name": "description"})
         bio_length = len(desc.get("content", "").split("-")[0].strip()) if desc else 0
@@ -173,27 +174,24 @@ def extract_features(username):
 
     if data:
         print("[Instaloader] Success:", data)
+        data["extraction_method"] = "instaloader"
         return data
 
     # If instaloader failed, use fallback scrapers
     print("[Fallback] Instaloader failed. Trying alternate methods...")
 
-    fallback_methods = [
-        get_playwright_fallback,
-        get_html_scraper_fallback,
-        get_selenium_fallback,
-        get_requests_html_fallback,
-        get_curl_fallback,
+    # Cheap HTTP scrapers race first; browsers only start if they all come back empty
+    fallback_tiers = [
+        [get_html_scraper_fallback, get_curl_fallback],
+        [get_playwright_fallback, get_selenium_fallback, get_requests_html_fallback],
     ]
 
     fallback_bio = 0
-    for method in fallback_methods:
-        print(f"[Fallback] Trying {method.__name__}...")
-        result = method(username)
-        print(f"[{method.__name__}] Result:", result)
-        if result.get("bio_length", 0) > 0:
-            fallback_bio = result["bio_length"]
-            break
+    with tracing.stage("fallback_race"):
+        winner, result = fallback_racer.race(fallback_tiers, username)
+    if winner:
+        print(f"[{winner}] Result:", result)
+        fallback_bio = result["bio_length"]
 
     final_data = {
         "followers": 0,
@@ -219,4 +217,6 @@ def extract_features(username):
         print("[Error] Username does not exist (based on fallback zero-data).")
         return {"error": "Username does not exist.", "status": "failed"}
 
+    # e.g. get_html_scraper_fallback -> html_scraper
+    final_data["extraction_method"] = winner[len("get_"):-len("_fallback")]
     return final_data
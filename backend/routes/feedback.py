@@ -1,71 +1,15 @@
 from flask import Blueprint, request, jsonify, current_app
-from pymongo import MongoClient, DESCENDING
-import jwt
+from pymongo import DESCENDING
 import datetime
-from functools import wraps
-import os
-from bson import ObjectId
-from bson.errors import InvalidId
+from routes.auth import token_required
+from utils.db import get_db
 
 # Blueprint setup
 feedback_bp = Blueprint("feedback", __name__)
 
 # MongoDB setup
-client = MongoClient(os.getenv("MONGO_URL", "mongodb://localhost:27017/"))
-db = client["users"]
+db = get_db()
 feedback_collection = db["feedback"]
-users_collection = db["register"]
-
-# Secret key
-SECRET_KEY = os.getenv("SECRET_KEY")
-
-# JWT token verification and return current_user
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        auth_header = request.headers.get("Authorization", None)
-        if not auth_header or not auth_header.startswith("Bearer "):
-            current_app.logger.warning("Missing or malformed Authorization header")
-            return jsonify({"message": "Missing or malformed token"}), 401
-
-        token = auth_header.split(" ")[1]
-
-        try:
-            # Decode JWT token
-            data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            user_id = data.get("user_id")
-
-            if not user_id:
-                current_app.logger.warning("Token missing user_id claim")
-                return jsonify({"message": "Invalid token structure"}), 401
-
-            try:
-                user_object_id = ObjectId(user_id)
-            except InvalidId:
-                current_app.logger.warning(f"Invalid user_id in token: {user_id}")
-                return jsonify({"message": "Invalid token format"}), 401
-
-            current_user = users_collection.find_one({"_id": user_object_id})
-            if not current_user:
-                current_app.logger.warning(f"No user found with ID: {user_id}")
-                return jsonify({"message": "User not found"}), 401
-
-            return f(current_user, *args, **kwargs)
-
-        except jwt.ExpiredSignatureError:
-            current_app.logger.warning("JWT token expired")
-            return jsonify({"message": "Token expired"}), 401
-        except jwt.DecodeError:
-            current_app.logger.warning("Error decoding JWT token")
-            return jsonify({"message": "Malformed or invalid token"}), 401
-        except jwt.InvalidTokenError as e:
-            current_app.logger.warning(f"Invalid token error: {str(e)}")
-            return jsonify({"message": "Invalid token"}), 401
-        except Exception as e:
-            current_app.logger.error(f"Unexpected token verification error: {str(e)}")
-            return jsonify({"message": "Token verification failed"}), 401
-
-    return decorated
 
 # Public route: Submit feedback
 @feedback_bp.route('/feedback', methods=['POST'])
@@ -0,0 +1,19 @@
+import hmac
+import os
+
+from flask import Blueprint, Response, request
+
+from routes.auth import get_bearer_token
+from utils import tracing
+
+metrics_bp = Blueprint("metrics", __name__)
+
+# Scrapers authenticate with this bearer token; unset leaves /metrics open (e.g. behind a private network)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics():
+    if METRICS_TOKEN and not hmac.compare_digest(get_bearer_token() or "", METRICS_TOKEN):
+        return Response("unauthorized\n", status=401, mimetype="text/plain")
+    return Response(tracing.render(), mimetype="text/plain; version=0.0.4")
@@ -1,31 +1,61 @@
-from flask import Blueprint, request, jsonify
-from functools import wraps
-from pymongo import MongoClient
-from bson.objectid import ObjectId
-from bson.errors import InvalidId
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_cors import cross_origin
 from dotenv import load_dotenv
-from routes.extract_features import extract_features
 from routes.real_accounts import REAL_BLOCKED_ACCOUNTS
-import pandas as pd
+from routes.auth import token_required
+from utils.db import get_db
+from utils import metrics_store, activity_events, write_behind
+from utils.prediction_rollups import record_predictions
+from utils import single_flight, scrape_queue, tracing
+from utils.scrape_queue import SCRAPER_MODE, ScrapeFailed, ScrapePending
+from utils.prediction_jobs import PredictionJobs, parse_job_id, public_job
+from utils.instaloader_pool import get_session_pool, load_scraper_accounts
+from utils.rate_limiter import scrape_budgets
+from utils.feature_cache import FeatureCache
+from utils.browser_pool import get_playwright_pool, get_selenium_pool
+from utils.feature_vectorizer import FeatureVectorizer
+from utils.native_model import NativeHybridModel, native_model_available
+from utils.pagination import (
+    NEXT_CURSOR_HEADER, InvalidPageRequest, paginated_response, parse_datetime, parse_fields, range_filter,
+)
+from concurrent.futures import ThreadPoolExecutor
 import joblib
-import jwt
+import warnings
 import os
+import json
 import logging
+import threading
+import time
 from datetime import datetime
 
 # ---------------------------- Setup ----------------------------
 load_dotenv()
-SECRET_KEY = os.getenv("SECRET_KEY")
 MODEL_VERSION = os.getenv("MODEL_VERSION", "v1.0")
-
-client = MongoClient(os.getenv("MONGO_URL"))
-db = client["users"]
-users_collection = db["register"]
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "500"))
+BATCH_EXTRACT_WORKERS = int(os.getenv("BATCH_EXTRACT_WORKERS", "8"))
+RESULTS_PAGE_SIZE = int(os.getenv("RESULTS_PAGE_SIZE", "100"))
+RESULTS_MAX_PAGE_SIZE = int(os.getenv("RESULTS_MAX_PAGE_SIZE", "1000"))
+PREDICTION_JOB_SSE_TIMEOUT = float(os.getenv("PREDICTION_JOB_SSE_TIMEOUT", "300"))  # longest one event stream stays open
+# Longest a prediction job waits on queued scrapes; kept below PREDICTION_JOB_LEASE
+PREDICTION_JOB_SCRAPE_DEADLINE = float(os.getenv("PREDICTION_JOB_SCRAPE_DEADLINE", "150"))
+SSE_HEARTBEAT = 15
+
+RESULT_FIELDS = ("user_id", "username", "features", "prediction", "model_version", "confidence", "timestamp", "note")
+# features is the bulk of each document and the admin table does not show it; ask for it with fields=
+DEFAULT_RESULT_FIELDS = tuple(f for f in RESULT_FIELDS if f != "features")
+
+db = get_db()
 results_collection = db["results"]
 
+vectorizer = FeatureVectorizer()
+
 try:
-    model = joblib.load("model/final_hybrid_model.pkl")
+    # Prefer the memory-mapped export (shared across workers); fall back to the pickle
+    if os.getenv("MODEL_FORMAT", "native") == "native" and native_model_available():
+        model = NativeHybridModel.load()
+    else:
+        model = joblib.load("model/final_hybrid_model.pkl")
+    vectorizer.check_model(model)
 except Exception as e:
     model = None
     logging.error(f"[Model Load Error] {e}")
@@ -33,71 +63,224 @@ except Exception as e:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-predict_bp = Blueprint("predict", __name__)
+# The model was fitted on a DataFrame; plain NumPy rows in the same column order are fine
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+feature_cache = FeatureCache()
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_EXTRACT_WORKERS, thread_name_prefix="batch-extract")
+
+def _warm_feature_cache():
+    try:
+        feature_cache.warm_from_results(results_collection)
+    except Exception as e:
+        logger.warning(f"[Feature Cache] Warm-up skipped: {e}")
+
+if os.getenv("FEATURE_CACHE_WARM", "1") == "1":
+    threading.Thread(target=_warm_feature_cache, name="feature-cache-warm", daemon=True).start()
 
-expected_columns = [
-    "profile pic", "nums/length username", "fullname words",
-    "nums/length fullname", "name==username", "description length",
-    "external URL", "private", "#posts", "#followers", "#follows"
-]
-
-# ------------------------ Token Decorator ------------------------
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = None
-        if 'Authorization' in request.headers:
-            parts = request.headers['Authorization'].split()
-            if len(parts) == 2 and parts[0] == 'Bearer':
-                token = parts[1]
-
-        if not token:
-            return jsonify({'error': 'Missing token'}), 401
+predict_bp = Blueprint("predict", __name__)
 
+# ------------------------ Cached Extraction ------------------------
+def scraper():
+    # Selenium, BS4 and the browser warm-up come with this module; in queue mode
+    # the web tier never loads it and scraper_worker.py processes do the work
+    from routes import extract_features
+    return extract_features
+
+if SCRAPER_MODE == "inline":
+    scraper()  # loaded at boot as before; app.py starts the browser warm-up
+
+def get_features(username):
+    hit, features = feature_cache.get(username)
+    tracing.incr("feature_cache_requests_total", result="hit" if hit else "miss")
+    if hit:
+        logger.info(f"[Feature Cache] Hit for @{username}")
+        if isinstance(features, dict):
+            features = {**features, "extraction_method": "cache"}
+        return features
+
+    if SCRAPER_MODE == "queue":
         try:
-            data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            user_id = data.get("user_id")
-            user = users_collection.find_one({'_id': ObjectId(user_id)})
-            if not user:
-                return jsonify({'error': 'User not found'}), 404
-        except (jwt.ExpiredSignatureError, jwt.InvalidTokenError, InvalidId) as e:
-            logger.error(f"[Token Error] {e}")
-            return jsonify({'error': 'Invalid or expired token'}), 401
-        except Exception as e:
-            logger.error(f"[Token Validation Failed] {e}")
-            return jsonify({'error': str(e)}), 500
-
-        return f(user, *args, **kwargs)
-    return decorated
-
-# ------------------------ Preprocessing ------------------------
-def preprocess_features(features: dict):
+            with tracing.stage("scrape_queue_wait"):
+                features = scrape_queue.scrape(username)  # ScrapePending propagates to the route
+        except ScrapeFailed as e:
+            logger.error(f"[Scrape Queue] @{username}: {e}")
+            return None
+    else:
+        with tracing.stage("extract_features"):
+            features = scraper().extract_features(username)
+    feature_cache.put(username, features)
+    # The cached dict is shared; callers pop extraction_method from their own copy
+    return dict(features) if isinstance(features, dict) else features
+
+def get_features_safe(username):
     try:
-        df = pd.DataFrame([features])
-        df = df.rename(columns={
-            "has_profile_pic": "profile pic",
-            "nums/length_username": "nums/length username",
-            "fullname_words": "fullname words",
-            "nums/length_fullname": "nums/length fullname",
-            "name==username": "name==username",
-            "bio_length": "description length",
-            "external_url": "external URL",
-            "posts": "#posts",
-            "followers": "#followers",
-            "followees": "#follows"
-        })
-        df["private"] = 0
-
-        for col in expected_columns:
-            if col not in df.columns:
-                df[col] = 0
-
-        return df[expected_columns]
+        return get_features(username)
+    except ScrapePending as e:
+        return e
     except Exception as e:
-        logger.error(f"[Preprocessing Error] {e}")
+        logger.error(f"[Extraction Error] @{username}: {e}")
         return None
 
+def feature_error(features):
+    """Return ``(error_payload, status_code)`` if extraction did not yield usable features."""
+    if features == "USER_NOT_FOUND":
+        return {"error": "Username does not exist. Try another username.", "status": "failed"}, 404
+
+    if not features or not isinstance(features, dict):
+        return {"error": "Feature extraction failed", "status": "failed"}, 400
+
+    if features.get("status") == "failed":
+        return {"error": features.get("error", "Username does not exist."), "status": "failed"}, 404
+
+    return None
+
+def run_prediction(username):
+    """Extraction and inference for one username, independent of who asked.
+
+    Returns ``{"features", "prediction", "confidence", "extraction_method"}``
+    or ``{"error": payload, "status": code}``; both are plain data so the
+    outcome can be handed to coalesced requests in other workers.
+    """
+    features = get_features(username)
+
+    error = feature_error(features)
+    if error:
+        payload, status = error
+        return {"error": payload, "status": status}
+    extraction_method = features.pop("extraction_method", "unknown")
+
+    # Single predict_proba call on a float32 row; the soft-voting label is
+    # the class with the higher averaged probability
+    with tracing.stage("preprocess"):
+        row = vectorizer.transform_one(features)
+    with tracing.stage("predict_proba"):
+        prob = float(model.predict_proba(row)[0][1])
+    return {
+        "features": features,
+        "prediction": "Fake" if prob > 0.5 else "Real",
+        "confidence": round(prob, 2),
+        "extraction_method": extraction_method,
+    }
+
 # ------------------------ Main Prediction Route ------------------------
+def predict_for_user(user, username):
+    """Predict ``username`` on behalf of ``user`` and record the result; returns ``(payload, status)``.
+
+    Shared by the synchronous route and async prediction jobs. Raises
+    ``ScrapePending`` when queue-mode scraping has not finished yet.
+    """
+    # ✅ Check if it's a known real account with restriction
+    if username in REAL_BLOCKED_ACCOUNTS:
+        restriction_reason = REAL_BLOCKED_ACCOUNTS[username]
+        logger.info(f"[Known Real Account] @{username} is real but restricted. Reason: {restriction_reason}")
+
+        result_data = {
+            "user_id": str(user["_id"]),
+            "username": username,
+            "features": {},
+            "prediction": "Real",
+            "model_version": MODEL_VERSION,
+            "confidence": 1.0,
+            "timestamp": datetime.utcnow(),
+            "note": restriction_reason,
+            "extraction_method": "known_account"
+        }
+        write_behind.insert("results", result_data)
+        metrics_store.predictions_recorded(["Real"])
+        record_predictions([result_data])
+        activity_events.predictions_made(user["_id"], [result_data])
+
+        return {
+            "username": username,
+            "prediction": "Real",
+            "confidence": 1.0,
+            "message": "This is a verified real account based on trusted sources.",
+            "note": restriction_reason
+        }, 200
+
+    # 🧠 Proceed to real-time feature extraction; concurrent requests for the
+    # same username share one extraction and model call
+    outcome, shared = single_flight.coalesce(
+        f"predict:{MODEL_VERSION}:{username}", lambda: run_prediction(username)
+    )
+    if "error" in outcome:
+        return outcome["error"], outcome["status"]
+    result = outcome["prediction"]
+    confidence = outcome["confidence"]
+
+    # Every caller still gets its own results record
+    result_data = {
+        "user_id": str(user["_id"]),
+        "username": username,
+        "features": dict(outcome["features"]),
+        "prediction": result,
+        "model_version": MODEL_VERSION,
+        "confidence": confidence,
+        "timestamp": datetime.utcnow(),
+        "extraction_method": "coalesced" if shared else outcome["extraction_method"]
+    }
+    tracing.annotate(method=result_data["extraction_method"], model_version=MODEL_VERSION)
+    tracing.incr("predictions_total", method=result_data["extraction_method"], model_version=MODEL_VERSION)
+
+    with tracing.stage("results_insert"):
+        write_behind.insert("results", result_data)
+    metrics_store.predictions_recorded([result])
+    record_predictions([result_data])
+    activity_events.predictions_made(user["_id"], [result_data])
+
+    logger.info(f"[Prediction] {username} → {result} ({confidence})")
+
+    return {
+        "username": username,
+        "prediction": result,
+        "confidence": confidence,
+        "message": f"This account appears to be {result.lower()} based on profile metrics."
+    }, 200
+
+def run_prediction_job(job):
+    # A job waits on a queued scrape instead of answering 202, but only until
+    # PREDICTION_JOB_SCRAPE_DEADLINE so a stalled scraper tier cannot hold a job worker
+    deadline = time.monotonic() + PREDICTION_JOB_SCRAPE_DEADLINE
+    while True:
+        try:
+            with tracing.trace(endpoint="prediction_job"):
+                return predict_for_user({"_id": job["user_id"]}, job["username"])
+        except ScrapePending as e:
+            pending = e.job_id
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ScrapePending(pending)
+            scrape_queue.wait(pending, remaining)
+        except ScrapePending:
+            logger.warning(f"[PredictionJobs] @{job['username']}: scrape {pending} still pending at the deadline")
+            scrape_queue.add_requester([pending], job["user_id"])
+            return {"error": "Timed out waiting for the profile to be fetched", "status": "failed",
+                    "scrape_job_id": str(pending)}, 504
+        except ScrapeFailed as e:
+            logger.error(f"[Scrape Queue] @{job['username']}: {e}")
+            return feature_error(None)
+
+prediction_jobs = PredictionJobs(run_prediction_job)
+if os.getenv("PREDICTION_JOBS_RESUME", "1") == "1":
+    prediction_jobs.start()
+
+# ------------------------ Metrics ------------------------
+# In-process state only; anything that needs a Mongo query stays on the admin endpoints
+tracing.register_collector("feature_cache", feature_cache.stats)
+tracing.register_collector("single_flight", single_flight.stats)
+tracing.register_collector("prediction_jobs", prediction_jobs.local_stats)
+if SCRAPER_MODE == "inline":
+    tracing.register_collector("fallbacks", lambda: scraper().fallback_racer.stats())
+    tracing.register_collector("instaloader_sessions", lambda: get_session_pool().stats())
+
+def job_links(job_id):
+    return {
+        "status_url": f"/predict/jobs/{job_id}",
+        "events_url": f"/predict/jobs/{job_id}/events"
+    }
+
 @predict_bp.route('/predict', methods=['POST'])
 @cross_origin()
 @token_required
@@ -112,118 +295,341 @@ def predict(user):
         if not username:
             return jsonify({"error": "Username is required"}), 400
 
-        # ✅ Check if it's a known real account with restriction
-        if username in REAL_BLOCKED_ACCOUNTS:
-            restriction_reason = REAL_BLOCKED_ACCOUNTS[username]
-            logger.info(f"[Known Real Account] @{username} is real but restricted. Reason: {restriction_reason}")
-
-            result_data = {
-                "user_id": str(user["_id"]),
-                "username": username,
-                "features": {},
-                "prediction": "Real",
-                "model_version": MODEL_VERSION,
-                "confidence": 1.0,
-                "timestamp": datetime.utcnow(),
-                "note": restriction_reason
-            }
-            results_collection.insert_one(result_data)
-
-            return jsonify({
-                "username": username,
-                "prediction": "Real",
-                "confidence": 1.0,
-                "message": "This is a verified real account based on trusted sources.",
-                "note": restriction_reason
-            }), 200
-
-        # 🧠 Proceed to real-time feature extraction
-        features = extract_features(username)
-
-        if features == "USER_NOT_FOUND":
-            return jsonify({
-                "error": "Username does not exist. Try another username.",
-                "status": "failed"
-            }), 404
-
-        if not features or not isinstance(features, dict):
-            return jsonify({
-                "error": "Feature extraction failed",
-                "status": "failed"
-            }), 400
-
-        if features.get("status") == "failed":
-            return jsonify({
-                "error": features.get("error", "Username does not exist."),
-                "status": "failed"
-            }), 404
-
-        df = preprocess_features(features)
-        if df is None or df.empty:
-            return jsonify({"error": "Failed to process features"}), 500
-
-        prediction = model.predict(df)[0]
-        prob = None
-        if hasattr(model, "predict_proba"):
-            try:
-                prob = model.predict_proba(df)[0][1]
-            except Exception as e:
-                logger.warning(f"[Probability Error] {e}")
-                prob = None
-
-        result = "Fake" if prediction == 1 else "Real"
+        # ?async=1: answer with a job id straight away; poll it or follow its event stream
+        if request.args.get("async") in ("1", "true"):
+            job_id = str(prediction_jobs.create(user["_id"], username))
+            links = job_links(job_id)
+            return jsonify({"job_id": job_id, "status": "queued", **links}), 202, {"Location": links["status_url"]}
 
-        result_data = {
-            "user_id": str(user["_id"]),
-            "username": username,
-            "features": features,
-            "prediction": result,
-            "model_version": MODEL_VERSION,
-            "confidence": round(prob, 2) if isinstance(prob, float) else None,
-            "timestamp": datetime.utcnow()
-        }
+        payload, status = predict_for_user(user, username)
+        return jsonify(payload), status
+
+    except ScrapePending as e:
+        scrape_queue.add_requester([e.job_id], user["_id"])
+        return jsonify({
+            "status": "pending",
+            "job_id": str(e.job_id),
+            "message": "Profile is still being fetched. Poll the job or try again shortly."
+        }), 202
+    except Exception as e:
+        logger.error(f"[Prediction Error] {e}")
+        return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
 
-        results_collection.insert_one(result_data)
+# ------------------------ Prediction Jobs ------------------------
+@predict_bp.route('/predict/jobs/<job_id>', methods=['GET'])
+@cross_origin()
+@token_required
+def prediction_job_status(user, job_id):
+    oid = parse_job_id(job_id)
+    job = prediction_jobs.get(oid, user) if oid else None
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(public_job(job)), 200
+
+@predict_bp.route('/predict/jobs/<job_id>/events', methods=['GET'])
+@cross_origin()
+@token_required
+def prediction_job_events(user, job_id):
+    """Server-sent events: a ``status`` event per state change, then ``result`` and the stream ends.
+
+    Needs the bearer token, so browsers read it with fetch() streaming rather than EventSource.
+    """
+    oid = parse_job_id(job_id)
+    job = prediction_jobs.get(oid, user) if oid else None
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    def events():
+        current = job
+        deadline = time.monotonic() + PREDICTION_JOB_SSE_TIMEOUT
+        while True:
+            body = json.dumps(public_job(current))
+            if current["status"] not in ("queued", "running"):
+                yield f"event: result\ndata: {body}\n\n"
+                return
+            yield f"event: status\ndata: {body}\n\n"
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    yield "event: timeout\ndata: {}\n\n"
+                    return
+                latest = prediction_jobs.wait_for_change(oid, current["status"], min(remaining, SSE_HEARTBEAT))
+                if latest is None:
+                    return
+                if latest["status"] != current["status"]:
+                    current = latest
+                    break
+                yield ": keep-alive\n\n"  # comment line; stops proxies closing an idle stream
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# ------------------------ Batch Prediction Route ------------------------
+@predict_bp.route('/predict/batch', methods=['POST'])
+@cross_origin()
+@token_required
+def predict_batch(user):
+    try:
+        if not model:
+            return jsonify({"error": "Model not loaded"}), 500
 
-        logger.info(f"[Prediction] {username} → {result} ({round(prob, 2) if isinstance(prob, float) else 'N/A'})")
+        data = request.get_json() or {}
+        usernames = data.get("usernames")
+        if not isinstance(usernames, list) or not usernames:
+            return jsonify({"error": "usernames must be a non-empty list"}), 400
+
+        # Normalise and de-duplicate while keeping the caller's order
+        usernames = list(dict.fromkeys(
+            str(u).strip().lower() for u in usernames if isinstance(u, str) and u.strip()
+        ))
+        if not usernames:
+            return jsonify({"error": "usernames must be a non-empty list"}), 400
+        if len(usernames) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"At most {MAX_BATCH_SIZE} usernames per batch"}), 400
+
+        now = datetime.utcnow()
+        items = {}
+        result_docs = []
+
+        for username in usernames:
+            if username in REAL_BLOCKED_ACCOUNTS:
+                restriction_reason = REAL_BLOCKED_ACCOUNTS[username]
+                items[username] = {
+                    "username": username,
+                    "prediction": "Real",
+                    "confidence": 1.0,
+                    "message": "This is a verified real account based on trusted sources.",
+                    "note": restriction_reason
+                }
+                result_docs.append({
+                    "user_id": str(user["_id"]),
+                    "username": username,
+                    "features": {},
+                    "prediction": "Real",
+                    "model_version": MODEL_VERSION,
+                    "confidence": 1.0,
+                    "timestamp": now,
+                    "note": restriction_reason,
+                    "extraction_method": "known_account"
+                })
+
+        to_extract = [u for u in usernames if u not in items]
+        extracted = dict(zip(to_extract, batch_executor.map(get_features_safe, to_extract)))
+
+        pending = [f.job_id for f in extracted.values() if isinstance(f, ScrapePending)]
+        scrape_queue.add_requester(pending, user["_id"])
+
+        scored = []
+        for username in to_extract:
+            features = extracted[username]
+            if isinstance(features, ScrapePending):
+                items[username] = {"username": username, "status": "pending", "job_id": str(features.job_id)}
+                continue
+            error = feature_error(features)
+            if error:
+                items[username] = {"username": username, **error[0]}
+            else:
+                scored.append((username, features, features.pop("extraction_method", "unknown")))
+
+        if scored:
+            with tracing.stage("preprocess"):
+                X = vectorizer.transform([features for _, features, _ in scored])
+            # One predict_proba call for the whole batch; the soft-voting label is
+            # the class with the higher averaged probability
+            with tracing.stage("predict_proba"):
+                probs = model.predict_proba(X)[:, 1]
+
+            for (username, features, extraction_method), prob in zip(scored, probs):
+                result = "Fake" if prob > 0.5 else "Real"
+                confidence = round(float(prob), 2)
+                items[username] = {
+                    "username": username,
+                    "prediction": result,
+                    "confidence": confidence,
+                    "message": f"This account appears to be {result.lower()} based on profile metrics."
+                }
+                result_docs.append({
+                    "user_id": str(user["_id"]),
+                    "username": username,
+                    "features": features,
+                    "prediction": result,
+                    "model_version": MODEL_VERSION,
+                    "confidence": confidence,
+                    "timestamp": now,
+                    "extraction_method": extraction_method
+                })
+
+        if result_docs:
+            write_behind.insert_many("results", result_docs)
+            metrics_store.predictions_recorded(doc["prediction"] for doc in result_docs)
+            record_predictions(result_docs)
+            activity_events.predictions_made(user["_id"], result_docs)
+
+        logger.info(f"[Batch Prediction] {len(scored)}/{len(usernames)} scored")
 
         return jsonify({
-            "username": username,
-            "prediction": result,
-            "confidence": round(prob, 2) if isinstance(prob, float) else None,
-            "message": f"This account appears to be {result.lower()} based on profile metrics."
+            "results": [items[u] for u in usernames],
+            "count": len(usernames)
         }), 200
 
     except Exception as e:
-        logger.error(f"[Prediction Error] {e}")
-        return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
+        logger.error(f"[Batch Prediction Error] {e}")
+        return jsonify({"error": f"Batch prediction failed: {str(e)}"}), 500
 
 # ------------------------ Admin Profile Results Route ------------------------
+def serialize_result(doc, fields=RESULT_FIELDS):
+    output = {
+        "_id": str(doc["_id"]),
+        "user_id": str(doc.get("user_id")),
+        "username": doc.get("username", ""),
+        "features": doc.get("features", {}),
+        "prediction": doc.get("prediction", ""),
+        "model_version": doc.get("model_version", MODEL_VERSION),
+        "confidence": doc.get("confidence", 0),
+        "timestamp": doc.get("timestamp").isoformat() if doc.get("timestamp") else None,
+        "note": doc.get("note", None)  # include reason if it exists
+    }
+    return {key: value for key, value in output.items() if key == "_id" or key in fields}
+
+
+def results_query(args):
+    query = range_filter("timestamp", parse_datetime(args.get("from"), "from"), parse_datetime(args.get("to"), "to"))
+    for field in ("prediction", "model_version"):
+        if args.get(field):
+            query[field] = args[field]
+    return query
+
+
+# Query: limit, cursor, fields, prediction, model_version, from, to, stream=1 (NDJSON).
+# With limit or cursor a page is a JSON array and the cursor for the next one comes back
+# in X-Next-Cursor; without either, every matching result is returned as before.
 @predict_bp.route('/admin/profile-results', methods=['GET'])
-@cross_origin()
+@cross_origin(expose_headers=[NEXT_CURSOR_HEADER])
 @token_required
 def admin_profile_results(user):
     if user.get("role") != "admin":
         return jsonify({"error": "Access denied. Admins only."}), 403
 
     try:
-        cursor = results_collection.find().sort("timestamp", -1)
-        output = []
-        for doc in cursor:
-            output.append({
-                "_id": str(doc["_id"]),
-                "user_id": str(doc.get("user_id")),
-                "username": doc.get("username", ""),
-                "features": doc.get("features", {}),
-                "prediction": doc.get("prediction", ""),
-                "model_version": doc.get("model_version", MODEL_VERSION),
-                "confidence": doc.get("confidence", 0),
-                "timestamp": doc.get("timestamp").isoformat() if doc.get("timestamp") else None,
-                "note": doc.get("note", None)  # include reason if it exists
-            })
-
-        return jsonify(output), 200
-
+        args = request.args
+        projection = parse_fields(args.get("fields"), RESULT_FIELDS, DEFAULT_RESULT_FIELDS)
+        fields = set(projection) | {"timestamp"}
+        return paginated_response(
+            results_collection, results_query(args), args, "timestamp", projection,
+            lambda doc: serialize_result(doc, fields), RESULTS_PAGE_SIZE, RESULTS_MAX_PAGE_SIZE,
+        ), 200
+
+    except InvalidPageRequest as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"[Admin Profile Results Error] {e}")
         return jsonify({"error": f"Failed to fetch profile results: {str(e)}"}), 500
+
+# ------------------------ Scrape Job Status ------------------------
+@predict_bp.route('/predict/scrape-jobs/<job_id>', methods=['GET'])
+@cross_origin()
+@token_required
+def scrape_job_status(user, job_id):
+    oid = scrape_queue.parse_job_id(job_id)
+    job = scrape_queue.get_job(oid, {"username": 1, "status": 1, "error": 1, "requested_by": 1}) if oid else None
+    # Only admins and users who were handed this job id may see it
+    if not job or (user.get("role") != "admin" and str(user["_id"]) not in job.get("requested_by", [])):
+        return jsonify({"error": "Job not found"}), 404
+
+    # Features stay server-side; POST /predict again once the job is done
+    return jsonify({
+        "job_id": job_id,
+        "username": job["username"],
+        "status": job["status"],
+        "error": job.get("error")
+    }), 200
+
+def scraper_tier_stats(component, local_stats):
+    # In queue mode the scrapers live in scraper_worker.py processes, which publish their stats
+    if SCRAPER_MODE == "queue":
+        return {w["_id"]: w.get(component) for w in scrape_queue.queue_stats()["workers"]}
+    return local_stats()
+
+# ------------------------ Admin Scrape Queue Stats ------------------------
+@predict_bp.route('/admin/scrape-queue', methods=['GET'])
+@cross_origin()
+@token_required
+def scrape_queue_stats(user):
+    if user.get("role") != "admin":
+        return jsonify({"error": "Access denied. Admins only."}), 403
+
+    return jsonify(scrape_queue.queue_stats()), 200
+
+# ------------------------ Admin Scraper Session Stats ------------------------
+@predict_bp.route('/admin/scraper-sessions', methods=['GET'])
+@cross_origin()
+@token_required
+def scraper_session_stats(user):
+    if user.get("role") != "admin":
+        return jsonify({"error": "Access denied. Admins only."}), 403
+
+    return jsonify(scraper_tier_stats("sessions", lambda: get_session_pool().stats())), 200
+
+# ------------------------ Admin Scraper Rate Limits ------------------------
+@predict_bp.route('/admin/scraper-budgets', methods=['GET'])
+@cross_origin()
+@token_required
+def scraper_budgets(user):
+    if user.get("role") != "admin":
+        return jsonify({"error": "Access denied. Admins only."}), 403
+
+    accounts = [username for username, _ in load_scraper_accounts()]
+    return jsonify(scrape_budgets(accounts)), 200
+
+# ------------------------ Admin Fallback Scraper Stats ------------------------
+@predict_bp.route('/admin/scraper-fallbacks', methods=['GET'])
+@cross_origin()
+@token_required
+def scraper_fallback_stats(user):
+    if user.get("role") != "admin":
+        return jsonify({"error": "Access denied. Admins only."}), 403
+
+    return jsonify(scraper_tier_stats("fallbacks", lambda: scraper().fallback_racer.stats())), 200
+
+# ------------------------ Admin Browser Pool Stats ------------------------
+@predict_bp.route('/admin/browser-pools', methods=['GET'])
+@cross_origin()
+@token_required
+def browser_pool_stats(user):
+    if user.get("role") != "admin":
+        return jsonify({"error": "Access denied. Admins only."}), 403
+
+    return jsonify(scraper_tier_stats("browser_pools", lambda: {
+        "playwright": get_playwright_pool().stats(),
+        "selenium": get_selenium_pool().stats()
+    })), 200
+
+# ------------------------ Admin Feature Cache Stats ------------------------
+@predict_bp.route('/admin/feature-cache', methods=['GET'])
+@cross_origin()
+@token_required
+def feature_cache_stats(user):
+    if user.get("role") != "admin":
+        return jsonify({"error": "Access denied. Admins only."}), 403
+
+    return jsonify(feature_cache.stats()), 200
+
+# ------------------------ Admin Prediction Coalescing Stats ------------------------
+@predict_bp.route('/admin/prediction-coalescing', methods=['GET'])
+@cross_origin()
+@token_required
+def prediction_coalescing_stats(user):
+    if user.get("role") != "admin":
+        return jsonify({"error": "Access denied. Admins only."}), 403
+
+    return jsonify(single_flight.stats()), 200
+
+# ------------------------ Admin Prediction Job Stats ------------------------
+@predict_bp.route('/admin/prediction-jobs', methods=['GET'])
+@cross_origin()
+@token_required
+def prediction_job_stats(user):
+    if user.get("role") != "admin":
+        return jsonify({"error": "Access denied. Admins only."}), 403
+
+    return jsonify(prediction_jobs.stats()), 200
@@ -1,61 +1,19 @@
-from flask import Blueprint, request, jsonify, current_app
-from pymongo import MongoClient
-import jwt
+from flask import Blueprint, request, jsonify
 import datetime
-from functools import wraps
-import os
-from bson import ObjectId
-from bson.errors import InvalidId
+from routes.auth import token_required
+from utils.db import get_db
+from utils import metrics_store, activity_events
+from utils.pagination import InvalidPageRequest, paginated_response
+from utils.report_queries import (
+    REPORTS_MAX_PAGE_SIZE, REPORTS_PAGE_SIZE, pick, report_projection, reports_filter,
+)
 
 report_bp = Blueprint('report_bp', __name__)
 
 # MongoDB Setup
-client = MongoClient(os.getenv("MONGO_URL"))
-db = client["users"]
-users_collection = db["register"]
+db = get_db()
 reports_collection = db["report_history"]
 
-# Secret key for JWT
-SECRET_KEY = os.getenv("SECRET_KEY")
-
-# JWT token verification decorator
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header:
-            return jsonify({"message": "Missing token"}), 401
-
-        parts = auth_header.split()
-        if len(parts) != 2 or parts[0] != "Bearer":
-            return jsonify({"message": "Invalid token format"}), 401
-
-        token = parts[1]
-        try:
-            data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            user_id = data.get("user_id")
-
-            try:
-                user_object_id = ObjectId(user_id)
-            except InvalidId:
-                return jsonify({"message": "Invalid user ID"}), 401
-
-            current_user = users_collection.find_one({"_id": user_object_id})
-            if not current_user:
-                return jsonify({"message": "User not found"}), 401
-
-        except jwt.ExpiredSignatureError:
-            return jsonify({"message": "Token expired"}), 401
-        except jwt.InvalidTokenError as e:
-            current_app.logger.error(f"JWT decode error: {e}")
-            return jsonify({"message": "Invalid token"}), 401
-        except Exception as e:
-            current_app.logger.error(f"Unexpected error in token validation: {e}")
-            return jsonify({"message": "Token is invalid"}), 401
-
-        return f(current_user, *args, **kwargs)
-    return decorated
-
 @report_bp.route('/reports', methods=['GET', 'POST'])
 @token_required
 def handle_reports(current_user):
@@ -79,23 +37,32 @@ def handle_reports(current_user):
         }
 
         result = reports_collection.insert_one(report_doc)
+        metrics_store.report_created(report_doc["status"])
+        activity_events.report_submitted(result.inserted_id, report_doc["userEmail"], username)
         report_doc["_id"] = str(result.inserted_id)
 
         return jsonify(report_doc), 201
 
     elif request.method == 'GET':
+        # Query: limit, cursor, status, fields, stream=1 (NDJSON); next page cursor in X-Next-Cursor.
+        # Without limit or cursor every matching report is returned, as the frontend lists expect.
         user_email = current_user.get("email")
-        cursor = reports_collection.find({"userEmail": user_email}).sort("dateReported", -1)
-
-        reports = []
-        for report in cursor:
-            reports.append({
-                "id": str(report["_id"]),
-                "username": report.get("username", ""),
-                "reason": report.get("reason", ""),
-                "status": report.get("status", "Pending"),
-                "dateReported": report.get("dateReported", "")
-            })
-
-        return jsonify(reports), 200
+        try:
+            projection = report_projection(request.args)
+
+            def serialize(report):
+                return pick({
+                    "id": str(report["_id"]),
+                    "username": report.get("username", ""),
+                    "reason": report.get("reason", ""),
+                    "status": report.get("status", "Pending"),
+                    "dateReported": report.get("dateReported", "")
+                }, {"id", *projection})
+
+            return paginated_response(
+                reports_collection, reports_filter(request.args, {"userEmail": user_email}), request.args,
+                "dateReported", projection, serialize, REPORTS_PAGE_SIZE, REPORTS_MAX_PAGE_SIZE,
+            ), 200
+        except InvalidPageRequest as e:
+            return jsonify({"error": str(e)}), 400
  
\ No newline at end of file
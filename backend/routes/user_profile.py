@@ -1,46 +1,16 @@
 from flask import Blueprint, request, jsonify
-from pymongo import MongoClient
-import jwt
 import datetime
-import requests
-from functools import wraps
-import os
-from bson import ObjectId
-import bcrypt
+from routes.auth import token_required, invalidate_principal
+from utils.password_hashing import hash_password
+from utils.db import get_db
+from utils import write_behind
+from utils.google_verify import verify_recaptcha
 
 user_profile = Blueprint('user_profile', __name__)
 
 # MongoDB Setup
-client = MongoClient(os.getenv("MONGO_URL"))
-db = client["users"]
+db = get_db()
 users_collection = db["register"]
-activity_collection = db["activity_history"]  # Add reference to activity collection
-
-# Secret key for JWT
-SECRET_KEY = os.getenv("SECRET_KEY")
-RECAPTCHA_SECRET = os.getenv("RECAPTCHA_SECRET_KEY")
-
-# JWT token verification decorator
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization', None)
-        if not token:
-            return jsonify({"message": "Missing token"}), 401
-
-        try:
-            token = token.split()[1]  # Extract token after "Bearer"
-            data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            current_user = users_collection.find_one({"_id": ObjectId(data["user_id"])})
-
-            if not current_user:
-                raise Exception("User not found")
-        except Exception as e:
-            print("JWT error:", e)
-            return jsonify({"message": "Token is invalid"}), 401
-
-        return f(current_user, *args, **kwargs)
-    return decorated
 
 # -------- GET PROFILE ----------
 @user_profile.route('/user/profile', methods=['GET'])
@@ -64,15 +34,7 @@ def update_profile(current_user):
         return jsonify({"message": "CAPTCHA is required"}), 400
 
     # Validate reCAPTCHA
-    verify_response = requests.post(
-        'https://www.google.com/recaptcha/api/siteverify',
-        data={
-            'secret': RECAPTCHA_SECRET,
-            'response': captcha
-        }
-    )
-    result = verify_response.json()
-    if not result.get("success"):
+    if not verify_recaptcha(captcha):
         return jsonify({"message": "CAPTCHA verification failed"}), 400
 
     update_data = {}
@@ -83,16 +45,17 @@ def update_profile(current_user):
 
     # Only update password if it's provided
     if new_password:
-        hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        hashed_password = hash_password(new_password)  # HashingBusy is answered with 503 by the app
         update_data["password"] = hashed_password
 
     # If there is any update data, add the updatedAt field and perform the update
     if update_data:
         update_data["updatedAt"] = datetime.datetime.utcnow()
         users_collection.update_one({"_id": current_user["_id"]}, {"$set": update_data})
+        invalidate_principal(current_user["_id"])
 
         # Log profile update activity
-        activity_collection.insert_one({
+        write_behind.insert("activity_history", {
             "user_id": current_user["_id"],
             "action": "Profile updated",
             "timestamp": datetime.datetime.utcnow(),
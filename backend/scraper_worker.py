@@ -0,0 +1,141 @@
+# Scraper tier: pulls username jobs from the scrape_jobs collection, runs
+# extract_features (Instaloader sessions, HTTP fallbacks, browsers) and writes
+# the features back. The web tier enqueues when SCRAPER_MODE=queue.
+#
+#   cd backend && python scraper_worker.py [threads]
+#
+# Run as many processes per node as its cores and RAM allow; every thread
+# holds at most one browser page at a time.
+
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from routes.extract_features import extract_features, fallback_racer  # noqa: E402
+from utils import scrape_queue  # noqa: E402
+from utils.browser_pool import get_playwright_pool, get_selenium_pool, start_warm_up  # noqa: E402
+from utils.instaloader_pool import get_session_pool  # noqa: E402
+from utils.rate_limiter import rate_limiter  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("scraper_worker")
+
+SCRAPER_WORKER_THREADS = int(os.getenv("SCRAPER_WORKER_THREADS", "4"))
+SCRAPER_IDLE_POLL = float(os.getenv("SCRAPER_IDLE_POLL", "1.0"))  # longest sleep between empty claims
+STATS_INTERVAL = 10
+# Well inside the lease, so a slow scrape (browser tier, rate-limit waits) keeps its job
+LEASE_RENEW_INTERVAL = scrape_queue.SCRAPE_JOB_LEASE / 3
+
+stop = threading.Event()
+counters = {"done": 0, "failed": 0, "retried": 0}
+counters_lock = threading.Lock()
+in_hand = {}  # job id -> job, for every job a thread of this process is scraping
+
+
+def count(name):
+    with counters_lock:
+        counters[name] += 1
+
+
+def process(job, worker_id):
+    username = job["username"]
+    started = time.monotonic()
+    with counters_lock:
+        in_hand[job["_id"]] = job
+    try:
+        features = extract_features(username)
+    except Exception as e:
+        logger.error(f"[Scraper] @{username} failed on attempt {job['attempts']}: {e}")
+        scrape_queue.fail(job, e)
+        count("failed" if job["attempts"] >= scrape_queue.SCRAPE_JOB_MAX_ATTEMPTS else "retried")
+        return
+    finally:
+        with counters_lock:
+            in_hand.pop(job["_id"], None)
+    scrape_queue.complete(job, features)
+    count("done")
+    logger.info(f"[Scraper] @{username} done in {time.monotonic() - started:.1f}s ({worker_id})")
+
+
+def run_thread(worker_id):
+    idle = 0.05
+    while not stop.is_set():
+        try:
+            job = scrape_queue.claim(worker_id)
+        except Exception as e:
+            logger.warning(f"[Scraper] Claim failed: {e}")
+            job = None
+        if job is None:
+            stop.wait(idle)
+            idle = min(idle * 2, SCRAPER_IDLE_POLL)
+            continue
+        idle = 0.05
+        process(job, worker_id)
+
+
+def renew_leases():
+    # Keeps going after SIGTERM: threads are still finishing the jobs in hand
+    while True:
+        time.sleep(LEASE_RENEW_INTERVAL)
+        with counters_lock:
+            jobs = list(in_hand.values())
+        for job in jobs:
+            try:
+                if not scrape_queue.renew(job):
+                    logger.warning(f"[Scraper] Lost the lease on @{job['username']}; its result will be dropped")
+            except Exception as e:
+                logger.warning(f"[Scraper] Could not renew the lease on @{job['username']}: {e}")
+
+
+def publish_stats(worker_id, threads):
+    while not stop.wait(STATS_INTERVAL):
+        with counters_lock:
+            jobs = dict(counters)
+        try:
+            scrape_queue.publish_worker_stats(worker_id, {
+                "threads": threads,
+                "jobs": jobs,
+                "sessions": get_session_pool().stats(),
+                "fallbacks": fallback_racer.stats(),
+                "browser_pools": {"playwright": get_playwright_pool().stats(), "selenium": get_selenium_pool().stats()},
+                "rate_limiter": rate_limiter.stats(),
+            })
+        except Exception as e:
+            logger.warning(f"[Scraper] Could not publish stats: {e}")
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else SCRAPER_WORKER_THREADS
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+    def shutdown(signum, frame):
+        logger.info("[Scraper] Stopping after the jobs in hand")
+        stop.set()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    start_warm_up()
+
+    workers = [threading.Thread(target=run_thread, args=(f"{worker_id}/{i}",), name=f"scraper-{i}")
+               for i in range(threads)]
+    for t in workers:
+        t.start()
+    threading.Thread(target=publish_stats, args=(worker_id, threads), name="scraper-stats", daemon=True).start()
+    threading.Thread(target=renew_leases, name="scraper-leases", daemon=True).start()
+    logger.info(f"[Scraper] {worker_id} running {threads} threads")
+    while any(t.is_alive() for t in workers):
+        for t in workers:
+            t.join(timeout=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from utils import write_behind
+from utils.db import get_db
+from utils.pagination import decode_cursor, encode_cursor, parse_datetime
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_EVENTS_RETENTION_DAYS = float(os.getenv("ACTIVITY_EVENTS_RETENTION_DAYS", "30"))  # 0 keeps events forever
+# Events are written behind the request, so the newest ones may still sit in another worker's
+# buffer; the feed holds back events younger than this so a poll cursor never passes them
+ACTIVITY_FEED_SETTLE = float(os.getenv("ACTIVITY_FEED_SETTLE", str(2 * write_behind.WRITE_BEHIND_INTERVAL)))  # seconds
+
+EVENT_TYPES = ("signup", "login", "report", "prediction")
+
+_collection = None
+
+
+def events_collection():
+    global _collection
+    if _collection is None:
+        _collection = get_db()["activity_events"]
+    return _collection
+
+
+# ------------------------ Timestamps ------------------------
+def to_utc(value):
+    """Normalise stored timestamps (datetime, epoch seconds or milliseconds) to a naive UTC datetime."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, (int, float)) and value > 0:
+        return datetime.utcfromtimestamp(value / 1000 if value > 1e12 else value)
+    return None
+
+
+def _now():
+    # BSON dates keep milliseconds; truncate so cursors compare equal to what is stored
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def _event(event_type, description, ts=None, **fields):
+    ts = ts or _now()
+    event = {"type": event_type, "ts": ts, "description": description, **fields}
+    if ACTIVITY_EVENTS_RETENTION_DAYS > 0:
+        event["expires_at"] = ts + timedelta(days=ACTIVITY_EVENTS_RETENTION_DAYS)
+    return event
+
+
+# ------------------------ Writes ------------------------
+def record(event_type, description, **fields):
+    """Append one event through the write-behind buffer; never fails the request that produced it."""
+    try:
+        write_behind.insert(events_collection().name, _event(event_type, description, **fields))
+    except Exception as e:
+        logger.warning(f"[Activity] Could not record {event_type} event: {e}")
+
+
+def record_many(events):
+    """Append events built with ``_event`` through the write-behind buffer."""
+    if not events:
+        return
+    try:
+        write_behind.insert_many(events_collection().name, events)
+    except Exception as e:
+        logger.warning(f"[Activity] Could not record {len(events)} events: {e}")
+
+
+# source_id ties signup and report events to their documents so backfill() does not duplicate them
+def user_signed_up(user_id, fullname, email):
+    record("signup", f"New user registered: {fullname or 'Unknown'}", user_id=user_id, email=email, source_id=user_id)
+
+
+def user_logged_in(user_id, email):
+    record("login", f"{email} logged in", user_id=user_id, email=email)
+
+
+def report_submitted(report_id, email, username):
+    record("report", f"New report submitted by {email or 'unknown'}", email=email, username=username,
+           source_id=report_id)
+
+
+def predictions_made(user_id, results):
+    record_many([
+        _event("prediction", f"@{r['username']} predicted {r['prediction']} ({r['confidence']})",
+               user_id=user_id, username=r["username"], prediction=r["prediction"])
+        for r in results
+    ])
+
+
+# ------------------------ Feed ------------------------
+def parse_since(value):
+    """``since`` is either a feed cursor or an ISO 8601 timestamp."""
+    if not value:
+        return None
+    try:
+        return decode_cursor(value)
+    except ValueError:
+        pass
+    return parse_datetime(value, "since"), None
+
+
+def feed(limit=8, since=None, types=None, collection=None):
+    """Newest events first, optionally only those after ``since``.
+
+    Returns ``(events, latest_cursor, has_more)``. Passing ``latest_cursor``
+    back as ``since`` returns what happened after it. With ``since`` the page
+    holds the *oldest* ``limit`` events past the cursor, so a burst larger
+    than one page is delivered over several polls instead of being skipped;
+    ``has_more`` says another page is already waiting.
+    """
+    query = {}
+    if types:
+        query["type"] = {"$in": list(types)}
+    if write_behind.WRITE_BEHIND_ENABLED and ACTIVITY_FEED_SETTLE > 0:
+        query["ts"] = {"$lte": _now() - timedelta(seconds=ACTIVITY_FEED_SETTLE)}
+    if since:
+        ts, event_id = since
+        if event_id:
+            query["$or"] = [{"ts": {"$gt": ts}}, {"ts": ts, "_id": {"$gt": event_id}}]
+        else:
+            query.setdefault("ts", {})["$gt"] = ts
+
+    collection = collection if collection is not None else events_collection()
+    if not since:
+        events = list(collection.find(query, {"expires_at": 0})
+                      .sort([("ts", DESCENDING), ("_id", DESCENDING)]).limit(limit))
+        latest = encode_cursor(events[0]["ts"], events[0]["_id"]) if events else None
+        return events, latest, False
+
+    # Page forward from the cursor; one extra document tells whether more are waiting
+    events = list(collection.find(query, {"expires_at": 0})
+                  .sort([("ts", ASCENDING), ("_id", ASCENDING)]).limit(limit + 1))
+    has_more = len(events) > limit
+    events = events[:limit]
+    latest = encode_cursor(events[-1]["ts"], events[-1]["_id"]) if events else None
+    return events[::-1], latest, has_more
+
+
+# ------------------------ Backfill ------------------------
+def backfill(db=None):
+    """Seed the stream from ``register`` and ``report_history``; safe to re-run.
+
+    Documents without a usable timestamp are skipped rather than dated "now".
+    """
+    db = db if db is not None else get_db()
+    ops = []
+    for user in db["register"].find({"role": "user"}, {"fullname": 1, "email": 1, "createdAt": 1}):
+        ts = to_utc(user.get("createdAt"))
+        if ts:
+            ops.append(_backfill_op(_event("signup", f"New user registered: {user.get('fullname') or 'Unknown'}",
+                                           ts=ts, user_id=user["_id"], email=user.get("email")), user["_id"]))
+    for report in db["report_history"].find({}, {"userEmail": 1, "username": 1, "dateReported": 1}):
+        ts = to_utc(report.get("dateReported"))
+        if ts:
+            ops.append(_backfill_op(_event("report", f"New report submitted by {report.get('userEmail', 'unknown')}",
+                                           ts=ts, email=report.get("userEmail"), username=report.get("username")),
+                                    report["_id"]))
+    for i in range(0, len(ops), 1000):
+        db["activity_events"].bulk_write(ops[i:i + 1000], ordered=False)
+    return len(ops)
+
+
+def _backfill_op(event, source_id):
+    event["source_id"] = source_id
+    return UpdateOne({"type": event["type"], "source_id": source_id}, {"$setOnInsert": event}, upsert=True)
+
+
+if __name__ == "__main__":
+    # Seed activity_events from existing users and reports:
+    #   cd backend && python -m utils.activity_events --backfill
+    logging.basicConfig(level=logging.INFO)
+    if "--backfill" in sys.argv[1:]:
+        print(json.dumps({"events": backfill()}))
+    else:
+        events, latest, _ = feed(limit=20)
+        print(json.dumps({"events": events, "latest": latest}, default=str, indent=2))
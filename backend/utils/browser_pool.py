@@ -0,0 +1,296 @@
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from dotenv import load_dotenv
+import logging
+import os
+import queue
+import threading
+import time
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------- Config ----------------------------
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_MAX_USES = int(os.getenv("BROWSER_MAX_USES", "50"))            # recycle a browser after N pages
+BROWSER_CHECKOUT_TIMEOUT = float(os.getenv("BROWSER_CHECKOUT_TIMEOUT", "10"))  # seconds
+BROWSER_POOL_PREWARM = os.getenv("BROWSER_POOL_PREWARM", "1") == "1"  # only honoured by start_warm_up()
+
+
+class BrowserPoolExhausted(Exception):
+    pass
+
+
+def _new_stats():
+    return {"checkouts": 0, "launches": 0, "recycles": 0, "health_failures": 0, "checkout_timeouts": 0}
+
+
+# ------------------------ Playwright ------------------------
+class _PlaywrightWorker(threading.Thread):
+    # Playwright's sync API is bound to the thread that started it, so every
+    # browser lives on its own thread and pages are handed out as jobs.
+
+    def __init__(self, pool, index):
+        super().__init__(name=f"playwright-{index}", daemon=True)
+        self.pool = pool
+        self.playwright = None
+        self.browser = None
+        self.uses = 0
+
+    def _launch(self):
+        self._close_browser()
+        self.browser = self.playwright.chromium.launch(headless=True)
+        self.uses = 0
+        self.pool._incr("launches")
+
+    def _close_browser(self):
+        if self.browser is not None:
+            try:
+                self.browser.close()
+            except Exception as e:
+                logger.warning(f"[Browser Pool] Closing Chromium failed: {e}")
+            self.browser = None
+
+    def _ensure_healthy(self):
+        if self.browser is None:
+            self._launch()
+        elif not self.browser.is_connected():
+            self.pool._incr("health_failures")
+            self._launch()
+        elif self.uses >= self.pool.max_uses:
+            self.pool._incr("recycles")
+            self._launch()
+
+    def run(self):
+        from playwright.sync_api import sync_playwright
+
+        with sync_playwright() as p:
+            self.playwright = p
+            try:
+                self._launch()
+            except Exception as e:
+                logger.warning(f"[Browser Pool] Launching Chromium failed: {e}")
+            while True:
+                job = self.pool._jobs.get()
+                if job is None:
+                    break
+                fn, future = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                context = None
+                try:
+                    self._ensure_healthy()
+                    self.uses += 1
+                    context = self.browser.new_context()
+                    future.set_result(fn(context.new_page()))
+                except Exception as e:
+                    future.set_exception(e)
+                finally:
+                    if context is not None:
+                        try:
+                            context.close()
+                        except Exception:
+                            # A dead context usually means a dead browser; relaunch next time
+                            self._close_browser()
+            self._close_browser()
+
+
+class PlaywrightPool:
+    """Fixed-size pool of warm headless Chromium browsers driven by Playwright.
+
+    ``run(fn)`` executes ``fn(page)`` on a fresh browser context, so pages never
+    share cookies, and returns its result.
+    """
+
+    def __init__(self, size=BROWSER_POOL_SIZE, max_uses=BROWSER_MAX_USES):
+        self.size = size
+        self.max_uses = max_uses
+        self._jobs = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._stats = _new_stats()
+
+    def _incr(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def start(self):
+        with self._lock:
+            if self._workers:
+                return
+            self._workers = [_PlaywrightWorker(self, i) for i in range(self.size)]
+        for worker in self._workers:
+            worker.start()
+
+    def run(self, fn, timeout=BROWSER_CHECKOUT_TIMEOUT + 60):
+        self.start()
+        self._incr("checkouts")
+        future = Future()
+        self._jobs.put((fn, future))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            # Drop the job if no browser picked it up in time
+            if future.cancel():
+                self._incr("checkout_timeouts")
+            raise
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "size": self.size,
+                "queued": self._jobs.qsize(),
+                "browser_uses": [w.uses for w in self._workers],
+            }
+
+    def close(self):
+        for _ in self._workers:
+            self._jobs.put(None)
+
+
+# ------------------------ Selenium ------------------------
+class SeleniumPool:
+    """Fixed-size pool of headless Chrome WebDriver sessions.
+
+    The chromedriver binary is resolved once per process instead of on every
+    fallback call. Drivers are checked for liveness on checkout and replaced
+    after ``max_uses`` page loads or on any error.
+    """
+
+    def __init__(self, size=BROWSER_POOL_SIZE, max_uses=BROWSER_MAX_USES):
+        self.size = size
+        self.max_uses = max_uses
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._driver_path = None
+        self._stats = _new_stats()
+
+    def _incr(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def install_driver(self):
+        with self._lock:
+            if self._driver_path is None:
+                from webdriver_manager.chrome import ChromeDriverManager
+
+                self._driver_path = ChromeDriverManager().install()
+            return self._driver_path
+
+    def _launch(self):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.chrome.service import Service
+
+        chrome_options = Options()
+        chrome_options.add_argument("--headless")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+        driver = webdriver.Chrome(service=Service(self.install_driver()), options=chrome_options)
+        self._incr("launches")
+        return [driver, 0]
+
+    @staticmethod
+    def _quit(entry):
+        try:
+            entry[0].quit()
+        except Exception as e:
+            logger.warning(f"[Browser Pool] Quitting Chrome failed: {e}")
+
+    def _is_healthy(self, entry):
+        try:
+            entry[0].execute_script("return 1")
+            return True
+        except Exception:
+            self._incr("health_failures")
+            return False
+
+    @contextmanager
+    def checkout(self, timeout=BROWSER_CHECKOUT_TIMEOUT):
+        if not self._slots.acquire(timeout=timeout):
+            self._incr("checkout_timeouts")
+            raise BrowserPoolExhausted("No Selenium driver available")
+        entry = None
+        try:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                entry = None
+            if entry is not None and (entry[1] >= self.max_uses or not self._is_healthy(entry)):
+                if entry[1] >= self.max_uses:
+                    self._incr("recycles")
+                self._quit(entry)
+                entry = None
+            if entry is None:
+                entry = self._launch()
+
+            self._incr("checkouts")
+            entry[1] += 1
+            yield entry[0]
+        except BaseException:
+            # Page-level errors leave the driver usable; only a dead session is discarded
+            if entry is not None and not self._is_healthy(entry):
+                self._quit(entry)
+                entry = None
+            raise
+        finally:
+            if entry is not None:
+                self._idle.put(entry)
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "size": self.size,
+                "idle": self._idle.qsize(),
+                "driver_installed": self._driver_path is not None,
+            }
+
+    def close(self):
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+_playwright_pool = None
+_selenium_pool = None
+_pools_lock = threading.Lock()
+
+
+def get_playwright_pool():
+    global _playwright_pool
+    with _pools_lock:
+        if _playwright_pool is None:
+            _playwright_pool = PlaywrightPool()
+        return _playwright_pool
+
+
+def get_selenium_pool():
+    global _selenium_pool
+    with _pools_lock:
+        if _selenium_pool is None:
+            _selenium_pool = SeleniumPool()
+        return _selenium_pool
+
+
+def warm_up_browser_pools():
+    # Resolve chromedriver and start the Playwright browsers before the first request needs them
+    start = time.perf_counter()
+    try:
+        get_selenium_pool().install_driver()
+        get_playwright_pool().start()
+        logger.info(f"[Browser Pool] Warmed up in {time.perf_counter() - start:.2f}s")
+    except Exception as e:
+        logger.warning(f"[Browser Pool] Warm-up failed: {e}")
+
+
+def start_warm_up():
+    """Warm the pools in the background; called by the processes that scrape, never on import."""
+    if BROWSER_POOL_PREWARM:
+        threading.Thread(target=warm_up_browser_pools, name="browser-pool-warm", daemon=True).start()
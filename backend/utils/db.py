@@ -0,0 +1,126 @@
+from pymongo import MongoClient, monitoring
+from dotenv import load_dotenv
+import os
+import threading
+
+load_dotenv()
+
+# ---------------------------- Config ----------------------------
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "users")
+
+
+def _int_env(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def client_options():
+    return {
+        "maxPoolSize": _int_env("MONGO_MAX_POOL_SIZE", 50),
+        "minPoolSize": _int_env("MONGO_MIN_POOL_SIZE", 0),
+        "maxIdleTimeMS": _int_env("MONGO_MAX_IDLE_TIME_MS", 60000),
+        "waitQueueTimeoutMS": _int_env("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000),
+        "connectTimeoutMS": _int_env("MONGO_CONNECT_TIMEOUT_MS", 5000),
+        "serverSelectionTimeoutMS": _int_env("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000),
+        "socketTimeoutMS": _int_env("MONGO_SOCKET_TIMEOUT_MS", 20000),
+        "readPreference": os.getenv("MONGO_READ_PREFERENCE", "primary"),
+        "appname": os.getenv("MONGO_APP_NAME", "instaguard"),
+    }
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Keeps running totals of connection pool events for sizing workers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {
+            "pools": 0,
+            "connections_created": 0,
+            "connections_closed": 0,
+            "checkouts": 0,
+            "checkins": 0,
+            "checkout_failures": 0,
+            "pool_clears": 0,
+            "open": 0,
+            "in_use": 0,
+            "waiting": 0,
+            "max_in_use": 0,
+            "max_waiting": 0,
+        }
+
+    def _update(self, **deltas):
+        with self._lock:
+            c = self.counters
+            for name, delta in deltas.items():
+                c[name] += delta
+            c["max_in_use"] = max(c["max_in_use"], c["in_use"])
+            c["max_waiting"] = max(c["max_waiting"], c["waiting"])
+
+    def pool_created(self, event):
+        self._update(pools=1)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._update(pool_clears=1)
+
+    def pool_closed(self, event):
+        self._update(pools=-1)
+
+    def connection_created(self, event):
+        self._update(connections_created=1, open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._update(connections_closed=1, open=-1)
+
+    def connection_check_out_started(self, event):
+        self._update(waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._update(waiting=-1, checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._update(waiting=-1, checkouts=1, in_use=1)
+
+    def connection_checked_in(self, event):
+        self._update(checkins=1, in_use=-1)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counters)
+
+
+_pool_listener = PoolStatsListener()
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide ``MongoClient``, shared by every blueprint."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(MONGO_URL, event_listeners=[_pool_listener], **client_options())
+    return _client
+
+
+def get_db():
+    return get_client()[MONGO_DB_NAME]
+
+
+def pool_stats():
+    options = client_options()
+    return {
+        **_pool_listener.snapshot(),
+        "max_pool_size": options["maxPoolSize"],
+        "min_pool_size": options["minPoolSize"],
+        "wait_queue_timeout_ms": options["waitQueueTimeoutMS"],
+        "read_preference": options["readPreference"],
+        "pid": os.getpid(),
+    }
@@ -1,37 +1,160 @@
 import smtplib
+import threading
+import time
+import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
+from dotenv import load_dotenv
+
+from utils.job_queue import QueueFull, get_job_queue
+
+load_dotenv()
+logger = logging.getLogger(__name__)
 
 EMAIL_USER = os.getenv("EMAIL_USER")
 EMAIL_PASS = os.getenv("EMAIL_PASS")
 
-def send_verification_email(to_email, token):
-    try:
-        verify_url = f"http://localhost:5000/verify-email/{token}"  # Replace with actual domain in production
-        subject = "Verify your email - InstaGuard"
-        html_content = f"""
-        <html>
-        <body>
-            <h3>Hello!</h3>
-            <p>Thanks for registering on <b>InstaGuard</b>.</p>
-            <p>Please click the button below to verify your email:</p>
-            <a href="{verify_url}" style="padding: 10px 20px; background-color: #007bff; color: white; text-decoration: none;">Verify Email</a>
-            <p>If you didn’t create this account, please ignore this email.</p>
-        </body>
-        </html>
-        """
-
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_USER
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(html_content, 'html'))
-
-        with smtplib.SMTP('smtp.gmail.com', 587) as smtp:
+# Point these at a local stand-in (e.g. aiosmtpd on port 8025, SMTP_STARTTLS=0) for testing
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "15"))
+SMTP_MAX_IDLE = float(os.getenv("SMTP_MAX_IDLE", "60"))  # seconds before an idle connection is re-checked
+APP_BASE_URL = os.getenv("APP_BASE_URL", "http://localhost:5000")
+
+
+# ---------------------------- Persistent SMTP ----------------------------
+class SMTPConnection:
+    """One logged-in SMTP session per worker thread, reused across messages.
+
+    ``smtplib.SMTP`` objects are not thread-safe, so each queue worker keeps
+    its own; a dropped or long-idle session is re-opened transparently.
+    """
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, starttls=SMTP_STARTTLS, user=EMAIL_USER, password=EMAIL_PASS,
+                 timeout=SMTP_TIMEOUT, max_idle=SMTP_MAX_IDLE):
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+        self.user = user
+        self.password = password
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters = {"connects": 0, "sent": 0, "reconnects": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
             smtp.starttls()
-            smtp.login(EMAIL_USER, EMAIL_PASS)
-            smtp.send_message(msg)
-            print(f"Verification email sent to {to_email}")
-    except Exception as e:
-        print(f"Failed to send verification email: {str(e)}")
+        if self.user and self.password:
+            smtp.login(self.user, self.password)
+        self._count("connects")
+        return smtp
+
+    def _session(self):
+        smtp = getattr(self._local, "smtp", None)
+        if smtp is not None and time.monotonic() - self._local.last_used > self.max_idle:
+            # Servers drop idle sessions; a NOOP is cheaper than a failed send
+            try:
+                if smtp.noop()[0] != 250:
+                    raise smtplib.SMTPServerDisconnected("NOOP rejected")
+            except smtplib.SMTPException:
+                self.close()
+                smtp = None
+        if smtp is None:
+            smtp = self._local.smtp = self._connect()
+            self._local.last_used = time.monotonic()
+        return smtp
+
+    def send(self, msg):
+        # A stale connection gets one retry on a fresh one; other failures go back to the job queue
+        for attempt in (1, 2):
+            try:
+                self._session().send_message(msg)
+                break
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                self.close()
+                if attempt == 2:
+                    raise
+                self._count("reconnects")
+            except Exception:
+                # The session may be mid-transaction; start clean on the next attempt
+                self.close()
+                raise
+        self._local.last_used = time.monotonic()
+        self._count("sent")
+
+    def close(self):
+        smtp = getattr(self._local, "smtp", None)
+        self._local.smtp = None
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except Exception:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+
+smtp_connection = SMTPConnection()
+
+
+def enqueue_email(msg, job_name="send_email"):
+    """Send ``msg`` from the background job queue; returns False if it could not be queued."""
+    try:
+        get_job_queue().submit(smtp_connection.send, msg, job_name=job_name)
+        return True
+    except QueueFull as e:
+        logger.error(f"Email to {msg['To']} not queued: {e}")
+        return False
+
+
+# ---------------------------- Messages ----------------------------
+def build_verification_email(to_email, token):
+    verify_url = f"{APP_BASE_URL}/verify-email/{token}"  # Replace with actual domain in production
+    subject = "Verify your email - InstaGuard"
+    html_content = f"""
+    <html>
+    <body>
+        <h3>Hello!</h3>
+        <p>Thanks for registering on <b>InstaGuard</b>.</p>
+        <p>Please click the button below to verify your email:</p>
+        <a href="{verify_url}" style="padding: 10px 20px; background-color: #007bff; color: white; text-decoration: none;">Verify Email</a>
+        <p>If you didn’t create this account, please ignore this email.</p>
+    </body>
+    </html>
+    """
+
+    msg = MIMEMultipart()
+    msg['From'] = EMAIL_USER
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(html_content, 'html'))
+    return msg
+
+
+def build_support_email(name, email, message):
+    support_email = EMAIL_USER
+    msg = MIMEText(f"Name: {name}\nEmail: {email}\nMessage:\n{message}")
+    msg["Subject"] = "User Support"
+    msg["From"] = support_email
+    msg["To"] = support_email
+    return msg
+
+
+def send_verification_email(to_email, token):
+    if enqueue_email(build_verification_email(to_email, token), job_name="verification_email"):
+        logger.info(f"Verification email to {to_email} queued")
+
+
+def send_support_email(name, email, message):
+    return enqueue_email(build_support_email(name, email, message), job_name="support_email")
@@ -0,0 +1,142 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+import logging
+import os
+import threading
+import time
+
+from utils import tracing
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------- Config ----------------------------
+FALLBACK_DEADLINE = float(os.getenv("FALLBACK_DEADLINE", "25"))   # seconds, across all tiers
+FALLBACK_WORKERS = int(os.getenv("FALLBACK_WORKERS", "8"))
+MIN_METHOD_TIMEOUT = 0.5  # seconds; what a method started right at the deadline still gets
+
+_local = threading.local()
+
+
+def time_left(cap):
+    """Timeout for one step of a fallback: ``cap``, cut to what is left before the race deadline.
+
+    Methods call this for every wait they make so a loser gives its worker
+    back soon after the race is decided instead of after its own timeouts.
+    """
+    deadline = getattr(_local, "deadline", None)
+    if deadline is None:
+        return cap
+    return max(MIN_METHOD_TIMEOUT, min(cap, deadline - time.monotonic()))
+
+
+class FallbackRacer:
+    """Races scraper fallbacks tier by tier under one overall deadline.
+
+    All methods of a tier start together and the first result with a non-zero
+    ``bio_length`` wins; the others are cancelled if they have not started yet
+    and otherwise left to finish with their result discarded; methods cap
+    their timeouts with ``time_left`` so that happens soon after the
+    deadline. A later tier only starts once every method of the previous tier
+    came back empty.
+    """
+
+    def __init__(self, max_workers=FALLBACK_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fallback")
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _record(self, name, elapsed=None, outcome="empty"):
+        tracing.incr("fallback_calls_total", fallback=name, outcome=outcome)
+        if elapsed is not None:
+            tracing.observe_stage("fallback", elapsed, fallback=name)
+        with self._lock:
+            stats = self._stats.setdefault(name, {
+                "calls": 0, "wins": 0, "empty": 0, "timeouts": 0, "total_seconds": 0.0, "last_seconds": None,
+            })
+            if outcome == "timeout":
+                stats["timeouts"] += 1
+                return
+            stats["calls"] += 1
+            stats["total_seconds"] += elapsed
+            stats["last_seconds"] = round(elapsed, 3)
+            if outcome == "empty":
+                stats["empty"] += 1
+
+    def _record_win(self, name):
+        with self._lock:
+            self._stats[name]["wins"] += 1
+
+    def _settle(self, call):
+        # A call is recorded once: by the race as a timeout, or by _timed when it returns
+        with self._lock:
+            if call["settled"]:
+                return False
+            call["settled"] = True
+            return True
+
+    def _timed(self, method, username, deadline, call):
+        _local.deadline = deadline
+        start = time.perf_counter()
+        try:
+            result = method(username) or {}
+        except Exception as e:
+            logger.warning(f"[Fallback] {method.__name__} raised: {e}")
+            result = {}
+        finally:
+            _local.deadline = None
+        elapsed = time.perf_counter() - start
+        if self._settle(call):
+            self._record(method.__name__, elapsed, "hit" if result.get("bio_length", 0) > 0 else "empty")
+        return method.__name__, elapsed, result
+
+    def _race_tier(self, methods, username, deadline):
+        calls = {}
+        for m in methods:
+            call = {"settled": False}
+            calls[self._executor.submit(self._timed, m, username, deadline, call)] = (m.__name__, call)
+        pending = set(calls)
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    for future in pending:
+                        name, call = calls[future]
+                        if self._settle(call):
+                            self._record(name, outcome="timeout")
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, elapsed, result = future.result()
+                    if result.get("bio_length", 0) > 0:
+                        self._record_win(name)
+                        logger.info(f"[Fallback] {name} won in {elapsed:.2f}s")
+                        return name, result
+            return None, None
+        finally:
+            # Losers that already started cannot be interrupted; they finish within
+            # time_left() of the deadline and their results are discarded
+            for future in pending:
+                future.cancel()
+
+    def race(self, tiers, username, timeout=FALLBACK_DEADLINE):
+        """Return ``(method_name, result)`` for the winning method, or ``(None, None)``."""
+        deadline = time.monotonic() + timeout
+        for methods in tiers:
+            if time.monotonic() >= deadline:
+                break
+            name, result = self._race_tier(methods, username, deadline)
+            if name:
+                return name, result
+        return None, None
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {
+                    **{k: v for k, v in s.items() if k != "total_seconds"},
+                    "avg_seconds": round(s["total_seconds"] / s["calls"], 3) if s["calls"] else None,
+                }
+                for name, s in self._stats.items()
+            }
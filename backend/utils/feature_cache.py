@@ -0,0 +1,148 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+import logging
+import os
+import sys
+import threading
+import time
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------- Config ----------------------------
+FEATURE_CACHE_SIZE = int(os.getenv("FEATURE_CACHE_SIZE", "5000"))
+FEATURE_CACHE_TTL = float(os.getenv("FEATURE_CACHE_TTL", "3600"))                    # seconds
+FEATURE_CACHE_NEGATIVE_TTL = float(os.getenv("FEATURE_CACHE_NEGATIVE_TTL", "120"))   # seconds
+
+
+def is_negative_result(features):
+    if features == "USER_NOT_FOUND":
+        return True
+    return isinstance(features, dict) and features.get("status") == "failed"
+
+
+def _sizeof(value):
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    return size
+
+
+class FeatureCache:
+    """Bounded TTL + LRU cache of ``extract_features`` results keyed by username.
+
+    Successful extractions live for ``ttl`` seconds; "not found" and failed
+    extractions are kept separately for the shorter ``negative_ttl`` so a typo
+    or a temporarily blocked profile does not stick around for an hour.
+    """
+
+    def __init__(self, max_entries=FEATURE_CACHE_SIZE, ttl=FEATURE_CACHE_TTL, negative_ttl=FEATURE_CACHE_NEGATIVE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # username -> (expires_at, value, size)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._counters = {"hits": 0, "negative_hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    @staticmethod
+    def _key(username):
+        return username.strip().lower()
+
+    def _drop(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, username):
+        """Return ``(hit, value)``; dict values are copies so callers may mutate them."""
+        key = self._key(username)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return False, None
+            expires_at, value, _ = entry
+            if expires_at <= time.monotonic():
+                self._drop(key)
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._counters["negative_hits" if is_negative_result(value) else "hits"] += 1
+        return True, dict(value) if isinstance(value, dict) else value
+
+    def put(self, username, value, ttl=None, replace=True):
+        """Store ``value`` and return whether it was stored; with ``replace=False`` an existing entry wins."""
+        if value is None:
+            return False
+        if ttl is None:
+            ttl = self.negative_ttl if is_negative_result(value) else self.ttl
+        if ttl <= 0:
+            return False
+        key = self._key(username)
+        stored = dict(value) if isinstance(value, dict) else value
+        size = _sizeof(key) + _sizeof(stored)
+        with self._lock:
+            if key in self._entries:
+                if not replace:
+                    return False
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl, stored, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+        return True
+
+    def invalidate(self, username):
+        with self._lock:
+            key = self._key(username)
+            if key in self._entries:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def warm_from_results(self, results_collection):
+        """Reload recent successful extractions from the ``results`` collection."""
+        now = datetime.utcnow()
+        cursor = results_collection.find(
+            {"timestamp": {"$gte": now - timedelta(seconds=self.ttl)}, "features.bio_length": {"$exists": True}},
+            {"username": 1, "features": 1, "timestamp": 1},
+        ).sort("timestamp", -1).limit(self.max_entries)
+
+        latest = []
+        seen = set()
+        # Newest first, so the first document per username is the one to keep
+        for doc in cursor:
+            username = doc.get("username")
+            if not username or self._key(username) in seen:
+                continue
+            seen.add(self._key(username))
+            latest.append(doc)
+
+        loaded = 0
+        # Oldest first so the newest entries end up most recently used; entries a live
+        # put() wrote during warm-up are fresher and are left alone
+        for doc in reversed(latest):
+            remaining = self.ttl - (now - doc["timestamp"]).total_seconds()
+            if remaining > 0 and self.put(doc["username"], doc["features"], ttl=remaining, replace=False):
+                loaded += 1
+        logger.info(f"[Feature Cache] Warmed {loaded} entries from results")
+        return loaded
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["negative_hits"] + self._counters["misses"]
+            hits = self._counters["hits"] + self._counters["negative_hits"]
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_bytes": self._bytes,
+            }
@@ -0,0 +1,57 @@
+import numpy as np
+
+# Column order of data/train.csv, which model_training.py fits the model on
+EXPECTED_COLUMNS = (
+    "profile pic", "nums/length username", "fullname words",
+    "nums/length fullname", "name==username", "description length",
+    "external URL", "private", "#posts", "#followers", "#follows"
+)
+
+# Training column -> key in the extract_features() dict. "private" is never
+# scraped and is always fed to the model as 0.
+FEATURE_KEYS = {
+    "profile pic": "has_profile_pic",
+    "nums/length username": "nums/length_username",
+    "fullname words": "fullname_words",
+    "nums/length fullname": "nums/length_fullname",
+    "name==username": "name==username",
+    "description length": "bio_length",
+    "external URL": "external_url",
+    "private": None,
+    "#posts": "posts",
+    "#followers": "followers",
+    "#follows": "followees",
+}
+
+
+class FeatureVectorizer:
+    """Maps ``extract_features`` dicts straight to float32 rows in training column order."""
+
+    def __init__(self, columns=EXPECTED_COLUMNS, feature_keys=FEATURE_KEYS):
+        self.columns = tuple(columns)
+        # Resolved once, so a row is a single pass over a tuple of keys
+        self._keys = tuple(feature_keys[c] for c in self.columns)
+        self.n_features = len(self.columns)
+
+    def _values(self, features):
+        for key in self._keys:
+            value = features.get(key) if key else None
+            yield float(value) if value else 0.0
+
+    def transform_one(self, features):
+        """Return a C-contiguous ``(1, n_features)`` float32 array."""
+        row = np.fromiter(self._values(features), dtype=np.float32, count=self.n_features)
+        return row.reshape(1, -1)
+
+    def transform(self, features_list):
+        """Return a C-contiguous ``(len(features_list), n_features)`` float32 array."""
+        X = np.empty((len(features_list), self.n_features), dtype=np.float32)
+        for i, features in enumerate(features_list):
+            X[i] = np.fromiter(self._values(features), dtype=np.float32, count=self.n_features)
+        return X
+
+    def check_model(self, model):
+        # Guard against a retrained model whose columns no longer line up
+        fitted = getattr(model, "feature_names_in_", None)
+        if fitted is not None and tuple(fitted) != self.columns:
+            raise ValueError(f"Model was fitted on columns {list(fitted)}, expected {list(self.columns)}")
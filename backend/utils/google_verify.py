@@ -0,0 +1,255 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from utils.latency import histogram
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# ---------------------------- Config ----------------------------
+# All URLs can point at a local stand-in server for tests.
+RECAPTCHA_VERIFY_URL = os.getenv("RECAPTCHA_VERIFY_URL", "https://www.google.com/recaptcha/api/siteverify")
+RECAPTCHA_SECRET_KEY = os.getenv("RECAPTCHA_SECRET_KEY")
+GOOGLE_JWKS_URL = os.getenv("GOOGLE_JWKS_URL", "https://www.googleapis.com/oauth2/v3/certs")
+GOOGLE_ISSUERS = tuple(os.getenv("GOOGLE_ISSUERS", "accounts.google.com,https://accounts.google.com").split(","))
+GOOGLE_CLIENT_ID = os.getenv("GOOGLE_OAUTH_CLIENT_ID")  # audience; not checked when unset
+GOOGLE_JWKS_MIN_REFRESH = float(os.getenv("GOOGLE_JWKS_MIN_REFRESH", "60"))  # seconds between forced refetches
+GOOGLE_JWKS_DEFAULT_TTL = float(os.getenv("GOOGLE_JWKS_DEFAULT_TTL", "3600"))
+
+VERIFY_CONNECT_TIMEOUT = float(os.getenv("VERIFY_CONNECT_TIMEOUT", "3"))
+VERIFY_READ_TIMEOUT = float(os.getenv("VERIFY_READ_TIMEOUT", "5"))
+VERIFY_POOL_SIZE = int(os.getenv("VERIFY_POOL_SIZE", "20"))
+VERIFY_BREAKER_THRESHOLD = int(os.getenv("VERIFY_BREAKER_THRESHOLD", "5"))  # consecutive failures
+VERIFY_BREAKER_RESET = float(os.getenv("VERIFY_BREAKER_RESET", "30"))  # seconds before a trial call
+RECAPTCHA_VERDICT_TTL = float(os.getenv("RECAPTCHA_VERDICT_TTL", "120"))
+VERDICT_CACHE_SIZE = int(os.getenv("VERDICT_CACHE_SIZE", "10000"))
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class InvalidGoogleToken(Exception):
+    pass
+
+
+# ---------------------------- Circuit breaker ----------------------------
+class CircuitBreaker:
+    """Stops calling an upstream after repeated failures, then lets one trial call through."""
+
+    def __init__(self, name, threshold=VERIFY_BREAKER_THRESHOLD, reset_after=VERIFY_BREAKER_RESET):
+        self.name = name
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "failures": 0, "short_circuited": 0, "opened": 0}
+
+    def call(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._opened_at is not None:
+                if time.monotonic() - self._opened_at < self.reset_after or self._trial_in_flight:
+                    self._counters["short_circuited"] += 1
+                    raise CircuitOpen(f"{self.name} circuit is open")
+                self._trial_in_flight = True  # half-open: exactly one caller probes the upstream
+            self._counters["calls"] += 1
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._counters["failures"] += 1
+                self._failures += 1
+                self._trial_in_flight = False
+                if self._opened_at is not None or self._failures >= self.threshold:
+                    if self._opened_at is None:
+                        self._counters["opened"] += 1
+                        logger.warning(f"[Verify] {self.name} circuit opened after {self._failures} failures")
+                    self._opened_at = time.monotonic()
+            raise
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+        return result
+
+    def stats(self):
+        with self._lock:
+            state = "closed" if self._opened_at is None else "open"
+            return {**self._counters, "state": state, "consecutive_failures": self._failures}
+
+
+# ---------------------------- Verdict cache ----------------------------
+class VerdictCache:
+    """Per-token verdicts with individual expiry; tokens are stored as SHA-256 digests."""
+
+    def __init__(self, max_entries=VERDICT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.time():
+                self._counters["hits"] += 1
+                return entry[1]
+            self._entries.pop(key, None)
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, token, value, expires_at):
+        with self._lock:
+            self._entries[self._key(token)] = (expires_at, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries)}
+
+
+# ---------------------------- Client ----------------------------
+class VerificationClient:
+    """Shared client for reCAPTCHA and Google sign-in checks.
+
+    One pooled ``requests.Session`` with strict timeouts and a circuit breaker
+    per upstream. Google ID tokens are verified locally against the cached
+    JWKS, so a sign-in costs no network call once the keys are loaded.
+    """
+
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=VERIFY_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.timeout = (VERIFY_CONNECT_TIMEOUT, VERIFY_READ_TIMEOUT)
+        self.recaptcha_breaker = CircuitBreaker("recaptcha")
+        self.jwks_breaker = CircuitBreaker("google_jwks")
+        self.recaptcha_verdicts = VerdictCache()
+        self.id_token_verdicts = VerdictCache()
+        self._jwks = None
+        self._jwks_expires = 0.0
+        self._jwks_fetched = 0.0
+        self._jwks_lock = threading.Lock()
+
+    # ---- reCAPTCHA ----
+    def _post_recaptcha(self, token):
+        with histogram("verify_recaptcha").time():
+            response = self.session.post(
+                RECAPTCHA_VERIFY_URL, data={"secret": RECAPTCHA_SECRET_KEY, "response": token}, timeout=self.timeout
+            )
+        response.raise_for_status()
+        return response.json()
+
+    def verify_recaptcha(self, token):
+        """True if reCAPTCHA accepts ``token``; fails closed when Google is unreachable.
+
+        A success is remembered for RECAPTCHA_VERDICT_TTL so a form re-submitted
+        with the same token (e.g. after a validation error) is not rejected as
+        a duplicate.
+        """
+        if not token:
+            return False
+        cached = self.recaptcha_verdicts.get(token)
+        if cached is not None:
+            return cached
+        try:
+            result = self.recaptcha_breaker.call(self._post_recaptcha, token)
+        except Exception as e:
+            logger.error(f"reCAPTCHA verification failed: {e}")
+            return False
+        success = bool(result.get("success", False))
+        if success:
+            self.recaptcha_verdicts.put(token, True, time.time() + RECAPTCHA_VERDICT_TTL)
+        return success
+
+    # ---- Google ID tokens ----
+    def _fetch_jwks(self):
+        with histogram("verify_jwks_fetch").time():
+            response = self.session.get(GOOGLE_JWKS_URL, timeout=self.timeout)
+        response.raise_for_status()
+        ttl = GOOGLE_JWKS_DEFAULT_TTL
+        for part in response.headers.get("Cache-Control", "").split(","):
+            name, _, value = part.strip().partition("=")
+            if name == "max-age" and value.isdigit():
+                ttl = int(value)
+        return jwt.PyJWKSet.from_dict(response.json()), ttl
+
+    def _signing_key(self, kid):
+        with self._jwks_lock:
+            now = time.monotonic()
+            stale = self._jwks is None or now >= self._jwks_expires
+            unknown_kid = self._jwks is not None and kid not in {k.key_id for k in self._jwks.keys}
+            # Google rotates keys; an unknown kid forces a refetch, but at most once per GOOGLE_JWKS_MIN_REFRESH
+            if stale or (unknown_kid and now - self._jwks_fetched >= GOOGLE_JWKS_MIN_REFRESH):
+                try:
+                    self._jwks, ttl = self.jwks_breaker.call(self._fetch_jwks)
+                    self._jwks_fetched = now
+                    self._jwks_expires = now + ttl
+                except Exception as e:
+                    if self._jwks is None:
+                        raise InvalidGoogleToken(f"Google signing keys unavailable: {e}")
+                    logger.warning(f"[Verify] JWKS refresh failed, using cached keys: {e}")
+            for key in self._jwks.keys:
+                if key.key_id == kid:
+                    return key.key
+        raise InvalidGoogleToken("Unknown signing key")
+
+    def verify_google_id_token(self, id_token):
+        """Return the verified claims of a Google ID token or raise ``InvalidGoogleToken``."""
+        cached = self.id_token_verdicts.get(id_token)
+        if cached is not None:
+            return dict(cached)
+        try:
+            header = jwt.get_unverified_header(id_token)
+            claims = jwt.decode(
+                id_token,
+                self._signing_key(header.get("kid")),
+                algorithms=["RS256"],
+                audience=GOOGLE_CLIENT_ID,
+                issuer=GOOGLE_ISSUERS,
+                options={"verify_aud": GOOGLE_CLIENT_ID is not None, "require": ["exp", "iss", "sub"]},
+                leeway=30,
+            )
+        except jwt.PyJWTError as e:
+            raise InvalidGoogleToken(str(e))
+        self.id_token_verdicts.put(id_token, claims, claims["exp"])
+        return dict(claims)
+
+    def stats(self):
+        return {
+            "recaptcha": {**self.recaptcha_breaker.stats(), "verdicts": self.recaptcha_verdicts.stats()},
+            "google_id_token": {
+                "jwks": self.jwks_breaker.stats(),
+                "keys_loaded": len(self._jwks.keys) if self._jwks else 0,
+                "verdicts": self.id_token_verdicts.stats(),
+            },
+        }
+
+
+verification_client = VerificationClient()
+
+
+def verify_recaptcha(token):
+    return verification_client.verify_recaptcha(token)
+
+
+def verify_google_id_token(id_token):
+    return verification_client.verify_google_id_token(id_token)
@@ -0,0 +1,174 @@
+import json
+import logging
+import sys
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# ------------------------ Declared indexes ------------------------
+# One entry per access pattern the routes use; names are fixed so that
+# create_indexes() is a no-op once they exist.
+INDEXES = {
+    "register": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("role", ASCENDING), ("createdAt", DESCENDING)], name="role_createdAt"),
+        IndexModel([("createdAt", DESCENDING)], name="createdAt"),
+        IndexModel([("verification_token", ASCENDING)], name="verification_token", sparse=True),
+    ],
+    "report_history": [
+        IndexModel([("userEmail", ASCENDING), ("dateReported", DESCENDING), ("_id", DESCENDING)],
+                   name="userEmail_dateReported_id"),
+        IndexModel([("dateReported", DESCENDING), ("_id", DESCENDING)], name="dateReported_id"),
+        IndexModel([("status", ASCENDING), ("dateReported", DESCENDING), ("_id", DESCENDING)],
+                   name="status_dateReported_id"),
+    ],
+    "activity_history": [
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING)], name="user_id_timestamp"),
+    ],
+    "results": [
+        IndexModel([("timestamp", DESCENDING), ("_id", DESCENDING)], name="timestamp_id"),
+        IndexModel([("prediction", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+                   name="prediction_timestamp_id"),
+    ],
+    "prediction_rollups": [
+        IndexModel([("granularity", ASCENDING), ("bucket", ASCENDING)], name="granularity_bucket"),
+        # Minute and hour buckets carry expires_at; day buckets have none and are kept
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "activity_events": [
+        IndexModel([("ts", DESCENDING), ("_id", DESCENDING)], name="ts_id"),
+        IndexModel([("type", ASCENDING), ("ts", DESCENDING), ("_id", DESCENDING)], name="type_ts_id"),
+        IndexModel([("type", ASCENDING), ("source_id", ASCENDING)], name="type_source_id",
+                   partialFilterExpression={"source_id": {"$exists": True}}),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "feedback": [
+        IndexModel([("timestamp", DESCENDING)], name="timestamp"),
+    ],
+    "scrape_jobs": [
+        IndexModel([("status", ASCENDING), ("enqueued_at", ASCENDING)], name="status_enqueued_at"),
+        # At most one queued/running job per username; enqueue() relies on the collision
+        IndexModel([("username", ASCENDING)], name="username_active", unique=True,
+                   partialFilterExpression={"active": True}),
+        IndexModel([("username", ASCENDING), ("status", ASCENDING), ("finished_at", DESCENDING)],
+                   name="username_status_finished_at"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "prediction_jobs": [
+        IndexModel([("status", ASCENDING), ("lease_until", ASCENDING)], name="status_lease_until"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "scraper_workers": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "prediction_leases": [
+        # Single-flight lease documents; expires_at trails the lease or the shared result
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# ------------------------ Route queries ------------------------
+# (name, collection, filter, sort, limit) as issued by the routes; the values
+# are placeholders, only the shape matters to the planner.
+_SAMPLE_EMAIL = "audit@example.com"
+
+QUERY_PLANS = [
+    ("signup / login: user by email", "register", {"email": _SAMPLE_EMAIL}, None, 1),
+    ("verify-email: user by token", "register", {"verification_token": "audit-token"}, None, 1),
+    ("admin users list", "register", {"role": "user"}, None, 0),
+    ("analytics: verified users", "register", {"role": "user", "isVerified": True}, None, 0),
+    ("analytics: latest users", "register", {"role": "user"}, [("createdAt", DESCENDING)], 5),
+    ("my reports", "report_history", {"userEmail": _SAMPLE_EMAIL},
+     [("dateReported", DESCENDING), ("_id", DESCENDING)], 101),
+    ("admin reports", "report_history", {}, [("dateReported", DESCENDING), ("_id", DESCENDING)], 101),
+    ("admin reports by status", "report_history", {"status": "Pending"},
+     [("dateReported", DESCENDING), ("_id", DESCENDING)], 101),
+    ("analytics: pending reports", "report_history", {"status": "Pending"}, None, 0),
+    ("user history", "activity_history", {"user_id": ObjectId("000000000000000000000000")},
+     [("timestamp", DESCENDING)], 0),
+    ("admin profile results", "results", {}, [("timestamp", DESCENDING), ("_id", DESCENDING)], 101),
+    ("admin profile results by prediction", "results", {"prediction": "Fake"},
+     [("timestamp", DESCENDING), ("_id", DESCENDING)], 101),
+    ("admin feedback", "feedback", {}, [("timestamp", DESCENDING)], 0),
+    ("prediction trends", "prediction_rollups",
+     {"granularity": "hour", "bucket": {"$gte": datetime(2000, 1, 1), "$lt": datetime(2000, 1, 2)}},
+     [("bucket", ASCENDING)], 2000),
+    ("recent activities", "activity_events", {}, [("ts", DESCENDING), ("_id", DESCENDING)], 8),
+    ("recent activities since", "activity_events", {"ts": {"$gt": datetime(2000, 1, 1)}},
+     [("ts", ASCENDING), ("_id", ASCENDING)], 9),
+    ("recent activities by type", "activity_events", {"type": {"$in": ["signup", "report"]}},
+     [("ts", DESCENDING), ("_id", DESCENDING)], 8),
+]
+
+
+def ensure_indexes(db, indexes=None):
+    """Create the declared indexes; existing ones are left untouched.
+
+    A failure on one collection (e.g. duplicate emails blocking the unique
+    index) is logged and reported without stopping the others.
+    """
+    indexes = INDEXES if indexes is None else indexes
+    report = {}
+    for collection, models in indexes.items():
+        try:
+            report[collection] = {"ok": True, "indexes": db[collection].create_indexes(models)}
+        except OperationFailure as e:
+            logger.error(f"[Indexes] Could not create indexes on {collection}: {e}")
+            report[collection] = {"ok": False, "error": str(e)}
+    return report
+
+
+def _plan_stages(plan):
+    # Walks classic and SBE explain output; yields every stage name in the tree
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan", "winningPlan"):
+        yield from _plan_stages(plan.get(key))
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+def audit_query_plans(db, queries=None):
+    """Run ``explain()`` on every route query and flag collection scans."""
+    queries = QUERY_PLANS if queries is None else queries
+    results = []
+    for name, collection, query, sort, limit in queries:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        explain = cursor.explain()
+        stages = list(_plan_stages(explain.get("queryPlanner", {}).get("winningPlan")))
+        results.append({
+            "query": name,
+            "collection": collection,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    # Create the indexes, or audit the query plans with --check:
+    #   cd backend && python -m utils.indexes [--check]
+    from utils.db import get_db
+
+    logging.basicConfig(level=logging.INFO)
+    db = get_db()
+    if "--check" in sys.argv[1:]:
+        audit = audit_query_plans(db)
+        for row in audit:
+            status = "COLLSCAN" if row["collscan"] else "ok"
+            print(f"{status:<9}{row['collection']:<18}{row['query']:<40}{' > '.join(row['stages'])}")
+        sys.exit(1 if any(row["collscan"] for row in audit) else 0)
+
+    report = ensure_indexes(db)
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if all(r["ok"] for r in report.values()) else 1)
@@ -0,0 +1,319 @@
+import instaloader
+from instaloader.exceptions import (
+    ConnectionException,
+    LoginRequiredException,
+    ProfileNotExistsException,
+    QueryReturnedBadRequestException,
+    QueryReturnedForbiddenException,
+    TooManyRequestsException,
+)
+from contextlib import contextmanager
+from dotenv import load_dotenv
+import logging
+import os
+import threading
+import time
+
+from utils import tracing
+from utils.rate_limiter import RateLimited, acquire_scrape
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------- Config ----------------------------
+SESSION_DIR = os.getenv("IG_SESSION_DIR", ".")
+SESSION_REFRESH_INTERVAL = float(os.getenv("IG_SESSION_REFRESH_INTERVAL", "1800"))  # seconds
+SESSION_RETIRE_COOLDOWN = float(os.getenv("IG_SESSION_RETIRE_COOLDOWN", "900"))     # seconds
+SESSION_LEASE_TIMEOUT = float(os.getenv("IG_SESSION_LEASE_TIMEOUT", "5"))           # seconds
+IG_REQUEST_TIMEOUT = float(os.getenv("IG_REQUEST_TIMEOUT", "15"))                   # seconds
+
+# Errors that mean Instagram is throttling the account rather than the session being broken
+RATE_LIMIT_ERRORS = (TooManyRequestsException, QueryReturnedBadRequestException, QueryReturnedForbiddenException)
+# Errors that are about the requested profile, not about the session that asked for it
+PROFILE_ERRORS = (ProfileNotExistsException,)
+
+
+class NoSessionAvailable(Exception):
+    pass
+
+
+def load_scraper_accounts():
+    accounts = []
+    for i in range(1, 5):
+        username = os.getenv(f"IG_USERNAME{i}")
+        password = os.getenv(f"IG_PASSWORD{i}")
+        if username and password:
+            accounts.append((username, password))
+    return accounts
+
+
+def _is_rate_limited(error):
+    if isinstance(error, RATE_LIMIT_ERRORS):
+        return True
+    return isinstance(error, ConnectionException) and ("429" in str(error) or "wait a few minutes" in str(error).lower())
+
+
+class PooledSession:
+    def __init__(self, username, password):
+        self.username = username
+        self.password = password
+        self.loader = None
+        self.leased = False
+        self.retired_until = 0.0
+        self.last_refresh = 0.0
+        self.uses = 0
+        self.failures = 0
+
+    @property
+    def session_file(self):
+        return os.path.join(SESSION_DIR, f"{self.username}.session")
+
+    def state(self, now=None):
+        now = now or time.monotonic()
+        if self.retired_until > now:
+            return "retired"
+        if self.loader is None:
+            return "cold"
+        return "leased" if self.leased else "idle"
+
+
+class InstaloaderSessionPool:
+    """Process-wide pool of logged-in Instaloader sessions, one per scraper account.
+
+    Each request leases one session exclusively, so no two threads share an
+    Instaloader context. Sessions that fail or get rate-limited are retired for a
+    cooldown and brought back by the background refresher.
+    """
+
+    def __init__(self, accounts, refresh_interval=SESSION_REFRESH_INTERVAL, retire_cooldown=SESSION_RETIRE_COOLDOWN):
+        self._sessions = [PooledSession(u, p) for u, p in accounts]
+        self._refresh_interval = refresh_interval
+        self._retire_cooldown = retire_cooldown
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._refresher = None
+        self._counters = {
+            "leases": 0,
+            "reuses": 0,
+            "logins": 0,
+            "refreshes": 0,
+            "failures": 0,
+            "rate_limited": 0,
+            "retirements": 0,
+            "lease_timeouts": 0,
+            "budget_exhausted": 0,
+        }
+
+    # ------------------------ Login / Refresh ------------------------
+    def _new_loader(self):
+        return instaloader.Instaloader(
+            quiet=True,
+            max_connection_attempts=1,
+            request_timeout=IG_REQUEST_TIMEOUT,
+            download_pictures=False,
+            download_videos=False,
+            download_video_thumbnails=False,
+            save_metadata=False,
+        )
+
+    def _login(self, session, force=False):
+        L = self._new_loader()
+        with tracing.stage("instaloader_login"):
+            if not force and os.path.exists(session.session_file):
+                L.load_session_from_file(session.username, filename=session.session_file)
+            else:
+                L.login(session.username, session.password)
+                L.save_session_to_file(filename=session.session_file)
+        self._incr("logins")
+        logger.info(f"[Session Pool] Logged in with: {session.username}")
+        return L
+
+    def _refresh(self, session):
+        # Called with the session marked as leased, so no request can pick it up meanwhile
+        try:
+            L = session.loader
+            if L is None or L.test_login() is None:
+                L = self._login(session)
+                if L.test_login() is None:
+                    L = self._login(session, force=True)
+            with self._cond:
+                session.loader = L
+                session.retired_until = 0.0
+                session.failures = 0
+                session.last_refresh = time.monotonic()
+                self._counters["refreshes"] += 1
+        except Exception as e:
+            logger.warning(f"[Session Pool] Refresh failed for {session.username}: {e}")
+            with self._cond:
+                self._retire(session, _is_rate_limited(e))
+
+    def _refresh_loop(self):
+        while not self._stop.wait(min(self._refresh_interval, self._retire_cooldown) / 4):
+            now = time.monotonic()
+            due = []
+            with self._cond:
+                for session in self._sessions:
+                    if session.leased:
+                        continue
+                    if session.retired_until and session.retired_until <= now:
+                        due.append(session)
+                    elif session.loader is not None and now - session.last_refresh >= self._refresh_interval:
+                        due.append(session)
+                for session in due:
+                    session.leased = True
+            for session in due:
+                self._refresh(session)
+                with self._cond:
+                    session.leased = False
+                    self._cond.notify_all()
+
+    def _ensure_refresher(self):
+        if self._refresher is None:
+            self._refresher = threading.Thread(target=self._refresh_loop, name="instaloader-refresh", daemon=True)
+            self._refresher.start()
+
+    # ------------------------ Leasing ------------------------
+    def _pick(self, exclude=()):
+        now = time.monotonic()
+        candidates = [s for s in self._sessions
+                      if not s.leased and s.retired_until <= now and s.username not in exclude]
+        if not candidates:
+            return None
+        # Prefer warm sessions, then the least used one to spread load across accounts
+        return min(candidates, key=lambda s: (s.loader is None, s.uses))
+
+    def _acquire(self, timeout, exclude=()):
+        """Reserve an idle account; with ``exclude``, None as soon as only excluded accounts are left."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._ensure_refresher()
+            while True:
+                session = self._pick(exclude)
+                if session is not None:
+                    session.leased = True
+                    return session
+                now = time.monotonic()
+                if exclude and not any(s.username not in exclude and s.retired_until <= now for s in self._sessions):
+                    return None
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._counters["lease_timeouts"] += 1
+                    return None
+                self._cond.wait(remaining)
+
+    def _retire(self, session, rate_limited):
+        session.loader = None
+        session.failures += 1
+        session.retired_until = time.monotonic() + self._retire_cooldown
+        self._counters["retirements"] += 1
+        self._counters["rate_limited" if rate_limited else "failures"] += 1
+
+    def _release(self, session, error=None):
+        with self._cond:
+            if error is not None and not isinstance(error, PROFILE_ERRORS):
+                rate_limited = _is_rate_limited(error)
+                logger.warning(
+                    f"[Session Pool] Retiring {session.username} "
+                    f"({'rate limited' if rate_limited else 'failed'}): {error}"
+                )
+                self._retire(session, rate_limited)
+            session.leased = False
+            self._cond.notify_all()
+
+    @contextmanager
+    def lease(self, timeout=SESSION_LEASE_TIMEOUT):
+        """Yield a logged-in ``instaloader.Instaloader`` reserved for the caller.
+
+        An account whose rate-limit bucket is empty is put back and the next
+        idle one tried. Only when none has budget does it wait, up to
+        ``rate_limiter.RATE_LIMIT_WAIT``, on one of them. Raises
+        ``NoSessionAvailable`` when every account is busy or retired, or that
+        wait runs out.
+        """
+        deadline = time.monotonic() + timeout
+        no_budget = set()  # accounts found with an empty bucket during this lease
+        while True:
+            remaining = max(0.0, deadline - time.monotonic())
+            session = self._acquire(remaining, exclude=no_budget)
+            last_resort = session is None and bool(no_budget)
+            if last_resort:
+                session = self._acquire(remaining)
+            if session is None:
+                raise NoSessionAvailable("No healthy Instaloader session available")
+            try:
+                # Per-account and egress budget, shared with the other workers and nodes
+                if last_resort:
+                    acquire_scrape(session.username)
+                else:
+                    acquire_scrape(session.username, timeout=0)
+            except RateLimited as e:
+                self._release(session)
+                self._incr("budget_exhausted")
+                if last_resort:
+                    raise NoSessionAvailable(str(e))
+                no_budget.add(session.username)
+                continue
+            if session.loader is not None:
+                break
+            try:
+                loader = self._login(session)
+                with self._cond:
+                    session.loader = loader
+                    session.last_refresh = time.monotonic()
+                break
+            except Exception as e:
+                logger.warning(f"[Session Pool] Login failed for {session.username}: {e}")
+                self._release(session, e)
+
+        with self._cond:
+            self._counters["leases"] += 1
+            if session.uses:
+                self._counters["reuses"] += 1
+            session.uses += 1
+
+        try:
+            yield session.loader
+        except BaseException as e:
+            self._release(session, e)
+            raise
+        else:
+            self._release(session)
+
+    # ------------------------ Introspection ------------------------
+    def _incr(self, name, amount=1):
+        with self._cond:
+            self._counters[name] += amount
+
+    def stats(self):
+        now = time.monotonic()
+        with self._cond:
+            return {
+                **self._counters,
+                "sessions": [
+                    {
+                        "username": s.username,
+                        "state": s.state(now),
+                        "uses": s.uses,
+                        "failures": s.failures,
+                        "retired_for": max(0, round(s.retired_until - now)),
+                    }
+                    for s in self._sessions
+                ],
+            }
+
+    def close(self):
+        self._stop.set()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_session_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = InstaloaderSessionPool(load_scraper_accounts())
+    return _pool
@@ -0,0 +1,163 @@
+import atexit
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------- Config ----------------------------
+JOB_QUEUE_WORKERS = int(os.getenv("JOB_QUEUE_WORKERS", "2"))
+JOB_QUEUE_MAX_SIZE = int(os.getenv("JOB_QUEUE_MAX_SIZE", "10000"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_DELAY = float(os.getenv("JOB_RETRY_BASE_DELAY", "2"))  # seconds, doubled per attempt
+JOB_RETRY_MAX_DELAY = float(os.getenv("JOB_RETRY_MAX_DELAY", "300"))
+JOB_QUEUE_DRAIN_TIMEOUT = float(os.getenv("JOB_QUEUE_DRAIN_TIMEOUT", "10"))  # on interpreter exit
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    __slots__ = ("name", "fn", "args", "kwargs", "attempts", "max_attempts", "last_error")
+
+    def __init__(self, name, fn, args, kwargs, max_attempts):
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.attempts = 0
+        self.max_attempts = max_attempts
+        self.last_error = None
+
+
+class JobQueue:
+    """In-process queue for slow side effects (email, webhooks) run by worker threads.
+
+    Failed jobs are retried with exponential backoff and jitter up to
+    ``max_attempts``; jobs that still fail are logged and kept in a short
+    dead-letter list for the admin stats.
+    """
+
+    def __init__(self, workers=JOB_QUEUE_WORKERS, max_size=JOB_QUEUE_MAX_SIZE, max_attempts=JOB_MAX_ATTEMPTS,
+                 base_delay=JOB_RETRY_BASE_DELAY, max_delay=JOB_RETRY_MAX_DELAY, name="jobs"):
+        self.name = name
+        self.max_size = max_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._heap = []  # (run_at, seq, job)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._closed = False
+        self._dead_letters = deque(maxlen=50)
+        self._counters = {"submitted": 0, "succeeded": 0, "retried": 0, "failed": 0, "rejected": 0}
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"{name}-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    # ---- Producer side ----
+    def submit(self, fn, *args, job_name=None, max_attempts=None, **kwargs):
+        job = Job(job_name or getattr(fn, "__name__", "job"), fn, args, kwargs, max_attempts or self.max_attempts)
+        with self._cond:
+            if self._closed or len(self._heap) >= self.max_size:
+                self._counters["rejected"] += 1
+                raise QueueFull(f"{self.name} queue is full or closed")
+            self._counters["submitted"] += 1
+            heapq.heappush(self._heap, (time.monotonic(), next(self._seq), job))
+            self._cond.notify()
+        return job
+
+    # ---- Worker side ----
+    def _next_job(self):
+        with self._cond:
+            while True:
+                if self._heap:
+                    run_at = self._heap[0][0]
+                    delay = run_at - time.monotonic()
+                    if delay <= 0:
+                        self._in_flight += 1
+                        return heapq.heappop(self._heap)[2]
+                    self._cond.wait(delay)
+                else:
+                    self._cond.wait()
+
+    def _retry_delay(self, attempts):
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            job.attempts += 1
+            try:
+                job.fn(*job.args, **job.kwargs)
+                outcome = "succeeded"
+            except Exception as e:
+                job.last_error = repr(e)
+                outcome = "retried" if job.attempts < job.max_attempts else "failed"
+                if outcome == "retried":
+                    logger.warning(f"[Jobs] {job.name} attempt {job.attempts} failed: {e}")
+                else:
+                    logger.error(f"[Jobs] {job.name} gave up after {job.attempts} attempts: {e}")
+
+            with self._cond:
+                self._in_flight -= 1
+                self._counters[outcome] += 1
+                if outcome == "retried":
+                    run_at = time.monotonic() + self._retry_delay(job.attempts)
+                    heapq.heappush(self._heap, (run_at, next(self._seq), job))
+                elif outcome == "failed":
+                    self._dead_letters.append({"job": job.name, "attempts": job.attempts, "error": job.last_error})
+                self._cond.notify_all()
+
+    # ---- Lifecycle ----
+    def join(self, timeout=None):
+        """Wait until nothing is queued or running; returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._heap or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=JOB_QUEUE_DRAIN_TIMEOUT):
+        with self._cond:
+            self._closed = True
+        if not self.join(timeout):
+            logger.warning(f"[Jobs] {len(self._heap)} {self.name} jobs still pending at shutdown")
+
+    def stats(self):
+        with self._cond:
+            return {
+                **self._counters,
+                "queued": len(self._heap),
+                "in_flight": self._in_flight,
+                "workers": len(self._threads),
+                "dead_letters": list(self._dead_letters),
+            }
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+                atexit.register(_queue.close)
+    return _queue
@@ -0,0 +1,84 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds; the last bucket catches everything slower
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram that is cheap to update from any thread."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += seconds
+            self._count += 1
+            self._max = max(self._max, seconds)
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def _quantile(self, counts, total, q):
+        # Upper bound of the bucket holding the q-th observation
+        rank = q * total
+        seen = 0
+        for bound, n in zip(self.buckets + (self._max,), counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return self._max
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, total_sum, slowest = self._count, self._sum, self._max
+        return {
+            "count": total,
+            "sum_seconds": round(total_sum, 6),
+            "avg_ms": round(total_sum / total * 1000, 3) if total else 0.0,
+            "max_ms": round(slowest * 1000, 3),
+            "p50_ms": round(self._quantile(counts, total, 0.5) * 1000, 3) if total else 0.0,
+            "p99_ms": round(self._quantile(counts, total, 0.99) * 1000, 3) if total else 0.0,
+            # Cumulative counts per upper bound, as Prometheus expects them
+            "buckets": {
+                **{str(bound): sum(counts[:i + 1]) for i, bound in enumerate(self.buckets)},
+                "+Inf": total,
+            },
+        }
+
+
+_histograms = {}
+_registry_lock = threading.Lock()
+
+
+def histogram(name, buckets=DEFAULT_BUCKETS):
+    """Process-wide histogram registered under ``name``."""
+    h = _histograms.get(name)
+    if h is None:
+        with _registry_lock:
+            h = _histograms.setdefault(name, LatencyHistogram(buckets))
+    return h
+
+
+def registered():
+    return sorted(_histograms.items())
+
+
+def snapshot_all(prefix=""):
+    return {name: h.snapshot() for name, h in sorted(_histograms.items()) if name.startswith(prefix)}
@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from utils import write_behind
+from utils.db import get_db
+
+logger = logging.getLogger(__name__)
+
+METRICS_RECONCILE_INTERVAL = float(os.getenv("METRICS_RECONCILE_INTERVAL", "3600"))  # seconds, 0 disables
+
+# ------------------------ Counters ------------------------
+# Each counter and the query on the raw collection it mirrors; reconcile()
+# recomputes them from these so the incremental updates cannot drift for long.
+COUNTERS = {
+    "users_total": ("register", {"role": "user"}),
+    "users_verified": ("register", {"role": "user", "isVerified": True}),
+    "reports_total": ("report_history", {}),
+    "reports_pending": ("report_history", {"status": "Pending"}),
+    "predictions_total": ("results", {}),
+    "predictions_fake": ("results", {"prediction": "Fake"}),
+    "predictions_real": ("results", {"prediction": "Real"}),
+}
+
+
+class MetricsStore:
+    """Pre-aggregated counters kept in a single document of ``metrics``.
+
+    Write paths ``$inc`` the counters as events happen so dashboards read one
+    document instead of counting collections. With the shared database the
+    increments go through the write-behind buffer, which sums them per flush.
+    """
+
+    DOC_ID = "admin_analytics"
+
+    def __init__(self, db=None):
+        self._buffered = db is None
+        self.db = db if db is not None else get_db()
+        self.collection = self.db["metrics"]
+        self._reconcile_lock = threading.Lock()
+
+    def increment(self, **deltas):
+        # Counters must never fail the request that triggered them
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        inc = {f"counters.{name}": delta for name, delta in deltas.items()}
+        try:
+            if self._buffered:
+                write_behind.increment(self.collection.name, self.DOC_ID, inc)
+            else:
+                self.collection.update_one({"_id": self.DOC_ID}, {"$inc": inc}, upsert=True)
+        except Exception as e:
+            logger.warning(f"[Metrics] Counter update failed {deltas}: {e}")
+
+    def read(self):
+        doc = self.collection.find_one({"_id": self.DOC_ID})
+        if not doc or "reconciled_at" not in doc:
+            # First read on a fresh database: build the counters once
+            return self.reconcile()
+        counters = {name: 0 for name in COUNTERS}
+        counters.update(doc.get("counters", {}))
+        return counters
+
+    def reconcile(self):
+        """Recount every counter from the raw collections and overwrite the stored values."""
+        with self._reconcile_lock:
+            started = time.perf_counter()
+            counters = {
+                name: self.db[collection].count_documents(query)
+                for name, (collection, query) in COUNTERS.items()
+            }
+            self.collection.update_one(
+                {"_id": self.DOC_ID},
+                {"$set": {"counters": counters, "reconciled_at": datetime.utcnow()}},
+                upsert=True,
+            )
+            logger.info(f"[Metrics] Reconciled counters in {time.perf_counter() - started:.2f}s")
+            return counters
+
+    def start_reconciler(self, interval=METRICS_RECONCILE_INTERVAL):
+        if interval <= 0:
+            return None
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reconcile()
+                except Exception as e:
+                    logger.warning(f"[Metrics] Reconcile failed: {e}")
+
+        thread = threading.Thread(target=loop, name="metrics-reconcile", daemon=True)
+        thread.start()
+        return thread
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_metrics_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MetricsStore()
+    return _store
+
+
+# ------------------------ Event hooks ------------------------
+def user_created(verified=False):
+    get_metrics_store().increment(users_total=1, users_verified=1 if verified else 0)
+
+
+def user_verified():
+    get_metrics_store().increment(users_verified=1)
+
+
+def user_deleted(user):
+    if user and user.get("role") == "user":
+        get_metrics_store().increment(users_total=-1, users_verified=-1 if user.get("isVerified") else 0)
+
+
+def report_created(status="Pending"):
+    get_metrics_store().increment(reports_total=1, reports_pending=1 if status == "Pending" else 0)
+
+
+def report_status_changed(old_status, new_status):
+    if old_status == new_status:
+        return
+    delta = (new_status == "Pending") - (old_status == "Pending")
+    get_metrics_store().increment(reports_pending=delta)
+
+
+def predictions_recorded(labels):
+    labels = list(labels)
+    get_metrics_store().increment(
+        predictions_total=len(labels),
+        predictions_fake=labels.count("Fake"),
+        predictions_real=labels.count("Real"),
+    )
+
+
+if __name__ == "__main__":
+    # Rebuild the counters from the raw collections:
+    #   cd backend && python -m utils.metrics_store
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(get_metrics_store().reconcile(), indent=2))
@@ -0,0 +1,209 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+NATIVE_FORMAT_VERSION = 1
+NATIVE_MODEL_DIR = os.getenv("NATIVE_MODEL_DIR", "model/native")
+
+# Flat node arrays, one .npy file each, so they can be memory-mapped read-only
+# and shared through the page cache by every worker process.
+RF_ARRAYS = ("rf_roots", "rf_feature", "rf_threshold", "rf_left", "rf_right", "rf_value")
+XGB_ARRAYS = ("xgb_roots", "xgb_feature", "xgb_threshold", "xgb_left", "xgb_right", "xgb_default_left", "xgb_value")
+
+
+# ------------------------ Export ------------------------
+def _pack_random_forest(rf):
+    roots, feature, threshold, left, right, value = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for est in rf.estimators_:
+        tree = est.tree_
+        is_leaf = tree.children_left < 0
+        counts = tree.value[:, 0, :]
+        roots.append(offset)
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(tree.threshold)
+        left.append(np.where(is_leaf, -1, tree.children_left + offset))
+        right.append(np.where(is_leaf, -1, tree.children_right + offset))
+        # P(class 1) at each node, as sklearn's predict_proba computes it for a leaf
+        value.append(counts[:, 1] / counts.sum(axis=1))
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+    return {
+        "rf_roots": np.asarray(roots, dtype=np.int32),
+        "rf_feature": np.concatenate(feature).astype(np.int32),
+        "rf_threshold": np.concatenate(threshold).astype(np.float64),
+        "rf_left": np.concatenate(left).astype(np.int32),
+        "rf_right": np.concatenate(right).astype(np.int32),
+        "rf_value": np.concatenate(value).astype(np.float64),
+    }, max_depth
+
+
+def _tree_depth(left, right):
+    depth, frontier = 0, [0]
+    while frontier:
+        frontier = [c for n in frontier for c in (left[n], right[n]) if c >= 0]
+        depth += 1 if frontier else 0
+    return depth
+
+
+def _pack_xgboost(booster_json):
+    learner = booster_json["learner"]
+    if learner["objective"]["name"] != "binary:logistic":
+        raise ValueError(f"Unsupported XGBoost objective: {learner['objective']['name']}")
+
+    roots, feature, threshold, left, right, default_left, value = [], [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for tree in learner["gradient_booster"]["model"]["trees"]:
+        l = np.asarray(tree["left_children"], dtype=np.int64)
+        r = np.asarray(tree["right_children"], dtype=np.int64)
+        cond = np.asarray(tree["split_conditions"], dtype=np.float32)
+        is_leaf = l < 0
+        roots.append(offset)
+        feature.append(np.where(is_leaf, 0, tree["split_indices"]))
+        threshold.append(cond)
+        left.append(np.where(is_leaf, -1, l + offset))
+        right.append(np.where(is_leaf, -1, r + offset))
+        default_left.append(tree["default_left"])
+        # For leaves XGBoost stores the leaf weight in split_conditions
+        value.append(np.where(is_leaf, cond, 0))
+        offset += len(l)
+        max_depth = max(max_depth, _tree_depth(l, r))
+
+    # "4.58E-1" in XGBoost 2.x/3.0, "[4.58E-1]" from 3.1 on
+    base_score = float(learner["learner_model_param"]["base_score"].strip("[]"))
+    base_margin = float(np.log(base_score / (1 - base_score)))
+    return {
+        "xgb_roots": np.asarray(roots, dtype=np.int32),
+        "xgb_feature": np.concatenate(feature).astype(np.int32),
+        "xgb_threshold": np.concatenate(threshold).astype(np.float32),
+        "xgb_left": np.concatenate(left).astype(np.int32),
+        "xgb_right": np.concatenate(right).astype(np.int32),
+        "xgb_default_left": np.concatenate(default_left).astype(np.bool_),
+        "xgb_value": np.concatenate(value).astype(np.float32),
+    }, max_depth, base_margin
+
+
+def export_native_model(model, out_dir=NATIVE_MODEL_DIR):
+    """Write a soft-voting RF + XGBoost ``VotingClassifier`` as flat tree arrays."""
+    import sklearn
+    import xgboost
+
+    estimators = dict(zip([name for name, _ in model.estimators], model.estimators_))
+    rf, xgb = estimators["rf"], estimators["xgb"]
+    if model.voting != "soft":
+        raise ValueError("Only soft voting can be exported")
+
+    os.makedirs(out_dir, exist_ok=True)
+    booster = xgb.get_booster()
+    # Keep XGBoost's own format next to the packed arrays for interoperability
+    booster.save_model(os.path.join(out_dir, "xgb_model.ubj"))
+
+    rf_arrays, rf_depth = _pack_random_forest(rf)
+    xgb_arrays, xgb_depth, base_margin = _pack_xgboost(json.loads(booster.save_raw("json")))
+    for name, array in {**rf_arrays, **xgb_arrays}.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), np.ascontiguousarray(array))
+
+    weights = list(model.weights) if model.weights is not None else [1.0, 1.0]
+    manifest = {
+        "format_version": NATIVE_FORMAT_VERSION,
+        "columns": [str(c) for c in getattr(model, "feature_names_in_", [])],
+        "classes": [float(c) for c in model.classes_],
+        "weights": [float(w) for w in weights],
+        "rf_trees": int(len(rf_arrays["rf_roots"])),
+        "rf_max_depth": int(rf_depth),
+        "xgb_trees": int(len(xgb_arrays["xgb_roots"])),
+        "xgb_max_depth": int(xgb_depth),
+        "xgb_base_margin": base_margin,
+        "sklearn_version": sklearn.__version__,
+        "xgboost_version": xgboost.__version__,
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# ------------------------ Inference ------------------------
+def _leaf_indices(X, roots, feature, threshold, left, right, max_depth, strict, default_left=None):
+    # Walks every tree for every row at once: one vectorised step per tree level
+    rows = np.arange(X.shape[0])[:, None]
+    idx = np.repeat(roots[None, :], X.shape[0], axis=0)
+    for _ in range(max_depth):
+        l = left[idx]
+        is_leaf = l < 0
+        if is_leaf.all():
+            break
+        x = X[rows, feature[idx]]
+        # sklearn sends x <= threshold left, XGBoost x < threshold (missing values follow default_left)
+        go_left = x < threshold[idx] if strict else x <= threshold[idx]
+        if default_left is not None:
+            go_left = np.where(np.isnan(x), default_left[idx], go_left)
+        idx = np.where(is_leaf, idx, np.where(go_left, l, right[idx]))
+    return idx
+
+
+class NativeHybridModel:
+    """Dependency-light predictor for the exported RF + XGBoost soft-voting model.
+
+    Mirrors the ``predict`` / ``predict_proba`` interface of the original
+    ``VotingClassifier`` but only needs NumPy, and the node arrays are
+    memory-mapped so worker processes share one copy.
+    """
+
+    def __init__(self, arrays, manifest):
+        self._a = arrays
+        self.manifest = manifest
+        self.classes_ = np.asarray(manifest["classes"])
+        if manifest.get("columns"):
+            self.feature_names_in_ = np.asarray(manifest["columns"], dtype=object)
+        weights = np.asarray(manifest["weights"], dtype=np.float64)
+        self._weights = weights / weights.sum()
+
+    @classmethod
+    def load(cls, model_dir=NATIVE_MODEL_DIR, mmap=True):
+        with open(os.path.join(model_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != NATIVE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported native model format: {manifest.get('format_version')}")
+        arrays = {
+            name: np.load(os.path.join(model_dir, f"{name}.npy"), mmap_mode="r" if mmap else None)
+            for name in RF_ARRAYS + XGB_ARRAYS
+        }
+        return cls(arrays, manifest)
+
+    def predict_proba(self, X):
+        a = self._a
+        X = np.asarray(X, dtype=np.float32)
+
+        rf_leaves = _leaf_indices(X, a["rf_roots"], a["rf_feature"], a["rf_threshold"],
+                                  a["rf_left"], a["rf_right"], self.manifest["rf_max_depth"], strict=False)
+        rf_p = a["rf_value"][rf_leaves].mean(axis=1)
+
+        xgb_leaves = _leaf_indices(X, a["xgb_roots"], a["xgb_feature"], a["xgb_threshold"],
+                                   a["xgb_left"], a["xgb_right"], self.manifest["xgb_max_depth"], strict=True,
+                                   default_left=a["xgb_default_left"])
+        margin = self.manifest["xgb_base_margin"] + a["xgb_value"][xgb_leaves].sum(axis=1, dtype=np.float64)
+        xgb_p = 1.0 / (1.0 + np.exp(-margin))
+
+        p = self._weights[0] * rf_p + self._weights[1] * xgb_p
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def native_model_available(model_dir=NATIVE_MODEL_DIR):
+    return os.path.exists(os.path.join(model_dir, "manifest.json"))
+
+
+if __name__ == "__main__":
+    # Re-export an existing pickle without retraining:
+    #   cd backend && python -m utils.native_model [model/final_hybrid_model.pkl] [model/native]
+    import joblib
+
+    source = sys.argv[1] if len(sys.argv) > 1 else "model/final_hybrid_model.pkl"
+    target = sys.argv[2] if len(sys.argv) > 2 else NATIVE_MODEL_DIR
+    print(json.dumps(export_native_model(joblib.load(source), target), indent=2))
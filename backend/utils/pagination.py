@@ -0,0 +1,150 @@
+import base64
+import json
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import Response, jsonify, stream_with_context
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidPageRequest(ValueError):
+    pass
+
+
+# ------------------------ Cursors ------------------------
+def encode_cursor(sort_value, doc_id):
+    """Opaque keyset cursor for the last document of a page."""
+    if isinstance(sort_value, datetime):
+        payload = {"dt": sort_value.isoformat(), "id": str(doc_id)}
+    else:
+        payload = {"v": sort_value, "id": str(doc_id)}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        value = datetime.fromisoformat(payload["dt"]) if "dt" in payload else payload["v"]
+        return value, ObjectId(payload["id"])
+    except (ValueError, TypeError, KeyError, InvalidId) as e:
+        raise InvalidPageRequest("Invalid cursor") from e
+
+
+def keyset_filter(cursor, field):
+    """Filter for documents after ``cursor`` in ``(field, _id)`` descending order."""
+    value, doc_id = decode_cursor(cursor)
+    return {"$or": [
+        {field: {"$lt": value}},
+        {field: value, "_id": {"$lt": doc_id}},
+    ]}
+
+
+# ------------------------ Query arguments ------------------------
+def parse_limit(value, default, maximum):
+    if value in (None, ""):
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise InvalidPageRequest("limit must be an integer")
+    if limit < 1:
+        raise InvalidPageRequest("limit must be positive")
+    return min(limit, maximum)
+
+
+def parse_fields(value, allowed, default):
+    """Turn ``fields=a,b`` into a Mongo projection limited to ``allowed``."""
+    fields = default if not value else [f.strip() for f in value.split(",") if f.strip()]
+    unknown = sorted(set(fields) - set(allowed))
+    if unknown:
+        raise InvalidPageRequest(f"Unknown fields: {', '.join(unknown)}")
+    return {field: 1 for field in fields}
+
+
+def parse_datetime(value, name):
+    """ISO 8601 date/time as a naive UTC datetime, matching what the routes store."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise InvalidPageRequest(f"{name} must be an ISO 8601 date")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def range_filter(field, start=None, end=None):
+    bounds = {}
+    if start is not None:
+        bounds["$gte"] = start
+    if end is not None:
+        bounds["$lte"] = end
+    return {field: bounds} if bounds else {}
+
+
+def wants_stream(args):
+    return args.get("stream") in ("1", "true", "ndjson") or args.get("format") == "ndjson"
+
+
+# ------------------------ Responses ------------------------
+def fetch_page(cursor, limit, field, serialize):
+    """Read at most ``limit`` documents; returns ``(items, next_cursor)``.
+
+    One extra document is requested so a cursor is only handed out when
+    another page really exists.
+    """
+    items, last = [], None
+    for doc in cursor.limit(limit + 1):
+        if len(items) == limit:
+            return items, encode_cursor(last.get(field), last["_id"])
+        items.append(serialize(doc))
+        last = doc
+    return items, None
+
+
+def ndjson_response(cursor, serialize):
+    """Stream one JSON document per line as the Mongo cursor yields them."""
+    def generate():
+        try:
+            for doc in cursor:
+                yield json.dumps(serialize(doc), default=str) + "\n"
+        finally:
+            cursor.close()
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+def paginated_response(collection, query, args, sort_field, projection, serialize, page_size, max_page_size):
+    """Run ``query`` newest-first on ``(sort_field, _id)`` and answer a page or a stream.
+
+    Reads ``cursor``, ``limit`` and ``stream`` from ``args``. A page is a JSON
+    array with the next cursor in ``X-Next-Cursor``; a stream is NDJSON.
+    Without ``limit`` or ``cursor`` the whole result comes back as one array,
+    as it did before pagination, since existing clients do not follow cursors;
+    ``page_size`` only applies once a client pages with a ``cursor``.
+    """
+    if args.get("cursor"):
+        after = keyset_filter(args["cursor"], sort_field)
+        query = {"$and": [query, after]} if query else after
+    projection = {**projection, sort_field: 1}
+    cursor = collection.find(query, projection).sort([(sort_field, -1), ("_id", -1)])
+
+    if wants_stream(args):
+        if args.get("limit"):
+            cursor = cursor.limit(parse_limit(args["limit"], page_size, max_page_size))
+        return ndjson_response(cursor, serialize)
+
+    if not args.get("limit") and not args.get("cursor"):
+        return jsonify([serialize(doc) for doc in cursor])
+
+    limit = parse_limit(args.get("limit"), page_size, max_page_size)
+    items, next_cursor = fetch_page(cursor, limit, sort_field, serialize)
+    response = jsonify(items)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
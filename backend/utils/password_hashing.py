@@ -0,0 +1,140 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import bcrypt
+from flask import jsonify
+
+from utils.latency import histogram
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------- Config ----------------------------
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(min(4, os.cpu_count() or 1))))
+BCRYPT_MAX_QUEUE = int(os.getenv("BCRYPT_MAX_QUEUE", "32"))  # waiting jobs beyond the busy workers
+BCRYPT_TIMEOUT = float(os.getenv("BCRYPT_TIMEOUT", "10"))  # seconds a request waits for its result
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full; routes answer 503."""
+
+
+def busy_response():
+    return jsonify({"message": "Server is busy, please try again shortly."}), 503, {"Retry-After": "1"}
+
+
+def hash_rounds(hashed):
+    # "$2b$12$<salt+hash>" -> 12
+    try:
+        return int(hashed.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """bcrypt on a small dedicated pool so login bursts cannot take every request thread.
+
+    At most ``workers + max_queue`` operations are admitted at once; beyond
+    that callers get ``HashingBusy`` straight away instead of queueing.
+    bcrypt releases the GIL, so the pool uses real cores.
+    """
+
+    def __init__(self, rounds=BCRYPT_ROUNDS, workers=BCRYPT_WORKERS, max_queue=BCRYPT_MAX_QUEUE, timeout=BCRYPT_TIMEOUT):
+        self.rounds = rounds
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._capacity = workers + max_queue
+        self._workers = workers
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+
+    def _run(self, kind, fn, *args, wait=True):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HashingBusy(f"bcrypt queue full ({self._capacity} pending)")
+        with self._lock:
+            self._pending += 1
+        submitted = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            histogram("bcrypt_queue_wait").observe(started - submitted)
+            try:
+                return fn(*args)
+            finally:
+                histogram(f"bcrypt_{kind}").observe(time.perf_counter() - started)
+                with self._lock:
+                    self._pending -= 1
+                self._slots.release()
+
+        future = self._executor.submit(task)
+        if not wait:
+            return future
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HashingBusy(f"bcrypt result not ready after {self.timeout}s")
+
+    # ---- Public API ----
+    def hash(self, password):
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return self._run("hash", bcrypt.hashpw, password.encode("utf-8"), salt).decode("utf-8")
+
+    def verify(self, password, hashed):
+        if not hashed:
+            return False  # e.g. Google accounts have no password
+        if isinstance(hashed, str):
+            hashed = hashed.encode("utf-8")
+        try:
+            return self._run("verify", bcrypt.checkpw, password.encode("utf-8"), hashed)
+        except ValueError:
+            return False  # not a bcrypt hash
+
+    def needs_rehash(self, hashed):
+        rounds = hash_rounds(hashed.decode("utf-8") if isinstance(hashed, bytes) else hashed)
+        return rounds is not None and rounds != self.rounds
+
+    def upgrade_later(self, password, store):
+        """Re-hash at the configured cost in the background and hand the result to ``store``.
+
+        Skipped silently when the pool is busy; the next login tries again.
+        """
+        def rehash():
+            new_hash = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=self.rounds)).decode("utf-8")
+            try:
+                store(new_hash)
+            except Exception as e:
+                logger.warning(f"[bcrypt] Could not store upgraded hash: {e}")
+
+        try:
+            self._run("hash", rehash, wait=False)
+        except HashingBusy:
+            pass
+
+    def stats(self):
+        with self._lock:
+            pending, rejected = self._pending, self._rejected
+        return {
+            "rounds": self.rounds,
+            "workers": self._workers,
+            "capacity": self._capacity,
+            "pending": pending,
+            "rejected": rejected,
+        }
+
+
+password_hasher = PasswordHasher()
+
+
+def hash_password(password):
+    return password_hasher.hash(password)
+
+
+def verify_password(password, hashed):
+    return password_hasher.verify(password, hashed)
@@ -0,0 +1,220 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+
+from utils.db import get_db
+from utils.job_queue import JobQueue
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------- Config ----------------------------
+PREDICTION_JOB_WORKERS = int(os.getenv("PREDICTION_JOB_WORKERS", "4"))
+PREDICTION_JOB_MAX_QUEUE = int(os.getenv("PREDICTION_JOB_MAX_QUEUE", "1000"))
+PREDICTION_JOB_LEASE = float(os.getenv("PREDICTION_JOB_LEASE", "180"))  # seconds; renewed while the job runs
+PREDICTION_JOB_MAX_ATTEMPTS = int(os.getenv("PREDICTION_JOB_MAX_ATTEMPTS", "3"))
+PREDICTION_JOB_RETENTION = float(os.getenv("PREDICTION_JOB_RETENTION", "86400"))
+PREDICTION_JOB_RESUME_INTERVAL = float(os.getenv("PREDICTION_JOB_RESUME_INTERVAL", "30"))
+PREDICTION_JOB_POLL = float(os.getenv("PREDICTION_JOB_POLL", "0.5"))  # for jobs running in another worker
+
+JOBS_COLLECTION = "prediction_jobs"
+ACTIVE = ("queued", "running")
+
+
+def parse_job_id(value):
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+
+def public_job(job):
+    """The job as returned to clients."""
+    body = {
+        "job_id": str(job["_id"]),
+        "username": job["username"],
+        "status": job["status"],
+        "created_at": job["created_at"].isoformat() + "Z",
+    }
+    if job["status"] not in ACTIVE:
+        body["result"] = job.get("result")
+        body["http_status"] = job.get("http_status")
+    return body
+
+
+class PredictionJobs:
+    """Prediction requests that outlive the HTTP request which started them.
+
+    Jobs are documents in ``prediction_jobs`` and run on a local JobQueue.
+    The process running a job holds a lease on it and renews it every third
+    of PREDICTION_JOB_LEASE while the runner works; jobs whose lease lapses
+    (the process restarted or died) are picked up again by ``resume``,
+    which runs at start-up and every PREDICTION_JOB_RESUME_INTERVAL.
+    ``runner(job)`` returns ``(payload, http_status)`` like the sync route.
+    """
+
+    def __init__(self, runner, workers=PREDICTION_JOB_WORKERS, max_queue=PREDICTION_JOB_MAX_QUEUE):
+        self.runner = runner
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._queue = JobQueue(workers=workers, max_size=max_queue, max_attempts=1, name="predictions")
+        self._changed = threading.Condition()  # wakes local SSE streams when a job here changes
+        self._resumer = None
+        self._running = set()  # ids of the jobs this process is executing
+        self._running_lock = threading.Lock()
+        threading.Thread(target=self._heartbeat_loop, name="prediction-jobs-heartbeat", daemon=True).start()
+
+    @property
+    def collection(self):
+        return get_db()[JOBS_COLLECTION]
+
+    # ---- Producer ----
+    def create(self, user_id, username):
+        now = datetime.utcnow()
+        job = {
+            "user_id": user_id,
+            "username": username,
+            "status": "queued",
+            "attempts": 0,
+            "owner": self.owner,
+            "lease_until": now + timedelta(seconds=PREDICTION_JOB_LEASE),
+            "created_at": now,
+            "updated_at": now,
+            "expires_at": now + timedelta(seconds=PREDICTION_JOB_RETENTION),
+        }
+        job_id = self.collection.insert_one(job).inserted_id
+        # If the local queue is full the job stays queued and another worker's resume() takes it
+        # once the lease lapses
+        try:
+            self._queue.submit(self._execute, job_id, job_name="prediction_job")
+        except Exception as e:
+            logger.warning(f"[PredictionJobs] {job_id} left for resume: {e}")
+        return job_id
+
+    def get(self, job_id, user=None):
+        """The job, or None if it does not exist or belongs to someone else (admins see all)."""
+        query = {"_id": job_id}
+        if user is not None and user.get("role") != "admin":
+            query["user_id"] = user["_id"]
+        return self.collection.find_one(query)
+
+    # ---- Execution ----
+    def _claim(self, job_id):
+        # A running job is only taken over once its lease lapsed, never while a runner (here or elsewhere) renews it
+        now = datetime.utcnow()
+        return self.collection.find_one_and_update(
+            {"_id": job_id,
+             "$or": [{"status": "queued"}, {"status": "running", "lease_until": {"$lt": now}}]},
+            {"$set": {"status": "running", "owner": self.owner, "updated_at": now,
+                      "lease_until": now + timedelta(seconds=PREDICTION_JOB_LEASE)},
+             "$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _finish(self, job, payload, http_status, status):
+        now = datetime.utcnow()
+        self.collection.update_one(
+            {"_id": job["_id"], "owner": self.owner},
+            {"$set": {"status": status, "result": payload, "http_status": http_status, "updated_at": now,
+                      "finished_at": now, "expires_at": now + timedelta(seconds=PREDICTION_JOB_RETENTION)},
+             "$unset": {"lease_until": ""}},
+        )
+        self._notify()
+
+    def _execute(self, job_id):
+        job = self._claim(job_id)
+        if job is None:
+            return  # finished already, or another worker holds it
+        self._notify()
+        if job["attempts"] > PREDICTION_JOB_MAX_ATTEMPTS:
+            self._finish(job, {"error": "Prediction failed repeatedly", "status": "failed"}, 500, "failed")
+            return
+        with self._running_lock:
+            self._running.add(job_id)
+        try:
+            payload, http_status = self.runner(job)
+        except Exception as e:
+            logger.error(f"[PredictionJobs] {job_id} failed: {e}")
+            payload, http_status = {"error": f"Prediction failed: {str(e)}"}, 500
+        finally:
+            with self._running_lock:
+                self._running.discard(job_id)
+        self._finish(job, payload, http_status, "done" if http_status < 400 else "failed")
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(PREDICTION_JOB_LEASE / 3)
+            with self._running_lock:
+                running = list(self._running)
+            if not running:
+                continue
+            try:
+                self.collection.update_many(
+                    {"_id": {"$in": running}, "owner": self.owner, "status": "running"},
+                    {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=PREDICTION_JOB_LEASE)}},
+                )
+            except Exception as e:
+                logger.warning(f"[PredictionJobs] Lease renewal failed: {e}")
+
+    def resume(self):
+        """Queue every unfinished job whose lease has lapsed; returns how many were found."""
+        stale = self.collection.find(
+            {"status": {"$in": list(ACTIVE)}, "lease_until": {"$lt": datetime.utcnow()}}, {"_id": 1}
+        )
+        resumed = 0
+        for job in stale:
+            try:
+                self._queue.submit(self._execute, job["_id"], job_name="prediction_job")
+                resumed += 1
+            except Exception as e:
+                logger.warning(f"[PredictionJobs] Resume stopped: {e}")
+                break
+        if resumed:
+            logger.info(f"[PredictionJobs] Resumed {resumed} unfinished jobs")
+        return resumed
+
+    def _resume_loop(self):
+        while True:
+            try:
+                self.resume()
+            except Exception as e:
+                logger.warning(f"[PredictionJobs] Resume failed: {e}")
+            time.sleep(PREDICTION_JOB_RESUME_INTERVAL)
+
+    def start(self):
+        if self._resumer is None:
+            self._resumer = threading.Thread(target=self._resume_loop, name="prediction-jobs-resume", daemon=True)
+            self._resumer.start()
+
+    # ---- Watching ----
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def wait_for_change(self, job_id, last_status, timeout):
+        """Block until the job's status differs from ``last_status`` or ``timeout`` passes; returns the job."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.collection.find_one({"_id": job_id})
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] != last_status or remaining <= 0:
+                return job
+            with self._changed:
+                # Jobs run here wake us straight away; the poll interval covers jobs in other workers
+                self._changed.wait(min(remaining, PREDICTION_JOB_POLL))
+
+    def local_stats(self):
+        return self._queue.stats()
+
+    def stats(self):
+        counts = {row["_id"]: row["n"] for row in self.collection.aggregate([
+            {"$match": {"status": {"$in": list(ACTIVE)}}},
+            {"$group": {"_id": "$status", "n": {"$sum": 1}}},
+        ])}
+        return {"owner": self.owner, "queued": counts.get("queued", 0), "running": counts.get("running", 0),
+                "local_queue": self.local_stats()}
@@ -0,0 +1,244 @@
+import json
+import logging
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from pymongo import ReplaceOne, UpdateOne
+
+from utils import write_behind
+from utils.db import get_db
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------- Config ----------------------------
+GRANULARITIES = ("minute", "hour", "day")
+# How long each bucket size is kept (TTL on expires_at); days are kept forever
+RETENTION = {
+    "minute": timedelta(hours=float(os.getenv("ROLLUP_MINUTE_RETENTION_HOURS", "48"))),
+    "hour": timedelta(days=float(os.getenv("ROLLUP_HOUR_RETENTION_DAYS", "90"))),
+    "day": None,
+}
+BUCKET_SIZE = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1), "day": timedelta(days=1)}
+CONFIDENCE_BINS = 10  # histogram of the stored confidence in steps of 0.1
+MAX_BUCKETS = int(os.getenv("ROLLUP_MAX_BUCKETS", "2000"))  # longest range one trends query may cover
+
+
+class TooManyBuckets(ValueError):
+    pass
+
+_collection = None
+
+
+def rollups_collection():
+    global _collection
+    if _collection is None:
+        _collection = get_db()["prediction_rollups"]
+    return _collection
+
+
+# ------------------------ Buckets ------------------------
+def bucket_start(ts, granularity):
+    if granularity == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def _bucket_id(granularity, start):
+    return f"{granularity}:{start.isoformat()}"
+
+
+def _expires_at(granularity, start):
+    retention = RETENTION[granularity]
+    return start + retention if retention else None
+
+
+def confidence_bin(confidence):
+    try:
+        return str(min(max(int(float(confidence) * CONFIDENCE_BINS), 0), CONFIDENCE_BINS - 1))
+    except (TypeError, ValueError):
+        return "0"
+
+
+def _method_key(method):
+    # Used as a sub-document key, so no dots or leading dollar signs
+    return (method or "unknown").replace(".", "_").lstrip("$") or "unknown"
+
+
+def _empty_bucket():
+    return {"count": 0, "fake": 0, "real": 0, "confidence": defaultdict(int), "methods": defaultdict(int)}
+
+
+def _add(bucket, prediction, bin_key, method, n=1):
+    bucket["count"] += n
+    if prediction == "Fake":
+        bucket["fake"] += n
+    elif prediction == "Real":
+        bucket["real"] += n
+    bucket["confidence"][bin_key] += n
+    bucket["methods"][_method_key(method)] += n
+
+
+# ------------------------ Incremental updates ------------------------
+def record_predictions(results, collection=None):
+    """Add predictions to every bucket size.
+
+    ``results`` are dicts with ``prediction``, ``confidence``, ``timestamp``
+    and optionally ``extraction_method``, i.e. the documents stored in ``results``.
+    Without ``collection`` the updates go through the write-behind buffer;
+    with one they are written at once in a single bulk write.
+    """
+    buckets = defaultdict(_empty_bucket)
+    for doc in results:
+        ts = doc.get("timestamp") or datetime.utcnow()
+        for granularity in GRANULARITIES:
+            _add(buckets[(granularity, bucket_start(ts, granularity))],
+                 doc.get("prediction"), confidence_bin(doc.get("confidence")), doc.get("extraction_method"))
+    if not buckets:
+        return
+
+    updates = []
+    for (granularity, start), b in buckets.items():
+        inc = {"count": b["count"], "fake": b["fake"], "real": b["real"]}
+        inc.update({f"confidence.{k}": v for k, v in b["confidence"].items()})
+        inc.update({f"methods.{k}": v for k, v in b["methods"].items()})
+        set_on_insert = {"granularity": granularity, "bucket": start, "expires_at": _expires_at(granularity, start)}
+        updates.append((_bucket_id(granularity, start), inc, set_on_insert))
+    try:
+        if collection is None:
+            for bucket_id, inc, set_on_insert in updates:
+                write_behind.increment(rollups_collection().name, bucket_id, inc, set_on_insert)
+        else:
+            collection.bulk_write([UpdateOne({"_id": bucket_id}, {"$inc": inc, "$setOnInsert": set_on_insert}, upsert=True)
+                                   for bucket_id, inc, set_on_insert in updates], ordered=False)
+    except Exception as e:
+        # Rollups are derived data; backfill() can rebuild anything lost here
+        logger.warning(f"[Rollups] Update failed: {e}")
+
+
+# ------------------------ Backfill ------------------------
+def _truncate_expr(granularity):
+    parts = {"year": {"$year": "$timestamp"}, "month": {"$month": "$timestamp"}, "day": {"$dayOfMonth": "$timestamp"}}
+    if granularity in ("hour", "minute"):
+        parts["hour"] = {"$hour": "$timestamp"}
+    if granularity == "minute":
+        parts["minute"] = {"$minute": "$timestamp"}
+    return {"$dateFromParts": parts}
+
+
+def backfill(db=None, granularities=GRANULARITIES, start=None, end=None):
+    """Rebuild rollup buckets from ``results`` with an aggregation pipeline.
+
+    Buckets in the range are replaced, so running it twice is harmless. Run it
+    for closed periods; a bucket still receiving live predictions may lose the
+    increments that land while it is being rewritten. Buckets older than their
+    granularity's retention are skipped, as the TTL index would delete them at once.
+    """
+    db = db if db is not None else get_db()
+    now = datetime.utcnow()
+
+    written = {}
+    for granularity in granularities:
+        match = {"timestamp": {"$type": "date"}}
+        since = start
+        if RETENTION[granularity]:
+            retained_from = bucket_start(now - RETENTION[granularity], granularity)
+            since = max(since, retained_from) if since else retained_from
+        if since:
+            match["timestamp"]["$gte"] = since
+        if end:
+            match["timestamp"]["$lt"] = end
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {
+                    "bucket": _truncate_expr(granularity),
+                    "prediction": "$prediction",
+                    "bin": {"$min": [CONFIDENCE_BINS - 1, {"$max": [0, {"$floor": {
+                        "$multiply": [{"$ifNull": ["$confidence", 0]}, CONFIDENCE_BINS]}}]}]},
+                    "method": {"$ifNull": ["$extraction_method", "unknown"]},
+                },
+                "n": {"$sum": 1},
+            }},
+        ]
+        buckets = defaultdict(_empty_bucket)
+        for row in db["results"].aggregate(pipeline, allowDiskUse=True):
+            key = row["_id"]
+            _add(buckets[key["bucket"]], key.get("prediction"), str(int(key["bin"])), key.get("method"), row["n"])
+
+        ops = [
+            ReplaceOne({"_id": _bucket_id(granularity, bucket)}, {
+                "granularity": granularity,
+                "bucket": bucket,
+                "expires_at": _expires_at(granularity, bucket),
+                "count": b["count"],
+                "fake": b["fake"],
+                "real": b["real"],
+                "confidence": dict(b["confidence"]),
+                "methods": dict(b["methods"]),
+            }, upsert=True)
+            for bucket, b in buckets.items()
+        ]
+        for i in range(0, len(ops), 1000):
+            db["prediction_rollups"].bulk_write(ops[i:i + 1000], ordered=False)
+        written[granularity] = len(ops)
+        logger.info(f"[Rollups] Backfilled {len(ops)} {granularity} buckets")
+    return written
+
+
+# ------------------------ Queries ------------------------
+def pick_granularity(start, end):
+    span = end - start
+    if span <= timedelta(hours=6):
+        return "minute"
+    if span <= timedelta(days=14):
+        return "hour"
+    return "day"
+
+
+def query_trends(start, end, granularity=None, collection=None):
+    """Buckets overlapping ``[start, end)`` plus totals over the range.
+
+    Raises ``TooManyBuckets`` when the range spans more than MAX_BUCKETS
+    buckets of ``granularity``, rather than returning partial totals.
+    """
+    granularity = granularity or pick_granularity(start, end)
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    first = bucket_start(start, granularity)
+    spanned = -((first - end) // BUCKET_SIZE[granularity])  # buckets from ``first`` up to ``end``, rounded up
+    if spanned > MAX_BUCKETS:
+        hint = "a shorter range" if granularity == "day" else "a coarser granularity or a shorter range"
+        raise TooManyBuckets(f"{spanned} {granularity} buckets requested, at most {MAX_BUCKETS}; use {hint}")
+    collection = collection if collection is not None else rollups_collection()
+    cursor = collection.find(
+        {"granularity": granularity, "bucket": {"$gte": first, "$lt": end}},
+        {"_id": 0, "expires_at": 0, "granularity": 0},
+    ).sort("bucket", 1)
+
+    buckets = []
+    totals = {"count": 0, "fake": 0, "real": 0, "confidence": defaultdict(int), "methods": defaultdict(int)}
+    for doc in cursor:
+        for field in ("count", "fake", "real"):
+            totals[field] += doc.get(field, 0)
+        for field in ("confidence", "methods"):
+            for key, n in doc.get(field, {}).items():
+                totals[field][key] += n
+        doc["bucket"] = doc["bucket"].isoformat()
+        buckets.append(doc)
+
+    totals["confidence"] = dict(totals["confidence"])
+    totals["methods"] = dict(totals["methods"])
+    return {"granularity": granularity, "buckets": buckets, "totals": totals}
+
+
+if __name__ == "__main__":
+    # Rebuild rollups from the results history:
+    #   cd backend && python -m utils.prediction_rollups [minute|hour|day ...]
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(backfill(granularities=tuple(sys.argv[1:]) or GRANULARITIES), indent=2))
@@ -0,0 +1,275 @@
+import calendar
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from utils.db import get_db
+from utils.latency import histogram
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process and Mongo backends are available
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------- Config ----------------------------
+# mongo: shared by every worker on every node; local: shared by the workers of one node
+# through a lock-protected file in shared memory; memory: this process only
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "local" if fcntl else "memory")
+RATE_LIMIT_STATE_FILE = os.getenv("RATE_LIMIT_STATE_FILE", os.path.join(
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "instaguard-rate-limits.json"))
+RATE_LIMIT_WAIT = float(os.getenv("RATE_LIMIT_WAIT", "5"))  # seconds a scrape queues for a token
+
+# Budgets are "requests per minute" with a burst allowance on top
+ACCOUNT_PER_MINUTE = float(os.getenv("RATE_LIMIT_ACCOUNT_PER_MINUTE", "2"))
+ACCOUNT_BURST = float(os.getenv("RATE_LIMIT_ACCOUNT_BURST", "5"))
+EGRESS_PER_MINUTE = float(os.getenv("RATE_LIMIT_EGRESS_PER_MINUTE", "20"))
+EGRESS_BURST = float(os.getenv("RATE_LIMIT_EGRESS_BURST", "20"))
+# Name of the public IP / proxy this node reaches Instagram through; nodes behind one NAT share it
+SCRAPER_EGRESS_ROUTE = os.getenv("SCRAPER_EGRESS_ROUTE", "default")
+
+BUCKET_COLLECTION = "rate_limits"
+
+
+class RateLimited(Exception):
+    pass
+
+
+def account_bucket(username):
+    return f"account:{username}", ACCOUNT_BURST, ACCOUNT_PER_MINUTE / 60
+
+
+def egress_bucket(route=SCRAPER_EGRESS_ROUTE):
+    return f"egress:{route}", EGRESS_BURST, EGRESS_PER_MINUTE / 60
+
+
+def _refill(tokens, updated_at, capacity, rate, now):
+    if tokens is None:
+        return capacity
+    return min(capacity, tokens + max(0.0, now - updated_at) * rate)
+
+
+# ---------------------------- Backends ----------------------------
+# take(key, capacity, rate, cost) refills the bucket, removes ``cost`` tokens if
+# there are enough, and returns (granted, tokens_left). A negative cost refunds.
+class MemoryBucketStore:
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, cost=1):
+        now = time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (None, now))
+            tokens = _refill(tokens, updated_at, capacity, rate, now)
+            granted = tokens >= cost
+            if granted:
+                tokens = min(capacity, tokens - cost)
+            self._buckets[key] = (tokens, now)
+        return granted, tokens
+
+    def peek(self, keys):
+        with self._lock:
+            return {k: self._buckets[k] for k in keys if k in self._buckets}
+
+
+class LocalSharedBucketStore:
+    """Buckets in one small JSON file, updated under ``flock`` by every worker on the node."""
+
+    def __init__(self, path=RATE_LIMIT_STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()  # flock is per open file, threads still need their own lock
+
+    def _update(self, fn):
+        with self._lock, open(self.path, "a+", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                try:
+                    state = json.loads(raw) if raw else {}
+                except ValueError:
+                    logger.warning(f"[RateLimit] Resetting unreadable state file {self.path}")
+                    state = {}
+                result, changed = fn(state)
+                if changed:
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state))
+                    f.flush()
+                return result
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def take(self, key, capacity, rate, cost=1):
+        def apply(state):
+            now = time.time()
+            tokens, updated_at = state.get(key, (None, now))
+            tokens = _refill(tokens, updated_at, capacity, rate, now)
+            granted = tokens >= cost
+            if granted:
+                tokens = min(capacity, tokens - cost)
+            state[key] = (tokens, now)
+            return (granted, tokens), True
+
+        return self._update(apply)
+
+    def peek(self, keys):
+        return self._update(lambda state: ({k: tuple(state[k]) for k in keys if k in state}, False))
+
+
+class MongoBucketStore:
+    """One document per bucket, refilled and debited in a single pipeline update.
+
+    The refill uses the server clock ($$NOW), so nodes with skewed clocks
+    still agree on the budget. Needs MongoDB 4.2+.
+    """
+
+    def __init__(self, collection=None):
+        self._collection = collection
+
+    @property
+    def collection(self):
+        return self._collection if self._collection is not None else get_db()[BUCKET_COLLECTION]
+
+    def take(self, key, capacity, rate, cost=1):
+        elapsed = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 1000]}
+        refilled = {"$min": [capacity, {"$add": [{"$ifNull": ["$tokens", capacity]}, {"$multiply": [elapsed, rate]}]}]}
+        pipeline = [
+            {"$set": {"tokens": refilled, "updated_at": "$$NOW", "capacity": capacity, "rate": rate}},
+            {"$set": {"granted": {"$gte": ["$tokens", cost]}}},
+            {"$set": {"tokens": {"$cond": ["$granted", {"$min": [capacity, {"$subtract": ["$tokens", cost]}]}, "$tokens"]}}},
+        ]
+        for attempt in (1, 2):
+            try:
+                doc = self.collection.find_one_and_update(
+                    {"_id": key}, pipeline, upsert=True, return_document=ReturnDocument.AFTER,
+                    projection={"tokens": 1, "granted": 1},
+                )
+                return doc["granted"], doc["tokens"]
+            except DuplicateKeyError:
+                # Two workers created the bucket at once; the retry updates the winner's document
+                if attempt == 2:
+                    raise
+
+    def peek(self, keys):
+        now = time.time()
+        docs = self.collection.find({"_id": {"$in": list(keys)}}, {"tokens": 1, "updated_at": 1})
+        # updated_at is a naive UTC datetime; turn it into epoch seconds like the other backends
+        return {d["_id"]: (d["tokens"], calendar.timegm(d["updated_at"].utctimetuple()) if d.get("updated_at") else now)
+                for d in docs}
+
+
+# ---------------------------- Limiter ----------------------------
+class RateLimiter:
+    """Token buckets for outgoing Instagram requests.
+
+    ``acquire`` takes one token from every bucket given (e.g. the scraper
+    account and the egress route) or none of them, waiting until
+    ``timeout`` for the slowest bucket to refill before raising
+    ``RateLimited``.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._counters = {"granted": 0, "waited": 0, "denied": 0, "errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def try_acquire(self, buckets):
+        """Take one token from each bucket; returns 0 on success, else seconds until a retry could succeed."""
+        taken = []
+        for key, capacity, rate in buckets:
+            granted, tokens = self.store.take(key, capacity, rate)
+            if not granted:
+                for refund_key, refund_capacity, refund_rate in taken:
+                    self.store.take(refund_key, refund_capacity, refund_rate, cost=-1)
+                return (1 - tokens) / rate if rate > 0 else float("inf")
+            taken.append((key, capacity, rate))
+        return 0.0
+
+    def acquire(self, buckets, timeout=RATE_LIMIT_WAIT):
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+        while True:
+            try:
+                wait = self.try_acquire(buckets)
+            except Exception as e:
+                # A broken limiter backend must not stop extraction altogether
+                self._count("errors")
+                logger.warning(f"[RateLimit] Backend error, letting the request through: {e}")
+                return
+            if wait == 0:
+                self._count("granted")
+                if waited:
+                    self._count("waited")
+                    histogram("rate_limit_wait").observe(time.monotonic() - start)
+                return
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                self._count("denied")
+                raise RateLimited(f"No budget for {', '.join(b[0] for b in buckets)} within {timeout}s")
+            waited = True
+            # Jitter so waiters on the same bucket do not all retry in the same instant
+            time.sleep(min(remaining, wait * (1 + random.random() * 0.2)))
+
+    def budgets(self, buckets):
+        now = time.time()
+        state = self.store.peek([key for key, _, _ in buckets])
+        result = []
+        for key, capacity, rate in buckets:
+            tokens, updated_at = state.get(key, (None, now))
+            result.append({
+                "bucket": key,
+                "tokens": round(_refill(tokens, updated_at, capacity, rate, now), 2),
+                "capacity": capacity,
+                "per_minute": round(rate * 60, 3),
+            })
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "backend": type(self.store).__name__}
+
+
+def _make_store(backend=RATE_LIMIT_BACKEND):
+    if backend == "mongo":
+        return MongoBucketStore()
+    if backend == "local":
+        if fcntl is None:
+            logger.warning("[RateLimit] flock unavailable, falling back to the in-process backend")
+            return MemoryBucketStore()
+        return LocalSharedBucketStore()
+    return MemoryBucketStore()
+
+
+rate_limiter = RateLimiter(_make_store())
+
+
+def acquire_scrape(account=None, timeout=RATE_LIMIT_WAIT):
+    """Wait for budget to send one request to Instagram, as ``account`` or anonymously."""
+    buckets = [egress_bucket()]
+    if account:
+        buckets.insert(0, account_bucket(account))
+    rate_limiter.acquire(buckets, timeout)
+
+
+def scrape_budgets(accounts):
+    return {
+        **rate_limiter.stats(),
+        "egress_route": SCRAPER_EGRESS_ROUTE,
+        "buckets": rate_limiter.budgets([account_bucket(a) for a in accounts] + [egress_bucket()]),
+        "wait": histogram("rate_limit_wait").snapshot(),
+    }
@@ -0,0 +1,37 @@
+import datetime
+import os
+
+from utils.pagination import parse_fields
+
+REPORTS_PAGE_SIZE = int(os.getenv("REPORTS_PAGE_SIZE", "100"))
+REPORTS_MAX_PAGE_SIZE = int(os.getenv("REPORTS_MAX_PAGE_SIZE", "1000"))
+
+REPORT_FIELDS = ("username", "reason", "status", "dateReported")
+
+
+def reports_filter(args, base=None):
+    """``base`` plus the ``status`` filter (one value or a comma-separated list)."""
+    query = dict(base or {})
+    statuses = [s.strip() for s in args.get("status", "").split(",") if s.strip()]
+    if len(statuses) == 1:
+        query["status"] = statuses[0]
+    elif statuses:
+        query["status"] = {"$in": statuses}
+    return query
+
+
+def report_projection(args):
+    return parse_fields(args.get("fields"), REPORT_FIELDS, REPORT_FIELDS)
+
+
+def report_date_iso(value):
+    # dateReported is stored in epoch milliseconds; older documents may hold a datetime
+    if isinstance(value, (int, float)):
+        return datetime.datetime.utcfromtimestamp(value / 1000).isoformat() + "Z"
+    if isinstance(value, datetime.datetime):
+        return value.isoformat() + "Z"
+    return None
+
+
+def pick(output, projection):
+    return {key: value for key, value in output.items() if key in projection}
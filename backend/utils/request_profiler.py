@@ -0,0 +1,272 @@
+import json
+import logging
+import os
+import random
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------- Config ----------------------------
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "instaguard-profiles"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))  # seconds between stack samples
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # fraction of all requests profiled, 0 disables
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "120"))  # a sampler stops on its own after this
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "4"))  # per worker; further requests go unprofiled
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "500"))  # oldest profiles are deleted beyond this
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY = "profile"
+
+_PROFILE_ID = re.compile(r"^\d{8}T\d{9}-\d+-[0-9a-f]{6}$")
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_slots = threading.BoundedSemaphore(PROFILE_MAX_CONCURRENT)
+
+
+def requested(headers, args):
+    """Whether the request asks to be profiled (``X-Profile: 1`` or ``?profile=1``)."""
+    flag = headers.get(PROFILE_HEADER) or args.get(PROFILE_QUERY)
+    return flag is not None and flag.lower() not in ("", "0", "false", "no")
+
+
+def sampled():
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+# ---------------------------- Sampling ----------------------------
+def _frame_name(frame):
+    code = frame.f_code
+    path = code.co_filename
+    if path.startswith(_BACKEND_DIR):
+        path = os.path.relpath(path, _BACKEND_DIR)
+    elif "site-packages" in path:
+        path = path.split("site-packages" + os.sep, 1)[1]
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+def collapse(frame):
+    """The stack ending at ``frame`` in collapsed form: root first, frames joined by ';'."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a helper thread every ``interval`` seconds.
+
+    Nothing runs in the profiled thread itself, so the request only pays for
+    the GIL time the sampler takes.
+    """
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL, max_seconds=PROFILE_MAX_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return  # the thread is gone
+            self.stacks[collapse(frame)] += 1
+            self.samples += 1
+            del frame
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+        return self.stacks
+
+
+# ---------------------------- Per-request profiles ----------------------------
+class RequestProfile:
+    def __init__(self, reason, sampler):
+        self.started_at = datetime.utcnow()
+        stamp = self.started_at.strftime("%Y%m%dT%H%M%S%f")[:-3]
+        self.id = f"{stamp}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.reason = reason
+        self.sampler = sampler
+        self._released = False
+
+    def stop(self):
+        """Stop sampling; safe to call more than once."""
+        if not self._released:
+            self._released = True
+            self.sampler.stop()
+            _slots.release()
+
+
+def start(reason):
+    """Begin sampling the calling thread; None when every profiling slot is busy."""
+    if not _slots.acquire(blocking=False):
+        logger.info("[Profiler] All slots busy, request not profiled")
+        return None
+    try:
+        return RequestProfile(reason, StackSampler(threading.get_ident()).start())
+    except Exception:
+        _slots.release()
+        raise
+
+
+def finish(profile, **meta):
+    """Stop ``profile`` and write it to PROFILE_DIR; returns the stored metadata."""
+    profile.stop()
+    sampler = profile.sampler
+    record = {
+        "id": profile.id,
+        "reason": profile.reason,
+        "started_at": profile.started_at.isoformat() + "Z",
+        "duration_ms": round(sampler.elapsed * 1000, 3),
+        "samples": sampler.samples,
+        # Busy threads hold the GIL, so the real spacing is often wider than PROFILE_INTERVAL
+        "interval_ms": round(sampler.elapsed * 1000 / sampler.samples, 3) if sampler.samples else sampler.interval * 1000,
+        "host": socket.gethostname(),
+        "pid": os.getpid(),
+        **meta,
+    }
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(_path(profile.id, "collapsed"), "w") as fh:
+            for stack, count in sampler.stacks.most_common():
+                fh.write(f"{stack} {count}\n")
+        # The metadata goes last; list_profiles only shows profiles that have it
+        with open(_path(profile.id, "json"), "w") as fh:
+            json.dump(record, fh)
+        _prune()
+    except OSError as e:
+        logger.warning(f"[Profiler] Could not store profile {profile.id}: {e}")
+    return record
+
+
+# ---------------------------- Storage ----------------------------
+def _path(profile_id, ext):
+    return os.path.join(PROFILE_DIR, f"{profile_id}.{ext}")
+
+
+def valid_id(profile_id):
+    return bool(_PROFILE_ID.match(profile_id or ""))
+
+
+def _stored_ids():
+    try:
+        names = os.listdir(PROFILE_DIR)
+    except FileNotFoundError:
+        return []
+    # Ids start with a UTC timestamp, so name order is age order
+    return sorted(name[:-len(".json")] for name in names if name.endswith(".json"))
+
+
+def _prune():
+    ids = _stored_ids()
+    for profile_id in ids[:max(0, len(ids) - PROFILE_MAX_FILES)]:
+        for ext in ("json", "collapsed"):
+            try:
+                os.remove(_path(profile_id, ext))
+            except FileNotFoundError:
+                pass
+
+
+def get_meta(profile_id):
+    try:
+        with open(_path(profile_id, "json")) as fh:
+            return json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def list_profiles(endpoint=None, reason=None, limit=100):
+    """Stored profile metadata, newest first."""
+    out = []
+    for profile_id in reversed(_stored_ids()):
+        meta = get_meta(profile_id)
+        if meta is None:
+            continue
+        if (endpoint and meta.get("endpoint") != endpoint) or (reason and meta.get("reason") != reason):
+            continue
+        out.append(meta)
+        if len(out) >= limit:
+            break
+    return out
+
+
+def read_stacks(profile_id):
+    stacks = Counter()
+    with open(_path(profile_id, "collapsed")) as fh:
+        for line in fh:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack:
+                stacks[stack] += int(count)
+    return stacks
+
+
+def merged_stacks(endpoint=None, reason=None, limit=PROFILE_MAX_FILES):
+    """Stacks summed over the matching profiles, e.g. every low-rate sample of one endpoint."""
+    total = Counter()
+    profiles = list_profiles(endpoint, reason, limit)
+    for meta in profiles:
+        try:
+            total.update(read_stacks(meta["id"]))
+        except FileNotFoundError:
+            continue
+    return total, len(profiles)
+
+
+# ---------------------------- Export ----------------------------
+def to_collapsed(stacks):
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def to_speedscope(stacks, name, interval_ms=None):
+    """A speedscope 'sampled' profile (https://www.speedscope.app/file-format-schema.json).
+
+    With ``interval_ms`` the weights are milliseconds; without it (merged
+    profiles, whose spacing varies) they are sample counts.
+    """
+    frames, index = [], {}
+    samples, weights = [], []
+    for stack, count in stacks.most_common():
+        ids = []
+        for frame in stack.split(";"):
+            if frame not in index:
+                index[frame] = len(frames)
+                frames.append({"name": frame})
+            ids.append(index[frame])
+        samples.append(ids)
+        weights.append(count * interval_ms if interval_ms else count)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "instaguard",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds" if interval_ms else "none",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+    }
@@ -0,0 +1,231 @@
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from utils.db import get_db
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------- Config ----------------------------
+# inline: web workers scrape in the request thread; queue: scraper_worker.py processes do it
+SCRAPER_MODE = os.getenv("SCRAPER_MODE", "inline")
+SCRAPE_WAIT_TIMEOUT = float(os.getenv("SCRAPE_WAIT_TIMEOUT", "25"))  # seconds /predict waits before answering 202
+SCRAPE_JOB_LEASE = float(os.getenv("SCRAPE_JOB_LEASE", "120"))  # a worker that goes quiet this long loses the job
+SCRAPE_JOB_MAX_ATTEMPTS = int(os.getenv("SCRAPE_JOB_MAX_ATTEMPTS", "3"))
+SCRAPE_JOB_RETENTION = float(os.getenv("SCRAPE_JOB_RETENTION", "86400"))  # finished jobs are kept this long
+SCRAPE_RESULT_REUSE = float(os.getenv("SCRAPE_RESULT_REUSE", "300"))  # a fresh finished job answers new requests
+WORKER_STATS_TTL = 60
+
+JOBS_COLLECTION = "scrape_jobs"
+WORKERS_COLLECTION = "scraper_workers"
+
+ACTIVE = ("queued", "running")
+
+
+class ScrapePending(Exception):
+    """The scrape did not finish within the wait; ``job_id`` can be polled."""
+
+    def __init__(self, job_id):
+        super().__init__(f"Scrape job {job_id} still pending")
+        self.job_id = job_id
+
+
+class ScrapeFailed(Exception):
+    pass
+
+
+def jobs_collection():
+    return get_db()[JOBS_COLLECTION]
+
+
+def workers_collection():
+    return get_db()[WORKERS_COLLECTION]
+
+
+def parse_job_id(value):
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+
+# ---------------------------- Producer side ----------------------------
+def enqueue(username):
+    """Return the id of a job scraping ``username``, creating one unless an equivalent job exists.
+
+    A queued/running job for the same username is reused (``active`` carries a
+    unique partial index), as is one that finished within SCRAPE_RESULT_REUSE.
+    """
+    jobs = jobs_collection()
+    recent = jobs.find_one(
+        {"username": username, "status": "done",
+         "finished_at": {"$gte": datetime.utcnow() - timedelta(seconds=SCRAPE_RESULT_REUSE)}},
+        {"_id": 1}, sort=[("finished_at", -1)],
+    )
+    if recent:
+        return recent["_id"]
+
+    now = datetime.utcnow()
+    job = {
+        "username": username,
+        "status": "queued",
+        "active": True,
+        "attempts": 0,
+        "enqueued_at": now,
+        "expires_at": now + timedelta(seconds=SCRAPE_JOB_RETENTION),
+    }
+    while True:
+        try:
+            return jobs.insert_one({**job, "_id": ObjectId()}).inserted_id
+        except DuplicateKeyError:
+            existing = jobs.find_one({"username": username, "active": True}, {"_id": 1})
+            if existing:
+                return existing["_id"]
+            # The active job finished in between; another producer may win the next insert too
+
+
+def add_requester(job_ids, user_id):
+    """Let ``user_id`` poll these jobs; called wherever a pending job id is handed to a client."""
+    if job_ids:
+        jobs_collection().update_many({"_id": {"$in": list(job_ids)}}, {"$addToSet": {"requested_by": str(user_id)}})
+
+
+def get_job(job_id, projection=None):
+    return jobs_collection().find_one({"_id": job_id}, projection)
+
+
+def job_outcome(job):
+    """Features of a finished job; raises ``ScrapeFailed`` for a failed one, None while it is still active."""
+    if job["status"] == "done":
+        return job.get("result")
+    if job["status"] == "failed":
+        raise ScrapeFailed(job.get("error", "Scrape failed"))
+    return None
+
+
+def wait(job_id, timeout=SCRAPE_WAIT_TIMEOUT):
+    """Poll until the job finishes; raises ``ScrapePending`` after ``timeout`` seconds."""
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    while True:
+        job = get_job(job_id, {"status": 1, "result": 1, "error": 1})
+        if job is None:
+            raise ScrapeFailed(f"Scrape job {job_id} disappeared")
+        if job["status"] not in ACTIVE:
+            return job_outcome(job)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise ScrapePending(job_id)
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.5)
+
+
+def scrape(username, timeout=SCRAPE_WAIT_TIMEOUT):
+    return wait(enqueue(username), timeout)
+
+
+# ---------------------------- Worker side ----------------------------
+def expire_abandoned(now=None):
+    """Fail jobs whose lease ran out after their last allowed attempt.
+
+    A worker that crashes or hangs never reaches ``fail()``, so without this
+    such a job would be re-claimed forever; failing it also answers waiters.
+    """
+    now = now or datetime.utcnow()
+    result = jobs_collection().update_many(
+        {"status": "running", "lease_until": {"$lt": now}, "attempts": {"$gte": SCRAPE_JOB_MAX_ATTEMPTS}},
+        {"$set": {"status": "failed", "error": "Scrape abandoned by its workers", "finished_at": now,
+                  "expires_at": now + timedelta(seconds=SCRAPE_JOB_RETENTION)},
+         "$unset": {"active": "", "lease_until": ""}},
+    )
+    if result.modified_count:
+        logger.warning(f"[Scrape Queue] Failed {result.modified_count} jobs abandoned after "
+                       f"{SCRAPE_JOB_MAX_ATTEMPTS} attempts")
+    return result.modified_count
+
+
+def claim(worker_id):
+    """Take the oldest queued job, or one whose worker's lease ran out with attempts to spare."""
+    now = datetime.utcnow()
+    expire_abandoned(now)
+    return jobs_collection().find_one_and_update(
+        {"$or": [
+            {"status": "queued"},
+            {"status": "running", "lease_until": {"$lt": now}, "attempts": {"$lt": SCRAPE_JOB_MAX_ATTEMPTS}},
+        ]},
+        {"$set": {"status": "running", "worker": worker_id, "started_at": now,
+                  "lease_until": now + timedelta(seconds=SCRAPE_JOB_LEASE)},
+         "$inc": {"attempts": 1}},
+        sort=[("enqueued_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def renew(job):
+    """Push the job's lease forward while its worker is still on it; False if the worker lost it."""
+    now = datetime.utcnow()
+    result = jobs_collection().update_one(
+        {"_id": job["_id"], "worker": job["worker"], "status": "running"},
+        {"$set": {"lease_until": now + timedelta(seconds=SCRAPE_JOB_LEASE)}},
+    )
+    return result.matched_count == 1
+
+
+def _finish(job, fields):
+    now = datetime.utcnow()
+    fields.update({"finished_at": now, "expires_at": now + timedelta(seconds=SCRAPE_JOB_RETENTION)})
+    # Only the current lease holder may finish the job
+    jobs_collection().update_one(
+        {"_id": job["_id"], "worker": job["worker"], "status": "running"},
+        {"$set": fields, "$unset": {"active": "", "lease_until": ""}},
+    )
+
+
+def complete(job, result):
+    _finish(job, {"status": "done", "result": result})
+
+
+def fail(job, error):
+    if job.get("attempts", 1) < SCRAPE_JOB_MAX_ATTEMPTS:
+        jobs_collection().update_one(
+            {"_id": job["_id"], "worker": job["worker"], "status": "running"},
+            {"$set": {"status": "queued", "last_error": str(error)}, "$unset": {"lease_until": ""}},
+        )
+    else:
+        _finish(job, {"status": "failed", "error": str(error)})
+
+
+def publish_worker_stats(worker_id, stats):
+    now = datetime.utcnow()
+    workers_collection().replace_one(
+        {"_id": worker_id},
+        {"host": socket.gethostname(), "pid": os.getpid(), "updated_at": now,
+         "expires_at": now + timedelta(seconds=WORKER_STATS_TTL), **stats},
+        upsert=True,
+    )
+
+
+# ---------------------------- Introspection ----------------------------
+def queue_stats():
+    counts = {row["_id"]: row["n"] for row in jobs_collection().aggregate([
+        {"$match": {"status": {"$in": list(ACTIVE)}}},
+        {"$group": {"_id": "$status", "n": {"$sum": 1}}},
+    ])}
+    oldest = jobs_collection().find_one({"status": "queued"}, {"enqueued_at": 1}, sort=[("enqueued_at", ASCENDING)])
+    workers = list(workers_collection().find({}, {"expires_at": 0}))
+    for w in workers:
+        w["updated_at"] = w["updated_at"].isoformat() + "Z"
+    return {
+        "mode": SCRAPER_MODE,
+        "queued": counts.get("queued", 0),
+        "running": counts.get("running", 0),
+        "oldest_queued_seconds": round((datetime.utcnow() - oldest["enqueued_at"]).total_seconds(), 1) if oldest else 0,
+        "workers": workers,
+    }
@@ -0,0 +1,203 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from bson.errors import InvalidDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from utils.db import get_db
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------- Config ----------------------------
+SINGLE_FLIGHT_MONGO = os.getenv("SINGLE_FLIGHT_MONGO", "0") == "1"  # coalesce across workers, not just threads
+SINGLE_FLIGHT_LEASE_SECONDS = float(os.getenv("SINGLE_FLIGHT_LEASE_SECONDS", "60"))  # longest expected extraction
+SINGLE_FLIGHT_RESULT_TTL = float(os.getenv("SINGLE_FLIGHT_RESULT_TTL", "5"))  # late followers still share the result
+SINGLE_FLIGHT_WAIT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_WAIT_TIMEOUT", "90"))
+SINGLE_FLIGHT_POLL_INTERVAL = float(os.getenv("SINGLE_FLIGHT_POLL_INTERVAL", "0.25"))
+LEASE_COLLECTION = "prediction_leases"
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Runs ``fn`` once per key among the threads of this process.
+
+    The first caller for a key runs it; callers that arrive while it is
+    running wait and receive the same result (or exception). Nothing is
+    kept once the call finishes.
+    """
+
+    def __init__(self, wait_timeout=SINGLE_FLIGHT_WAIT_TIMEOUT):
+        self.wait_timeout = wait_timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._counters = {"leaders": 0, "followers": 0, "follower_timeouts": 0}
+
+    def do(self, key, fn):
+        """Return ``(result, shared)``; ``shared`` is True for callers that waited on another thread."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+                self._counters["leaders"] += 1
+            else:
+                call.followers += 1
+                leader = False
+                self._counters["followers"] += 1
+
+        if not leader:
+            if not call.done.wait(self.wait_timeout):
+                with self._lock:
+                    self._counters["follower_timeouts"] += 1
+                logger.warning(f"[SingleFlight] Gave up waiting for {key}, running it separately")
+                return fn(), False
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "in_flight": len(self._calls)}
+
+
+class MongoLease:
+    """Cross-worker coalescing through one lease document per key.
+
+    The worker that inserts (or takes over an expired) lease runs ``fn`` and
+    stores its result on the document; the others poll until it appears.
+    The result must be BSON-serialisable. A leader that fails drops its
+    lease so a waiting worker takes over straight away; one that dies is
+    replaced once ``lease_seconds`` pass.
+    """
+
+    def __init__(self, collection=None, lease_seconds=SINGLE_FLIGHT_LEASE_SECONDS, result_ttl=SINGLE_FLIGHT_RESULT_TTL,
+                 wait_timeout=SINGLE_FLIGHT_WAIT_TIMEOUT, poll_interval=SINGLE_FLIGHT_POLL_INTERVAL):
+        self._collection = collection
+        self.lease_seconds = lease_seconds
+        self.result_ttl = result_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._counters = {"acquired": 0, "shared": 0, "takeovers": 0, "wait_timeouts": 0, "errors": 0}
+
+    @property
+    def collection(self):
+        return self._collection if self._collection is not None else get_db()[LEASE_COLLECTION]
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _acquire(self, key):
+        now = datetime.utcnow()
+        until = now + timedelta(seconds=self.lease_seconds)
+        try:
+            # Matches only a missing or lapsed lease; a live one makes the upsert collide on _id
+            previous = self.collection.find_one_and_update(
+                {"_id": key, "lease_until": {"$lt": now}},
+                {"$set": {"owner": self.owner, "lease_until": until, "expires_at": until},
+                 "$unset": {"result": ""}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        if previous is not None and "result" not in previous:
+            self._count("takeovers")  # the previous leader never finished
+        return True
+
+    def _publish(self, key, result):
+        until = datetime.utcnow() + timedelta(seconds=self.result_ttl)
+        self.collection.update_one(
+            {"_id": key, "owner": self.owner},
+            {"$set": {"result": result, "lease_until": until, "expires_at": until}},
+        )
+
+    def _release(self, key):
+        try:
+            self.collection.delete_one({"_id": key, "owner": self.owner, "result": {"$exists": False}})
+        except PyMongoError as e:
+            logger.warning(f"[SingleFlight] Could not release lease {key}: {e}")
+
+    def run(self, key, fn):
+        """Return ``(result, shared)`` like ``SingleFlight.do``; falls back to ``fn()`` if Mongo fails."""
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            try:
+                acquired = self._acquire(key)
+                doc = None if acquired else self.collection.find_one({"_id": key}, {"result": 1})
+            except PyMongoError as e:
+                self._count("errors")
+                logger.warning(f"[SingleFlight] Lease unavailable for {key}, running locally: {e}")
+                return fn(), False
+
+            if acquired:
+                self._count("acquired")
+                try:
+                    result = fn()
+                except Exception:
+                    self._release(key)
+                    raise
+                try:
+                    self._publish(key, result)
+                except (PyMongoError, InvalidDocument) as e:
+                    self._release(key)
+                    logger.warning(f"[SingleFlight] Could not publish result for {key}: {e}")
+                return result, False
+
+            if doc is not None and "result" in doc:
+                self._count("shared")
+                return doc["result"], True
+            if time.monotonic() >= deadline:
+                self._count("wait_timeouts")
+                return fn(), False
+            time.sleep(self.poll_interval)
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "owner": self.owner}
+
+
+# ---------------------------- Shared instances ----------------------------
+local_flight = SingleFlight()
+mongo_lease = MongoLease()
+
+
+def coalesce(key, fn):
+    """Run ``fn`` once for all concurrent callers with the same ``key``.
+
+    Threads of this worker always share one call; with SINGLE_FLIGHT_MONGO=1
+    that call also waits on other workers through a lease document.
+    """
+    if SINGLE_FLIGHT_MONGO:
+        result, shared = local_flight.do(key, lambda: mongo_lease.run(key, fn))
+        return result[0], shared or result[1]
+    return local_flight.do(key, fn)
+
+
+def stats():
+    return {"enabled_across_workers": SINGLE_FLIGHT_MONGO, "local": local_flight.stats(), "mongo": mongo_lease.stats()}
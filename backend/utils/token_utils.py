@@ -1,9 +1,9 @@
 import uuid
-from pymongo import MongoClient
-import os
+from utils.db import get_db
+from routes.auth import invalidate_principal
+from utils import metrics_store
 
-client = MongoClient(os.getenv("MONGO_URL"))
-db = client["users"]
+db = get_db()
 users_collection = db["register"]
 
 def generate_verification_token():
@@ -20,4 +20,7 @@ def verify_user(user):
         {"_id": user["_id"]},
         {"$set": {"isVerified": True}, "$unset": {"verification_token": ""}}
     )
+    invalidate_principal(user["_id"])
+    if result.modified_count > 0:
+        metrics_store.user_verified()
     return result.modified_count > 0
@@ -0,0 +1,184 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.latency import histogram, registered
+
+logger = logging.getLogger(__name__)
+
+METRICS_PREFIX = os.getenv("METRICS_PREFIX", "instaguard")
+
+# ---------------------------- Keys ----------------------------
+# Labelled series live in the shared latency registry under their Prometheus
+# spelling, e.g. 'stage_seconds{method="instaloader",stage="profile_fetch"}'.
+def metric_key(name, labels):
+    if not labels:
+        return name
+    inner = ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items()))
+    return f"{name}{{{inner}}}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def split_key(key):
+    name, brace, rest = key.partition("{")
+    return name, (rest[:-1] if brace else "")
+
+
+# ---------------------------- Counters ----------------------------
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+def incr(name, amount=1, **labels):
+    key = metric_key(name, labels)
+    with _counters_lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+# ---------------------------- Traces ----------------------------
+class Trace:
+    """Stage timings of one request or job, labelled once the outcome is known."""
+
+    __slots__ = ("started", "stages", "labels")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []
+        self.labels = {}
+
+
+_local = threading.local()
+
+
+def current():
+    return getattr(_local, "trace", None)
+
+
+def start():
+    _local.trace = Trace()
+
+
+def annotate(**labels):
+    """Attach labels (e.g. method, model_version) to every stage of the current trace."""
+    active = current()
+    if active is not None:
+        active.labels.update(labels)
+
+
+def finish(**labels):
+    """Close the current trace: observe each stage with the trace's labels, then the total."""
+    active = current()
+    if active is None:
+        return
+    _local.trace = None
+    for name, seconds, extra in active.stages:
+        histogram(metric_key("stage_seconds", {**active.labels, **extra, "stage": name})).observe(seconds)
+    histogram(metric_key("request_seconds", labels)).observe(time.perf_counter() - active.started)
+
+
+@contextmanager
+def trace(**labels):
+    start()
+    try:
+        yield
+    finally:
+        finish(**labels)
+
+
+def observe_stage(name, seconds, **labels):
+    active = current()
+    if active is not None:
+        active.stages.append((name, seconds, labels))
+    else:
+        histogram(metric_key("stage_seconds", {**labels, "stage": name})).observe(seconds)
+
+
+@contextmanager
+def stage(name, **labels):
+    """Time a block. Inside a trace it is held until ``finish``; elsewhere (other threads) it is observed directly."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started, **labels)
+
+
+# ---------------------------- Exposition ----------------------------
+_collectors = {}
+
+
+def register_collector(name, fn):
+    """``fn()`` returns a (nested) dict of numbers exported as gauges named ``<prefix>_<name>_<path>``."""
+    _collectors[name] = fn
+
+
+def _flatten(prefix, value, out):
+    if isinstance(value, bool):
+        out.append((prefix, int(value)))
+    elif isinstance(value, (int, float)):
+        out.append((prefix, value))
+    elif isinstance(value, dict):
+        for key, inner in value.items():
+            _flatten(f"{prefix}_{_sanitize(key)}", inner, out)
+
+
+def _sanitize(name):
+    return "".join(c if c.isalnum() or c == "_" else "_" for c in str(name))
+
+
+def _full_name(name):
+    return f"{METRICS_PREFIX}_{name}"
+
+
+def _series(name, labels, extra=""):
+    joined = ",".join(part for part in (labels, extra) if part)
+    return f"{name}{{{joined}}}" if joined else name
+
+
+def render():
+    """All histograms, counters and collector gauges in the Prometheus text format (0.0.4)."""
+    lines = []
+
+    families = {}
+    for key, h in registered():
+        name, labels = split_key(key)
+        # Unlabelled latency histograms (bcrypt_hash, verify_recaptcha, ...) are in seconds too
+        family = _full_name(name if name.endswith("_seconds") else f"{name}_seconds")
+        families.setdefault(family, []).append((labels, h.snapshot()))
+    for family, series in families.items():
+        lines.append(f"# TYPE {family} histogram")
+        for labels, snap in series:
+            for bound, count in snap["buckets"].items():
+                le = 'le="' + bound + '"'
+                lines.append(f"{_series(family + '_bucket', labels, le)} {count}")
+            lines.append(f"{_series(family + '_sum', labels)} {snap['sum_seconds']}")
+            lines.append(f"{_series(family + '_count', labels)} {snap['count']}")
+
+    with _counters_lock:
+        counters = sorted(_counters.items())
+    declared = set()
+    for key, value in counters:
+        name, labels = split_key(key)
+        family = _full_name(name)
+        if family not in declared:
+            lines.append(f"# TYPE {family} counter")
+            declared.add(family)
+        lines.append(f"{_series(family, labels)} {value}")
+
+    for name, fn in sorted(_collectors.items()):
+        try:
+            values = []
+            _flatten(_full_name(_sanitize(name)), fn(), values)
+        except Exception as e:
+            logger.warning(f"[Metrics] Collector {name} failed: {e}")
+            continue
+        for series, value in values:
+            lines.append(f"# TYPE {series} gauge")
+            lines.append(f"{series} {value}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,330 @@
+import atexit
+import glob
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from bson import ObjectId, json_util
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from utils.db import get_db
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------- Config ----------------------------
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "1") == "1"
+WRITE_BEHIND_BATCH = int(os.getenv("WRITE_BEHIND_BATCH", "200"))  # flush a collection once this many are waiting
+WRITE_BEHIND_INTERVAL = float(os.getenv("WRITE_BEHIND_INTERVAL", "1.0"))  # ...or after this many seconds
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))  # beyond this, callers write inline
+WRITE_BEHIND_SPILL_DIR = os.getenv("WRITE_BEHIND_SPILL_DIR")  # unset: no spill file, failed batches are retried
+SPILL_SUFFIX = ".ndjson"
+
+DUPLICATE_KEY = 11000
+
+
+class WriteBehindBuffer:
+    """Collects small audit/result inserts and writes them with ``insert_many``.
+
+    Documents get their ``_id`` when buffered, exactly as ``insert_one`` would
+    assign it, so callers can still reference it and a replayed batch is
+    idempotent. Memory is bounded by ``max_pending``: once full, ``insert``
+    falls back to a synchronous write. Batches that cannot be written go to a
+    per-process spill file (when ``spill_dir`` is set) and are replayed after
+    the next successful flush.
+
+    Counter updates (``increment``) are summed per document and written as one
+    upsert per document on every flush. They are not spilled: a batch Mongo
+    rejects is kept in memory and retried, and the counters they feed
+    (metrics, rollups) are rebuilt by their own reconcile/backfill jobs.
+    """
+
+    def __init__(self, batch_size=WRITE_BEHIND_BATCH, interval=WRITE_BEHIND_INTERVAL,
+                 max_pending=WRITE_BEHIND_MAX_PENDING, spill_dir=WRITE_BEHIND_SPILL_DIR, db=None):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self.spill_dir = spill_dir
+        self._db = db
+        self._pending = {}  # collection name -> deque of documents
+        self._count = 0
+        self._increments = {}  # (collection, _id) -> [{field: delta}, {field: value set on insert}]
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # one writer at a time keeps batches in order
+        self._closed = False
+        self._failing = False
+        self._spilled_since_replay = bool(spill_dir and glob.glob(os.path.join(spill_dir, "*" + SPILL_SUFFIX)))
+        self._counters = {"buffered": 0, "written": 0, "batches": 0, "inline": 0, "failures": 0,
+                          "spilled": 0, "replayed": 0, "dropped": 0, "increments": 0, "increment_writes": 0}
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    @property
+    def db(self):
+        return self._db if self._db is not None else get_db()
+
+    # ---- Producers ----
+    def insert(self, collection, doc):
+        self.insert_many(collection, [doc])
+
+    def insert_many(self, collection, docs):
+        docs = list(docs)
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())
+        with self._cond:
+            if not self._closed and self._count + len(docs) <= self.max_pending:
+                self._pending.setdefault(collection, deque()).extend(docs)
+                self._count += len(docs)
+                self._counters["buffered"] += len(docs)
+                if len(self._pending[collection]) >= self.batch_size:
+                    self._cond.notify()
+                return
+            self._counters["inline"] += len(docs)
+        # Buffer full (or shutting down): behave like the old synchronous insert
+        self.db[collection].insert_many(docs, ordered=False)
+
+    def increment(self, collection, doc_id, inc, set_on_insert=None):
+        """Buffered ``update_one({"_id": doc_id}, {"$inc": inc, "$setOnInsert": ...}, upsert=True)``."""
+        inc = {field: delta for field, delta in inc.items() if delta}
+        if not inc:
+            return
+        key = (collection, doc_id)
+        with self._cond:
+            if not self._closed and (key in self._increments or len(self._increments) < self.max_pending):
+                self._merge_increment(key, inc, set_on_insert)
+                self._counters["increments"] += 1
+                return
+            self._counters["inline"] += 1
+        self.db[collection].update_one({"_id": doc_id}, _increment_update(inc, set_on_insert), upsert=True)
+
+    def _merge_increment(self, key, inc, set_on_insert):
+        entry = self._increments.setdefault(key, [{}, {}])
+        for field, delta in inc.items():
+            entry[0][field] = entry[0].get(field, 0) + delta
+        if set_on_insert:
+            entry[1].update(set_on_insert)
+
+    # ---- Flushing ----
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.interval
+                # While Mongo is failing, full batches wait for the timer too instead of retrying in a loop
+                while not self._closed and (self._failing or not self._batch_ready()):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def _batch_ready(self):
+        return any(len(docs) >= self.batch_size for docs in self._pending.values())
+
+    def _take(self, collection):
+        with self._cond:
+            docs = self._pending.get(collection)
+            batch = [docs.popleft() for _ in range(min(len(docs), self.batch_size))] if docs else []
+            self._count -= len(batch)
+            return batch
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of documents written."""
+        written = 0
+        with self._flush_lock:
+            for collection in list(self._pending):
+                while True:
+                    batch = self._take(collection)
+                    if not batch:
+                        break
+                    if not self._write(collection, batch):
+                        self._keep(collection, batch)
+                        break
+                    written += len(batch)
+            if written and self._spilled_since_replay:
+                self.replay_spill()
+            self._flush_increments()
+        return written
+
+    def _flush_increments(self):
+        with self._cond:
+            taken, self._increments = self._increments, {}
+        by_collection = {}
+        for (collection, doc_id), (inc, set_on_insert) in taken.items():
+            by_collection.setdefault(collection, []).append(
+                UpdateOne({"_id": doc_id}, _increment_update(inc, set_on_insert), upsert=True))
+        for collection, ops in by_collection.items():
+            try:
+                self.db[collection].bulk_write(ops, ordered=False)
+                self._counters["increment_writes"] += len(ops)
+                self._failing = False
+            except BulkWriteError as e:
+                # Some updates may have applied; retrying would count those twice
+                logger.error(f"[WriteBehind] {len(e.details.get('writeErrors', []))} {collection} counter updates rejected")
+                self._counters["failures"] += 1
+            except PyMongoError as e:
+                logger.warning(f"[WriteBehind] Could not write {len(ops)} {collection} counter updates: {e}")
+                self._counters["failures"] += 1
+                self._failing = True
+                with self._cond:
+                    for (name, doc_id), (inc, set_on_insert) in taken.items():
+                        if name == collection:
+                            self._merge_increment((name, doc_id), inc, set_on_insert)
+
+    def _write(self, collection, batch):
+        rejected = []
+        try:
+            self.db[collection].insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # A retried batch may be partly in already; anything but duplicate _ids is a real failure
+            rejected = [err for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY]
+            if rejected:
+                logger.error(f"[WriteBehind] {len(rejected)} {collection} documents rejected: {rejected[0].get('errmsg')}")
+                self._counters["failures"] += 1
+        except PyMongoError as e:
+            logger.warning(f"[WriteBehind] Could not write {len(batch)} {collection} documents: {e}")
+            self._counters["failures"] += 1
+            self._failing = True
+            return False
+        self._failing = False
+        self._counters["written"] += len(batch) - len(rejected)
+        self._counters["batches"] += 1
+        return True
+
+    def _keep(self, collection, batch):
+        # Mongo is down: move the batch to disk, or put it back for the next tick while memory allows
+        if self.spill_dir and self._spill(collection, batch):
+            return
+        with self._cond:
+            room = max(0, self.max_pending - self._count)
+            if room < len(batch):
+                self._counters["dropped"] += len(batch) - room
+                logger.error(f"[WriteBehind] Buffer full, dropped {len(batch) - room} {collection} documents")
+            self._pending.setdefault(collection, deque()).extendleft(reversed(batch[:room]))
+            self._count += min(room, len(batch))
+
+    # ---- Spill file ----
+    def _spill_path(self, collection):
+        return os.path.join(self.spill_dir, f"{collection}.{os.getpid()}{SPILL_SUFFIX}")
+
+    def _spill(self, collection, batch):
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with open(self._spill_path(collection), "a", encoding="utf-8") as f:
+                f.write("".join(json_util.dumps(doc) + "\n" for doc in batch))
+        except OSError as e:
+            logger.error(f"[WriteBehind] Could not spill {len(batch)} {collection} documents: {e}")
+            return False
+        self._counters["spilled"] += len(batch)
+        self._spilled_since_replay = True
+        return True
+
+    def replay_spill(self):
+        """Insert documents from spill files (any process's) back into Mongo."""
+        replayed = 0
+        for path in sorted(glob.glob(os.path.join(self.spill_dir or "", "*" + SPILL_SUFFIX))):
+            collection = os.path.basename(path).split(".")[0]
+            claimed = f"{path}.replaying.{os.getpid()}"
+            try:
+                os.replace(path, claimed)  # another process replaying the same file loses the rename
+            except OSError:
+                continue
+            with open(claimed, encoding="utf-8") as f:
+                docs = [json_util.loads(line) for line in f if line.strip()]
+            for start in range(0, len(docs), self.batch_size):
+                batch = docs[start:start + self.batch_size]
+                if not self._write(collection, batch):
+                    # Still failing: put the unwritten rest back and try again later
+                    with open(path, "a", encoding="utf-8") as f:
+                        f.write("".join(json_util.dumps(doc) + "\n" for doc in docs[start:]))
+                    os.remove(claimed)
+                    return replayed
+                replayed += len(batch)
+            os.remove(claimed)
+        self._counters["replayed"] += replayed
+        self._spilled_since_replay = False
+        if replayed:
+            logger.info(f"[WriteBehind] Replayed {replayed} spilled documents")
+        return replayed
+
+    def close(self, timeout=10):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        with self._cond:
+            leftover = self._count
+        if leftover:
+            logger.error(f"[WriteBehind] {leftover} documents still buffered at shutdown")
+
+    def stats(self):
+        with self._cond:
+            return {
+                **self._counters,
+                "pending": self._count,
+                "pending_counter_docs": len(self._increments),
+                "per_collection": {name: len(docs) for name, docs in self._pending.items()},
+                "batch_size": self.batch_size,
+                "interval_seconds": self.interval,
+                "max_pending": self.max_pending,
+                "spill_dir": self.spill_dir,
+            }
+
+
+def _increment_update(inc, set_on_insert):
+    update = {"$inc": inc}
+    if set_on_insert:
+        update["$setOnInsert"] = set_on_insert
+    return update
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_write_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = WriteBehindBuffer()
+                atexit.register(_buffer.close)
+    return _buffer
+
+
+def insert(collection, doc):
+    """Buffered ``db[collection].insert_one(doc)``; synchronous when WRITE_BEHIND_ENABLED=0."""
+    if WRITE_BEHIND_ENABLED:
+        get_write_buffer().insert(collection, doc)
+    else:
+        get_db()[collection].insert_one(doc)
+
+
+def insert_many(collection, docs):
+    if WRITE_BEHIND_ENABLED:
+        get_write_buffer().insert_many(collection, docs)
+    else:
+        get_db()[collection].insert_many(docs, ordered=False)
+
+
+def increment(collection, doc_id, inc, set_on_insert=None):
+    """Buffered upsert ``$inc`` of one document; synchronous when WRITE_BEHIND_ENABLED=0."""
+    if WRITE_BEHIND_ENABLED:
+        get_write_buffer().increment(collection, doc_id, inc, set_on_insert)
+    else:
+        get_db()[collection].update_one({"_id": doc_id}, _increment_update(inc, set_on_insert), upsert=True)
+
+
+if __name__ == "__main__":
+    # python -m utils.write_behind replay   -> load spill files left by crashed or cut-off processes
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] != ["replay"] or not WRITE_BEHIND_SPILL_DIR:
+        sys.exit("usage: WRITE_BEHIND_SPILL_DIR=... python -m utils.write_behind replay")
+    buffer = WriteBehindBuffer()
+    print(f"replayed {buffer.replay_spill()} documents")
+    buffer.close()